@@ -66,7 +66,12 @@ echo "   ${GREEN}cd build/web${NC}"
 echo "   ${GREEN}python3 ../../cors_server.py${NC}"
 echo "   Abre: ${BLUE}http://localhost:8000${NC}"
 echo ""
-echo "   Opción C - Abrir directamente (limitado):"
+echo "   Opción C - Servidor SU TODERO (gzip/brotli precomprimido):"
+echo "   ${GREEN}python3 server.py --precompress-only${NC}  (tras flutter build web)"
+echo "   ${GREEN}python3 server.py${NC}"
+echo "   Abre: ${BLUE}http://localhost:5060${NC}"
+echo ""
+echo "   Opción D - Abrir directamente (limitado):"
 echo "   ${GREEN}open build/web/index.html${NC}"
 echo "   (Algunas funciones pueden no funcionar)"
 echo ""
@@ -140,6 +140,20 @@ class MaestroStats {
     required this.totalRecontratariaSi,
   });
 
+  /// Documento maestro_stats/{maestroId} (scripts/maestro_stats.py)
+  factory MaestroStats.fromMap(String maestroId, Map<String, dynamic> map) {
+    return MaestroStats(
+      maestroId: maestroId,
+      totalEvaluaciones: (map['totalEvaluaciones'] ?? 0).toInt(),
+      promedioGeneral: (map['promedioGeneral'] ?? 0).toDouble(),
+      promedioPuntualidad: (map['promedioPuntualidad'] ?? 0).toDouble(),
+      promedioCalidad: (map['promedioCalidad'] ?? 0).toDouble(),
+      promedioLimpieza: (map['promedioLimpieza'] ?? 0).toDouble(),
+      promedioProfesionalismo: (map['promedioProfesionalismo'] ?? 0).toDouble(),
+      totalRecontratariaSi: (map['totalRecontratariaSi'] ?? 0).toInt(),
+    );
+  }
+
   factory MaestroStats.empty(String maestroId) {
     return MaestroStats(
       maestroId: maestroId,
@@ -397,6 +397,15 @@ class TicketModel {
     this.fechaCotizacionAprobada,
   });
 
+  /// UIDs de propietario, cliente y maestro, para listar los tickets de un
+  /// usuario con una sola consulta array-contains (scripts/ticket_participants.py)
+  List<String> get participantIds => <String>{
+        userId,
+        clienteId,
+        if (maestroId != null) maestroId!,
+      }.where((id) => id.isNotEmpty).toList()
+        ..sort();
+
   /// Convertir a Map respetando estructura solicitada
   Map<String, dynamic> toMap() {
     return {
@@ -456,6 +465,7 @@ class TicketModel {
       // Otros campos necesarios para la app pero quizás no en el JSON estricto del prompt
       // Se mantienen en el nivel raíz para compatibilidad con Firestore
       'userId': userId,
+      'participantIds': participantIds,
       'tipoServicio': tipoServicio.value,
       'presupuestoEstimado': presupuestoEstimado,
       'costoFinal': costoFinal,
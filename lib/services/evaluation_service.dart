@@ -13,7 +13,8 @@ class EvaluationService {
   EvaluationService._internal();
 
   /// POST /evaluacion/crear
-  /// Crea una evaluación y actualiza estadísticas del maestro
+  /// Crea una evaluación; las estadísticas del maestro las precalcula
+  /// scripts/maestro_stats.py en maestro_stats/{maestroId}
   Future<Map<String, dynamic>> submitEvaluation(MaestroEvaluation eval) async {
     try {
       // 1. Guardar la evaluación
@@ -25,9 +26,6 @@ class EvaluationService {
         'evaluationId': eval.id,
       });
 
-      // 3. Actualizar estadísticas del maestro (Incremental o Recalculado)
-      await _updateMaestroStats(eval.maestroId);
-
       return {'success': true, 'message': 'Evaluación registrada con éxito'};
     } catch (e) {
       if (kDebugMode) debugPrint('⚠️ Error submitEvaluation: $e');
@@ -73,16 +71,13 @@ class EvaluationService {
 
   /// GET Stats (Helper interno o endpoint dashboard)
   Future<MaestroStats> getMaestroStats(String maestroId) async {
-    // En una app real de alto tráfico, esto se leería de un documento 'maestro_stats'
-    // pre-calculado por Cloud Functions. Aquí lo calculamos on-demand para la demo.
-    
-    // Si ya existe la colección agregada:
+    // Una sola lectura: el documento precalculado por scripts/maestro_stats.py
     final doc = await _firestore.collection('maestro_stats').doc(maestroId).get();
     if (doc.exists) {
-      // Retornar objeto mapeado (simplificado aquí calculamos manual para asegurar datos frescos en demo)
+      return MaestroStats.fromMap(maestroId, doc.data()!);
     }
     
-    // Recálculo manual (demo)
+    // Maestro aún sin precalcular: recálculo sobre las últimas evaluaciones
     final evals = await getMaestroEvaluations(maestroId);
     if (evals.isEmpty) return MaestroStats.empty(maestroId);
 
@@ -114,18 +109,4 @@ class EvaluationService {
       totalRecontratariaSi: siCount,
     );
   }
-
-  /// Helper privado para actualizar estadísticas
-  Future<void> _updateMaestroStats(String maestroId) async {
-    // En producción: Cloud Function triggers onWrite.
-    // Aquí: Cliente recalcula (no ideal pero funcional para demo).
-    final stats = await getMaestroStats(maestroId);
-    
-    await _firestore.collection('maestro_stats').doc(maestroId).set({
-      'totalEvaluaciones': stats.totalEvaluaciones,
-      'promedioGeneral': stats.promedioGeneral,
-      'lastUpdate': FieldValue.serverTimestamp(),
-      // ... otros campos
-    });
-  }
 }
@@ -509,6 +509,41 @@ class TicketService {
     }
   }
 
+  /// participantIds del ticket con maestroId como maestro: propietario y
+  /// cliente del documento más el maestro nuevo (el anterior deja de ser
+  /// participante). firestore.rules exige que coincida con esos campos.
+  static List<String> _participantIdsWithMaestro(
+    Map<String, dynamic> data,
+    String maestroId,
+  ) {
+    final cliente = data['cliente'];
+    return <dynamic>{
+      data['userId'],
+      data['clienteId'],
+      if (cliente is Map) cliente['id'],
+      maestroId,
+    }.whereType<String>().where((id) => id.isNotEmpty).toList()
+      ..sort();
+  }
+
+  /// Aplica updates de asignación de maestro recalculando participantIds
+  /// en la misma transacción
+  Future<void> _updateWithParticipants(
+    String ticketId,
+    Map<String, dynamic> updates,
+    String maestroId,
+  ) {
+    final ref = _firestore.collection('tickets').doc(ticketId);
+    return _firestore.runTransaction((transaction) async {
+      final snapshot = await transaction.get(ref);
+      transaction.update(ref, {
+        ...updates,
+        'participantIds':
+            _participantIdsWithMaestro(snapshot.data() ?? {}, maestroId),
+      });
+    });
+  }
+
   /// Aprobar cotización y asignar maestro (o solo aprobar si maestroId es vacío)
   Future<bool> approveCotizacionAndAssignMaestro({
     required String ticketId,
@@ -534,10 +569,11 @@ class TicketService {
         updates['tecnicoId'] = maestroId;
         updates['tecnicoNombre'] = maestroNombre;
         updates['estado'] = TicketStatus.asignado.value;
+        await _updateWithParticipants(ticketId, updates, maestroId);
+      } else {
+        await _firestore.collection('tickets').doc(ticketId).update(updates);
       }
 
-      await _firestore.collection('tickets').doc(ticketId).update(updates);
-
       // Historial
       await _firestore.collection('tickets').doc(ticketId).update({
         'historial': FieldValue.arrayUnion([
@@ -581,7 +617,7 @@ class TicketService {
         'fechaActualizacion': FieldValue.serverTimestamp(),
       };
 
-      await _firestore.collection('tickets').doc(ticketId).update(updates);
+      await _updateWithParticipants(ticketId, updates, maestroId);
 
       // Historial
       await _firestore.collection('tickets').doc(ticketId).update({
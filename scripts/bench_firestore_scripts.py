@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los scripts de mantenimiento de Firestore a escala, contra el
+emulador local.
+
+Para cada combinación de --scales (documentos en total) y --orphan-ratios
+llena el emulador con seed_dataset.py y ejecuta los scripts por turno, en
+el orden en que se usarían en producción (STEPS): verificación, snapshot,
+plan de propietarios, migración, nueva verificación, participantIds y
+maestro_stats. Cada paso es un proceso aparte con FIRESTORE_METRICS
+activado (firestore_metrics.py), así que de cada uno se guarda:
+
+  - tiempo de reloj y documentos del dataset por segundo;
+  - memoria residente máxima del proceso (de wait4, vale también para
+    los pasos que no tocan Firestore);
+  - lecturas, escrituras y borrados facturables del informe de métricas.
+
+Los datos dependen solo de --seed, así que las lecturas y escrituras de
+un paso son las mismas entre corridas: si suben, el script lee o escribe
+de más. Con --baseline se compara contra un JSON anterior y el script
+termina con código 1 si algún paso empeoró más que --tolerance (o falló).
+
+    firebase emulators:start --only firestore
+    export FIRESTORE_EMULATOR_HOST=localhost:8080
+    python3 scripts/bench_firestore_scripts.py --scales 10000,100000
+    python3 scripts/bench_firestore_scripts.py --scales 1000000 --orphan-ratios 0.9 \\
+        --baseline bench_firestore_scripts.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_servers import git_commit
+from firestore_batch import using_emulator
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+STEP_TIMEOUT = 3600.0
+# Líneas finales de la salida que se muestran cuando un paso falla
+LOG_TAIL = 15
+
+# nombre -> (script y argumentos, códigos de salida válidos). Se ejecutan en
+# este orden desde un directorio de trabajo temporal, donde quedan los
+# checkpoints, estados y planes de cada script.
+STEPS = {
+    'seed': (['seed_dataset.py', '--clear', '--documents', '{documents}',
+              '--orphan-ratio', '{orphan_ratio}', '--seed', '{seed}'], {0}),
+    'verify': (['verify_userid_fields.py', '--examples', '0'], {0}),
+    'snapshot': (['firestore_snapshot.py', 'export', '--out', 'snapshot'], {0}),
+    'ownership': (['ownership.py', '--snapshot', 'snapshot',
+                   '--out', 'ownership.plan.jsonl'], {0}),
+    'migrate-plan': (['migrate_userid_fields.py', 'plan',
+                      '--plan', 'migrate.plan.jsonl'], {0}),
+    'migrate': (['migrate_userid_fields.py', '--yes', '--restart'], {0}),
+    'verify-after': (['verify_userid_fields.py', '--examples', '0'], {0}),
+    # Antes del backfill los tickets huérfanos no tienen participantIds
+    'participants-verify': (['ticket_participants.py', 'verify', '--examples', '0'],
+                            {0, 1}),
+    'participants-backfill': (['ticket_participants.py', 'backfill', '--restart'], {0}),
+    'maestro-stats': (['maestro_stats.py', '--full'], {0}),
+}
+
+
+def peak_rss_mb(usage):
+    # Linux da KB; macOS, bytes
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_step(name, workdir, params, timeout=STEP_TIMEOUT):
+    """Ejecuta un paso y devuelve su resultado (sin la escala)"""
+    argv, ok_codes = STEPS[name]
+    argv = [arg.format(**params) for arg in argv]
+    metrics_path = os.path.join(workdir, f"{name}.metrics.json")
+    log_path = os.path.join(workdir, f"{name}.log")
+    env = dict(os.environ, FIRESTORE_METRICS=metrics_path,
+               FIRESTORE_METRICS_INTERVAL='0', PYTHONUNBUFFERED='1')
+    started = time.monotonic()
+    with open(log_path, 'w') as log:
+        proc = subprocess.Popen([sys.executable, os.path.join(SCRIPTS, argv[0])]
+                                + argv[1:], cwd=workdir, env=env,
+                                stdin=subprocess.DEVNULL, stdout=log,
+                                stderr=subprocess.STDOUT)
+        # wait4 en vez de proc.wait(): da el uso de recursos de este hijo
+        deadline = started + timeout
+        while True:
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            if time.monotonic() > deadline:
+                proc.kill()
+                _, status, usage = os.wait4(proc.pid, 0)
+                break
+            time.sleep(0.05)
+    wall = time.monotonic() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    result = {
+        'step': name,
+        'exit_code': proc.returncode,
+        'ok': proc.returncode in ok_codes,
+        'wall_s': round(wall, 3),
+        'docs_per_s': round(params['documents'] / wall, 1) if wall else None,
+        'peak_rss_mb': peak_rss_mb(usage),
+        'reads': None,
+        'writes': None,
+        'deletes': None,
+    }
+    try:
+        with open(metrics_path) as f:
+            totals = json.load(f)['totals']
+        result.update(reads=totals['reads'], writes=totals['writes'],
+                      deletes=totals['deletes'])
+    except (OSError, ValueError, KeyError):
+        # Los pasos que solo trabajan sobre el snapshot no abren Firestore
+        pass
+    if not result['ok']:
+        with open(log_path) as f:
+            result['log_tail'] = f.readlines()[-LOG_TAIL:]
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Pasos que empeoraron más que tolerance respecto a baseline"""
+    previous = {(r['documents'], r['orphan_ratio'], r['step']): r
+                for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        if not result['ok']:
+            regressions.append((result, 'exit_code', 0, result['exit_code']))
+            continue
+        old = previous.get((result['documents'], result['orphan_ratio'], result['step']))
+        if old is None or not old['ok']:
+            continue
+        for metric in ('wall_s', 'peak_rss_mb', 'reads', 'writes'):
+            if old[metric] and result[metric] is not None \
+                    and result[metric] > old[metric] * (1 + tolerance):
+                regressions.append((result, metric, old[metric], result[metric]))
+    return regressions
+
+
+def parse_list(value, kind):
+    return [kind(v) for v in value.split(',') if v.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark de los scripts de Firestore contra el emulador")
+    parser.add_argument('--scales', default='10000,100000',
+                        help="documentos en total por corrida, separados por coma")
+    parser.add_argument('--orphan-ratios', default='0.2',
+                        help="fracciones de documentos sin userId, separadas por coma")
+    parser.add_argument('--steps', default=','.join(STEPS),
+                        help="pasos a ejecutar, separados por coma ('seed' llena "
+                             "el emulador; sin él se usa lo que ya tenga)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=STEP_TIMEOUT,
+                        help="segundos máximos por paso")
+    parser.add_argument('--output', default='bench_firestore_scripts.json',
+                        help="archivo JSON de resultados")
+    parser.add_argument('--baseline',
+                        help="JSON de una corrida anterior para comparar")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="empeoramiento relativo tolerado frente al baseline")
+    parser.add_argument('--keep', action='store_true',
+                        help="conservar el directorio de trabajo (salidas y métricas)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not using_emulator():
+        print("❌ El benchmark borra y llena la base de datos: define "
+              "FIRESTORE_EMULATOR_HOST (p. ej. localhost:8080)")
+        sys.exit(2)
+    steps = [s.strip() for s in args.steps.split(',') if s.strip()]
+    unknown = [s for s in steps if s not in STEPS]
+    if unknown:
+        print(f"❌ Pasos desconocidos: {', '.join(unknown)}")
+        print(f"💡 Disponibles: {', '.join(STEPS)}")
+        sys.exit(2)
+    # Siempre en el orden de STEPS: cada paso parte de lo que dejó el anterior
+    steps = [s for s in STEPS if s in steps]
+    scales = parse_list(args.scales, int)
+    ratios = parse_list(args.orphan_ratios, float)
+
+    results = []
+    for documents in scales:
+        for ratio in ratios:
+            workdir = tempfile.mkdtemp(prefix='sutodero-bench-firestore-')
+            params = {'documents': documents, 'orphan_ratio': ratio, 'seed': args.seed}
+            print(f"🌱 {documents} documentos, {ratio:.0%} huérfanos ({workdir})")
+            try:
+                for name in steps:
+                    result = dict(documents=documents, orphan_ratio=ratio,
+                                  **run_step(name, workdir, params, args.timeout))
+                    results.append(result)
+                    io = (f"{result['reads']} lecturas, {result['writes']} escrituras"
+                          if result['reads'] is not None else 'sin Firestore')
+                    print(f"⏱️  {name:<22} {result['wall_s']:>9.1f}s "
+                          f"{result['docs_per_s']:>10.0f} docs/s "
+                          f"{result['peak_rss_mb'] or 0:>8.1f} MB  {io}")
+                    if not result['ok']:
+                        print(f"❌ {name} terminó con código {result['exit_code']}:")
+                        for line in result['log_tail']:
+                            print(f"   {line.rstrip()}")
+                        # Los pasos siguientes dependen de este
+                        break
+            finally:
+                if args.keep:
+                    print(f"📁 Salidas en {workdir}")
+                else:
+                    shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'emulator': os.environ.get('FIRESTORE_EMULATOR_HOST'),
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Resultados guardados en {args.output}")
+
+    failed = [r for r in results if not r['ok']]
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for result, metric, old, new in regressions:
+            print(f"⚠️  Regresión {result['step']} ({result['documents']} documentos, "
+                  f"{result['orphan_ratio']:.0%} huérfanos): {metric} {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print("✅ Sin regresiones frente al baseline")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los servidores estáticos del repo (server.py, web_server.py,
+start_server.py, start_cors_server.py y cors_server.py).
+
+Genera un build/web sintético con la forma de un build real de Flutter,
+arranca cada servidor por turno y lo carga con un generador asíncrono
+propio (sin dependencias). Cada servidor se mide dos veces por nivel de
+concurrencia:
+
+  cold  servidor recién arrancado, clientes sin caché
+  warm  mismo proceso ya caliente, clientes revalidando con If-None-Match
+
+Se reportan RPS, latencia p50/p95/p99, bytes/s y tasa de error, y se
+guardan en JSON. Con --baseline se compara contra un JSON anterior y el
+script termina con código 1 si algún caso empeoró más que --tolerance.
+
+Uso:
+    python3 scripts/bench_servers.py --concurrency 50,500 --duration 10
+    python3 scripts/bench_servers.py --servers server.py --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Los servidores legacy tienen el puerto fijo
+PORT = 5060
+STARTUP_TIMEOUT = 30.0
+REQUEST_TIMEOUT = 10.0
+
+# Los servidores legacy sirven el cwd (o hacen chdir a build/web) y usan
+# socketserver.TCPServer sin SO_REUSEADDR. El wrapper solo activa
+# allow_reuse_address para poder reabrir el puerto 5060 entre corridas.
+LEGACY_WRAPPER = (
+    "import runpy, socketserver, sys; "
+    "socketserver.TCPServer.allow_reuse_address = True; "
+    "runpy.run_path(sys.argv[1], run_name='__main__')"
+)
+
+# nombre -> (argumentos, cwd: 'web' = build/web, 'root' = carpeta del build)
+SERVERS = {
+    'server.py': (['server.py', '--port', str(PORT), '--directory', '{web}',
+                   '--no-access-log'], 'root'),
+    'web_server.py': (['-c', LEGACY_WRAPPER, '{repo}/web_server.py'], 'web'),
+    'start_server.py': (['-c', LEGACY_WRAPPER, '{repo}/start_server.py'], 'root'),
+    'start_cors_server.py': (['-c', LEGACY_WRAPPER,
+                              '{repo}/start_cors_server.py'], 'root'),
+    'cors_server.py': (['-c', LEGACY_WRAPPER, '{repo}/cors_server.py'], 'web'),
+}
+
+# Mezcla de peticiones de una carga de la app: (ruta, peso)
+REQUEST_MIX = [
+    ('/', 10),
+    ('/flutter.js', 8),
+    ('/flutter_bootstrap.js', 8),
+    ('/main.dart.js', 8),
+    ('/manifest.json', 6),
+    ('/version.json', 6),
+    ('/favicon.png', 6),
+    ('/icons/Icon-192.png', 4),
+    ('/assets/AssetManifest.json', 6),
+    ('/assets/FontManifest.json', 6),
+    ('/assets/fonts/MaterialIcons-Regular.otf', 4),
+    ('/assets/assets/images/logo.png', 6),
+    ('/canvaskit/canvaskit.js', 4),
+    ('/canvaskit/canvaskit.wasm', 2),
+    ('/tickets/42', 4),
+]
+
+JS_WORDS = ['function', 'return', 'var', 'this', 'null', 'if', 'else', 'new',
+            'A.', 'B.', '$.', 'dart', 'prototype', 'call$1', 'get$length',
+            '===', '!==', '(', ')', '{', '}', ';', ',', '0', '1', 'true',
+            'false', 'type$', 'instance', 'async', 'await', 'Widget',
+            'State', 'BuildContext', 'Future', 'Stream', 'List', 'Map']
+
+
+def text_blob(rng, size):
+    """Texto con la redundancia típica de JS minificado"""
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(JS_WORDS)
+        if rng.random() < 0.3:
+            word += str(rng.randrange(10000))
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size].encode()
+
+
+def write_file(root, rel, data):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def make_build(root, scale=1.0, seed=0):
+    """Crea un build/web sintético bajo root y devuelve su ruta"""
+    rng = random.Random(seed)
+    web = os.path.join(root, 'build', 'web')
+    kb = lambda n: int(n * 1024 * scale)
+    index = (b'<!DOCTYPE html><html><head><base href="/">'
+             b'<meta charset="UTF-8"><title>SU TODERO</title>'
+             b'<link rel="manifest" href="manifest.json"></head><body>'
+             b'<script src="flutter_bootstrap.js" async></script>'
+             b'</body></html>')
+    write_file(web, 'index.html', index)
+    write_file(web, 'flutter.js', text_blob(rng, kb(9)))
+    write_file(web, 'flutter_bootstrap.js', text_blob(rng, kb(10)))
+    write_file(web, 'flutter_service_worker.js', text_blob(rng, kb(8)))
+    write_file(web, 'main.dart.js', text_blob(rng, kb(2400)))
+    write_file(web, 'manifest.json', json.dumps({
+        'name': 'SU TODERO', 'short_name': 'SU TODERO', 'start_url': '.',
+        'display': 'standalone', 'icons': [{'src': 'icons/Icon-192.png'}],
+    }).encode())
+    write_file(web, 'version.json', b'{"app_name":"sutodero","version":"1.0.0"}')
+    write_file(web, 'favicon.png', rng.randbytes(kb(1)))
+    for size in (192, 512):
+        write_file(web, f'icons/Icon-{size}.png', rng.randbytes(kb(size / 16)))
+    write_file(web, 'assets/AssetManifest.json', json.dumps(
+        {f'assets/images/img_{i}.png': [f'assets/images/img_{i}.png']
+         for i in range(200)}).encode())
+    write_file(web, 'assets/FontManifest.json',
+               b'[{"family":"MaterialIcons","fonts":'
+               b'[{"asset":"fonts/MaterialIcons-Regular.otf"}]}]')
+    write_file(web, 'assets/fonts/MaterialIcons-Regular.otf', rng.randbytes(kb(1600)))
+    write_file(web, 'assets/assets/images/logo.png', rng.randbytes(kb(60)))
+    write_file(web, 'canvaskit/canvaskit.js', text_blob(rng, kb(90)))
+    write_file(web, 'canvaskit/canvaskit.wasm', rng.randbytes(kb(6800)))
+    return web
+
+
+class RunStats:
+    """Latencias, bytes y errores de una corrida"""
+
+    def __init__(self):
+        self.latencies = []
+        self.bytes = 0
+        self.errors = 0
+        self.statuses = {}
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        total = len(latencies) + self.errors
+
+        def pct(p):
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+            return round(latencies[index] * 1000, 3)
+
+        return {
+            'requests': len(latencies),
+            'errors': self.errors,
+            'error_rate': round(self.errors / total, 4) if total else 0.0,
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': pct(50),
+            'p95_ms': pct(95),
+            'p99_ms': pct(99),
+            'bytes_per_s': round(self.bytes / elapsed),
+            'statuses': {str(k): v for k, v in sorted(self.statuses.items())},
+        }
+
+
+async def fetch(reader, writer, path, etag):
+    """Una petición HTTP/1.1; devuelve (status, bytes, etag, keep-alive)"""
+    request = (f'GET {path} HTTP/1.1\r\nHost: localhost\r\n'
+               'Accept-Encoding: gzip, br\r\nConnection: keep-alive\r\n')
+    if etag:
+        request += f'If-None-Match: {etag}\r\n'
+    writer.write((request + '\r\n').encode('latin-1'))
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    version, status = status_line.split(None, 2)[:2]
+    status = int(status)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+
+    connection = headers.get('connection', '').lower()
+    if version == b'HTTP/1.1':
+        keep_alive = connection != 'close'
+    else:
+        keep_alive = connection == 'keep-alive'
+    if 'content-length' in headers:
+        size = int(headers['content-length'])
+        if size:
+            await reader.readexactly(size)
+    elif status in (204, 304):
+        size = 0
+    else:
+        size = len(await reader.read())
+        keep_alive = False
+    return status, size, headers.get('etag'), keep_alive
+
+
+async def client(deadline, paths, etags, use_etags, stats, rng):
+    reader = writer = None
+    while time.monotonic() < deadline:
+        path = rng.choice(paths)
+        started = time.monotonic()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection('127.0.0.1', PORT), REQUEST_TIMEOUT)
+            status, size, etag, keep_alive = await asyncio.wait_for(
+                fetch(reader, writer, path,
+                      etags.get(path) if use_etags else None),
+                REQUEST_TIMEOUT)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                ValueError):
+            stats.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        stats.latencies.append(time.monotonic() - started)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.bytes += size
+        if status >= 400:
+            stats.errors += 1
+        if etag and status == 200:
+            etags[path] = etag
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(concurrency, duration, etags, use_etags, seed):
+    """Corre concurrency clientes durante duration segundos"""
+    paths = [path for path, weight in REQUEST_MIX for _ in range(weight)]
+    stats = RunStats()
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(*[
+        client(deadline, paths, etags, use_etags, stats,
+               random.Random(seed * 100003 + i))
+        for i in range(concurrency)])
+    return stats.summary(time.monotonic() - started)
+
+
+def wait_for_port(proc, timeout=STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', PORT), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def start_server(name, root, web):
+    argv, cwd = SERVERS[name]
+    argv = [arg.format(repo=REPO, web=web) for arg in argv]
+    if argv[0] == 'server.py':
+        argv[0] = os.path.join(REPO, 'server.py')
+    proc = subprocess.Popen([sys.executable] + argv,
+                            cwd=web if cwd == 'web' else root,
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    if not wait_for_port(proc):
+        stop_server(proc)
+        return None
+    return proc
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def port_in_use():
+    try:
+        with socket.create_connection(('127.0.0.1', PORT), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def compare(results, baseline, tolerance):
+    """Casos que empeoraron más que tolerance respecto a baseline"""
+    previous = {(r['server'], r['phase'], r['concurrency']): r
+                for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        old = previous.get((result['server'], result['phase'], result['concurrency']))
+        if old is None:
+            continue
+        if old['rps'] and result['rps'] < old['rps'] * (1 - tolerance):
+            regressions.append((result, 'rps', old['rps'], result['rps']))
+        if (old['p99_ms'] and result['p99_ms']
+                and result['p99_ms'] > old['p99_ms'] * (1 + tolerance)):
+            regressions.append((result, 'p99_ms', old['p99_ms'], result['p99_ms']))
+        if result['error_rate'] > old['error_rate'] + 0.01:
+            regressions.append((result, 'error_rate', old['error_rate'],
+                                result['error_rate']))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=REPO, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los servidores web")
+    parser.add_argument('--servers', default=','.join(SERVERS),
+                        help="servidores a medir, separados por coma")
+    parser.add_argument('--concurrency', default='50,500',
+                        help="niveles de concurrencia, separados por coma")
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help="segundos por corrida")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="factor de tamaño de los archivos del build")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_servers.json',
+                        help="archivo JSON de resultados")
+    parser.add_argument('--baseline',
+                        help="JSON de una corrida anterior para comparar")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="empeoramiento relativo tolerado frente al baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    servers = [s.strip() for s in args.servers.split(',') if s.strip()]
+    unknown = [s for s in servers if s not in SERVERS]
+    if unknown:
+        print(f"❌ Servidores desconocidos: {', '.join(unknown)}")
+        print(f"💡 Disponibles: {', '.join(SERVERS)}")
+        sys.exit(2)
+    levels = [int(c) for c in args.concurrency.split(',')]
+    if port_in_use():
+        print(f"❌ El puerto {PORT} está ocupado, detén el servidor que lo usa")
+        sys.exit(2)
+
+    root = tempfile.mkdtemp(prefix='sutodero-bench-')
+    results = []
+    try:
+        web = make_build(root, scale=args.scale, seed=args.seed)
+        print(f"📦 Build sintético en {web}")
+        for name in servers:
+            for concurrency in levels:
+                # Cada nivel arranca un proceso nuevo para que 'cold' sea frío
+                proc = start_server(name, root, web)
+                if proc is None:
+                    print(f"❌ {name} no arrancó")
+                    break
+                etags = {}
+                try:
+                    for phase, use_etags in (('cold', False), ('warm', True)):
+                        summary = asyncio.run(load(concurrency, args.duration,
+                                                   etags, use_etags, args.seed))
+                        result = dict(server=name, phase=phase,
+                                      concurrency=concurrency, **summary)
+                        results.append(result)
+                        print(f"⏱️  {name:<22} {phase:<4} c={concurrency:<4} "
+                              f"{result['rps']:>8.1f} req/s  "
+                              f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  "
+                              f"p99 {result['p99_ms']} ms  "
+                              f"{result['bytes_per_s'] / 1e6:.1f} MB/s  "
+                              f"errores {result['error_rate']:.1%}")
+                finally:
+                    stop_server(proc)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'duration': args.duration,
+            'scale': args.scale,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for result, metric, old, new in regressions:
+            print(f"⚠️  Regresión {result['server']} {result['phase']} "
+                  f"c={result['concurrency']}: {metric} {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print("✅ Sin regresiones frente al baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Utilidades compartidas por los scripts de mantenimiento de Firestore:
+conexión (producción o emulador local) y escritura masiva en lotes.
+
+BatchWriter agrupa las escrituras en WriteBatch atómicos de hasta 500
+operaciones y los confirma en paralelo con un pool acotado. Un throttle
+adaptativo (AIMD) sube el ritmo mientras los commits salen bien y lo
+reduce a la mitad cuando el backend responde con cuota agotada o
+contención; esos lotes se reintentan con backoff exponencial.
+
+Los recorridos largos usan paginate(): consultas cortas ordenadas por ID
+de documento con start_after, con la página siguiente precargada mientras
+se procesa la actual. CommitTracker guarda en un Checkpoint el último
+cursor cuyas escrituras ya están confirmadas, para retomar tras un corte.
+
+Con FIRESTORE_EMULATOR_HOST definido (p. ej. localhost:8080) se usa el
+emulador local sin credenciales, lo que permite probar los scripts con
+`firebase emulators:start --only firestore`.
+Con FIRESTORE_METRICS=<informe.json> se cuentan las lecturas, escrituras
+y latencias de cada RPC (ver firestore_metrics.py).
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from google.api_core import exceptions as gexc
+
+CREDENTIALS_PATH = "/opt/flutter/firebase-admin-sdk.json"
+EMULATOR_PROJECT = "demo-sutodero"
+
+# Límite de Firestore por commit
+MAX_BATCH_SIZE = 500
+COMMIT_WORKERS = 8
+# Escrituras por segundo: arranque según la regla 500/50/5 de Firestore
+INITIAL_RATE = 500.0
+MIN_RATE = 20.0
+MAX_RATE = 10000.0
+MAX_RETRIES = 8
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+PAGE_SIZE = 500
+PREFETCH_PAGES = 2
+
+# Campo de fecha de modificación que escribe la app en cada colección.
+# Según la versión se guarda como Timestamp o como texto ISO-8601 local.
+CHANGE_FIELDS = {
+    'properties': 'fechaActualizacion',
+    'rooms': 'fechaActualizacion',
+    'tickets': 'fechaActualizacion',
+    'property_listings': 'fechaActualizacion',
+    'inventory_acts': 'updatedAt',
+    # Los tours no se editan: basta con detectar los nuevos
+    'virtual_tours': 'created_at',
+}
+# Margen sobre la marca de agua por desfase de relojes de los clientes
+WATERMARK_MARGIN = timedelta(minutes=5)
+# Las fechas ISO se guardan en la hora local del dispositivo, sin zona
+ISO_MARGIN = timedelta(hours=14)
+
+# Errores transitorios: cuota, contención o backend no disponible
+RETRYABLE_ERRORS = (
+    gexc.ResourceExhausted,
+    gexc.Aborted,
+    gexc.DeadlineExceeded,
+    gexc.ServiceUnavailable,
+    gexc.InternalServerError,
+    gexc.TooManyRequests,
+)
+# Los que indican que hay que bajar el ritmo
+THROTTLE_ERRORS = (gexc.ResourceExhausted, gexc.TooManyRequests, gexc.Aborted)
+
+
+def using_emulator():
+    return bool(os.environ.get("FIRESTORE_EMULATOR_HOST"))
+
+
+def connect(credentials_path=CREDENTIALS_PATH):
+    """Cliente de Firestore: emulador si está configurado, si no Admin SDK.
+
+    Con FIRESTORE_METRICS definido el cliente sale instrumentado
+    (firestore_metrics.py).
+    """
+    from firestore_metrics import attach
+    if using_emulator():
+        from google.cloud import firestore as gfirestore
+        project = (os.environ.get("GCLOUD_PROJECT")
+                   or os.environ.get("GOOGLE_CLOUD_PROJECT")
+                   or EMULATOR_PROJECT)
+        # El cliente detecta FIRESTORE_EMULATOR_HOST y no pide credenciales
+        return attach(gfirestore.Client(project=project))
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(credentials.Certificate(credentials_path))
+    return attach(firestore.client())
+
+
+class AdaptiveThrottle:
+    """Token bucket cuyo ritmo se ajusta con AIMD.
+
+    Cada commit correcto suma ``increase`` escrituras/s; un error de cuota
+    o contención divide el ritmo por dos (nunca por debajo de min_rate).
+    """
+
+    def __init__(self, rate=INITIAL_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE,
+                 increase=25.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.throttled = 0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, count):
+        """Bloquea hasta poder hacer count escrituras"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                # Se permite una ráfaga de hasta un segundo de escrituras
+                self._tokens = min(self._tokens + (now - self._updated) * self.rate,
+                                   max(self.rate, count))
+                self._updated = now
+                if self._tokens >= count:
+                    self._tokens -= count
+                    return
+                wait = (count - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def backoff(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.throttled += 1
+
+
+class BatchWriter:
+    """Escrituras masivas en lotes atómicos confirmados en paralelo.
+
+    update/set/delete son seguros entre hilos. Los lotes llenos se envían
+    al pool en cuanto se completan; como mucho 2 * workers lotes esperan a
+    la vez, así que quien produce las escrituras se frena si el backend no
+    da abasto. Si un lote falla por un error no transitorio (por ejemplo
+    un documento borrado entre la lectura y el update) se parte en dos
+    hasta aislar los documentos culpables, que quedan en ``failures``.
+    """
+
+    def __init__(self, db, batch_size=MAX_BATCH_SIZE, workers=COMMIT_WORKERS,
+                 throttle=None, max_retries=MAX_RETRIES, on_commit=None):
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size debe estar entre 1 y {MAX_BATCH_SIZE}")
+        self.db = db
+        self.batch_size = batch_size
+        self.throttle = throttle if throttle is not None else AdaptiveThrottle()
+        self.max_retries = max_retries
+        # Llamado con la lista de operaciones de cada lote confirmado
+        self.on_commit = on_commit
+        self.writes = 0
+        self.batches = 0
+        self.retries = 0
+        self.failures = []
+        self._ops = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(2 * workers)
+        self._pending = []
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="firestore-commit")
+
+    def update(self, ref, data, option=None):
+        # option: precondition de db.write_option(), p. ej. last_update_time
+        self._add(('update', ref, data, option))
+
+    def set(self, ref, data, merge=False):
+        self._add(('set', ref, data, merge))
+
+    def delete(self, ref):
+        self._add(('delete', ref))
+
+    def _add(self, op):
+        with self._lock:
+            self._ops.append(op)
+            if len(self._ops) < self.batch_size:
+                return
+            ops, self._ops = self._ops, []
+        self._submit(ops)
+
+    def _submit(self, ops):
+        self._slots.acquire()
+        future = self._executor.submit(self._commit, ops)
+        future.add_done_callback(lambda _f: self._slots.release())
+        with self._lock:
+            self._pending = [f for f in self._pending if not f.done()]
+            self._pending.append(future)
+
+    def _commit(self, ops):
+        attempt = 0
+        while True:
+            self.throttle.acquire(len(ops))
+            batch = self.db.batch()
+            for op in ops:
+                if op[0] == 'update':
+                    batch.update(op[1], op[2], option=op[3])
+                elif op[0] == 'set':
+                    batch.set(op[1], op[2], merge=op[3])
+                else:
+                    batch.delete(op[1])
+            try:
+                batch.commit()
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, THROTTLE_ERRORS):
+                    self.throttle.backoff()
+                attempt += 1
+                if attempt > self.max_retries:
+                    self._fail(ops, e)
+                    return
+                with self._lock:
+                    self.retries += 1
+                # Backoff exponencial con jitter completo
+                time.sleep(random.uniform(0, min(BACKOFF_MAX,
+                                                 BACKOFF_BASE * 2 ** attempt)))
+                continue
+            except gexc.GoogleAPICallError as e:
+                if len(ops) == 1:
+                    self._fail(ops, e)
+                    return
+                middle = len(ops) // 2
+                self._commit(ops[:middle])
+                self._commit(ops[middle:])
+                return
+            self.throttle.success()
+            with self._lock:
+                self.writes += len(ops)
+                self.batches += 1
+            if self.on_commit is not None:
+                self.on_commit(ops)
+            return
+
+    def _fail(self, ops, error):
+        with self._lock:
+            self.failures.extend((op[1].path, error) for op in ops)
+
+    def flush(self):
+        """Envía el lote parcial y espera a que terminen todos los commits"""
+        with self._lock:
+            ops, self._ops = self._ops, []
+        if ops:
+            self._submit(ops)
+        while True:
+            with self._lock:
+                pending = [f for f in self._pending if not f.done()]
+                self._pending = pending
+            if not pending:
+                return
+            for future in pending:
+                future.result()
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def retry_call(fn, max_retries=MAX_RETRIES):
+    """Llama fn() reintentando los errores transitorios con backoff"""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except RETRYABLE_ERRORS:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+
+def count(query):
+    """Número de documentos de query con una agregación COUNT.
+
+    Se cobra una lectura por cada 1000 entradas de índice, sin descargar
+    ningún documento.
+    """
+    result = retry_call(lambda: query.count(alias='n').get())
+    return int(result[0][0].value)
+
+
+def changed_since(query, field, watermark, fields=None):
+    """Documentos de query cuyo campo de fecha es posterior a watermark.
+
+    Firestore no permite filtrar por el update_time del documento, así que
+    se usa el campo de fecha de la app, como Timestamp y como texto ISO.
+    fields proyecta los campos a descargar (None: documento completo).
+    """
+    docs = {}
+    iso_watermark = (watermark - ISO_MARGIN).strftime('%Y-%m-%dT%H:%M:%S')
+    for value in (watermark, iso_watermark):
+        changed = query.where(field, '>', value)
+        if fields is not None:
+            changed = changed.select(fields)
+        for doc in retry_call(lambda: list(changed.stream())):
+            docs[doc.reference.path] = doc
+    return list(docs.values())
+
+
+def paginate(query, page_size=PAGE_SIZE, start_after=None, prefetch=PREFETCH_PAGES):
+    """Recorre query por páginas ordenadas por ID de documento.
+
+    Cada página es una consulta corta (nada de streams de larga duración)
+    que empieza después del último ID visto, o de ``start_after`` (una
+    DocumentReference, p. ej. la del cursor de un checkpoint). Un hilo
+    precarga hasta ``prefetch`` páginas, así que la memoria queda acotada
+    sea cual sea el tamaño de la colección. Genera listas de snapshots.
+    """
+    query = query.order_by('__name__').limit(page_size)
+    pages = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+
+    def fetch():
+        cursor = start_after
+        try:
+            while not stop.is_set():
+                page_query = query
+                if cursor is not None:
+                    page_query = query.start_after({'__name__': cursor})
+                page = retry_call(lambda: list(page_query.stream()))
+                if page:
+                    cursor = page[-1].reference
+                    pages.put(page)
+                if len(page) < page_size:
+                    break
+        except Exception as e:
+            pages.put(e)
+            return
+        if not stop.is_set():
+            pages.put(None)
+
+    threading.Thread(target=fetch, name="firestore-prefetch", daemon=True).start()
+    try:
+        while True:
+            page = pages.get()
+            if page is None:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()
+        # Libera al hilo si está bloqueado en put()
+        while not pages.empty():
+            pages.get_nowait()
+
+
+class Checkpoint:
+    """Estado de un recorrido en un JSON local, escrito de forma atómica.
+
+    ``data`` es {colección: {"cursor": último ID confirmado, "done": bool}}.
+    ``key`` identifica el destino (proyecto, parámetros); un checkpoint de
+    otro destino se ignora.
+    """
+
+    def __init__(self, path, key=None):
+        self.path = path
+        self.key = key
+        self.data = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get('key') == key:
+            self.data = saved.get('collections', {})
+
+    def cursor(self, collection):
+        return self.data.get(collection, {}).get('cursor')
+
+    def done(self, collection):
+        return self.data.get(collection, {}).get('done', False)
+
+    def update(self, collection, cursor=None, done=None):
+        with self._lock:
+            entry = self.data.setdefault(collection, {})
+            if cursor is not None:
+                entry['cursor'] = cursor
+            if done is not None:
+                entry['done'] = done
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'key': self.key, 'collections': self.data}, f, indent=2)
+            os.replace(tmp, self.path)
+
+    def clear(self):
+        with self._lock:
+            self.data = {}
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class CommitTracker:
+    """Avanza el checkpoint cuando las escrituras de una página se confirman.
+
+    Registra cada página con las rutas de los documentos que va a escribir
+    (antes de encolarlas) y pasa committed() como on_commit del
+    BatchWriter. El cursor de una colección solo avanza hasta la última
+    página cuyas escrituras, y las de todas las anteriores, ya están
+    confirmadas. Una escritura que falla deja el cursor detenido, de modo
+    que la siguiente ejecución vuelve a pasar por ese documento.
+    """
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+        # colección -> OrderedDict(página -> [escrituras pendientes, último ID])
+        self._pages = {}
+        self._page_of = {}
+        self._finished = set()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def page(self, collection, last_id, paths):
+        with self._lock:
+            self._counter += 1
+            page_id = self._counter
+            pages = self._pages.setdefault(collection, OrderedDict())
+            pages[page_id] = [len(paths), last_id]
+            for path in paths:
+                self._page_of[path] = (collection, page_id)
+        self._advance(collection)
+
+    def finish(self, collection):
+        """El recorrido de collection terminó (sus escrituras pueden seguir)"""
+        with self._lock:
+            self._finished.add(collection)
+        self._advance(collection)
+
+    def committed(self, ops):
+        touched = set()
+        with self._lock:
+            for op in ops:
+                collection, page_id = self._page_of.pop(op[1].path, (None, None))
+                if collection is None:
+                    continue
+                self._pages[collection][page_id][0] -= 1
+                touched.add(collection)
+        for collection in touched:
+            self._advance(collection)
+
+    def _advance(self, collection):
+        with self._lock:
+            pages = self._pages.get(collection, OrderedDict())
+            cursor = None
+            while pages:
+                page_id, (pending, last_id) = next(iter(pages.items()))
+                if pending:
+                    break
+                pages.popitem(last=False)
+                cursor = last_id
+            done = not pages and collection in self._finished
+            if done:
+                self._finished.discard(collection)
+            # Bajo el lock: dos hilos no pueden guardar cursores desordenados
+            if cursor is not None or done:
+                self.checkpoint.update(collection, cursor=cursor, done=done or None)
@@ -0,0 +1,652 @@
+#!/usr/bin/env python3
+"""
+Genera firestore.indexes.json a partir de las consultas reales de la app.
+
+Recorre lib/services/*.dart (y lo que se pase con --include), extrae cada
+cadena collection(...)/collectionGroup(...) → where(...) → orderBy(...) y
+deduce la forma de cada consulta. Se siguen:
+
+  - constantes de la clase o locales (_collection, final field = a ? 'x' : 'y');
+  - variables de consulta, incluidas las que se amplían en un if
+    (query = query.where(...)): se generan todas las variantes;
+  - Filter.or(...): cada rama necesita su propio índice;
+  - subcolecciones (doc(...).collection('messages')).
+
+Una consulta necesita índice compuesto cuando combina más de un campo con
+un orderBy o un filtro de rango/desigualdad; las que solo tienen
+igualdades las resuelve Firestore mezclando índices de un campo. Las de
+igualdades más orderBy también se pueden servir mezclando índices
+(a, orden) y (b, orden), así que las variantes de los if opcionales se
+cubren con el conjunto mínimo de índices en vez de uno por variante.
+
+Con un firestore.indexes.json existente (--check) se informan los índices
+que faltan, los que ninguna consulta usa y los redundantes (duplicados,
+de un solo campo, que Firestore crea solo, o prefijos que sirve la mezcla
+de otros índices del archivo); termina con código 1 si falta
+alguno, para usarlo en CI.
+
+    python3 scripts/firestore_indexes.py                  # escribe firestore.indexes.json
+    python3 scripts/firestore_indexes.py --check          # solo compara
+    python3 scripts/firestore_indexes.py --include 'lib/screens/**/*.dart'
+    firebase deploy --only firestore:indexes              # vía firebase.json
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import re
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SOURCES = ['lib/services/*.dart']
+# Variantes máximas por consulta (combinaciones de if y constantes)
+MAX_VARIANTS = 64
+
+EQUALITY_OPS = {
+    'isEqualTo': '==',
+    'isNull': '==',
+    'whereIn': 'in',
+    'arrayContains': 'array-contains',
+    'arrayContainsAny': 'array-contains-any',
+}
+RANGE_OPS = {
+    'isNotEqualTo': '!=',
+    'isLessThan': '<',
+    'isLessThanOrEqualTo': '<=',
+    'isGreaterThan': '>',
+    'isGreaterThanOrEqualTo': '>=',
+    'whereNotIn': 'not-in',
+}
+ARRAY_OPS = {'array-contains', 'array-contains-any'}
+# Métodos de Query que no cambian el índice necesario
+PASSTHROUGH = {'limit', 'limitToLast', 'startAt', 'startAfter', 'endAt',
+               'endBefore', 'withConverter', 'startAtDocument',
+               'startAfterDocument', 'endAtDocument', 'endBeforeDocument'}
+
+TOKEN_RE = re.compile(r"""
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<string>r?'''.*?'''|r?\"\"\".*?\"\"\"|r?'(?:[^'\\\n]|\\.)*'|r?"(?:[^"\\\n]|\\.)*")
+  | (?P<name>[A-Za-z_$][A-Za-z0-9_$]*)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<op>=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.|[{}()\[\];:,.=<>!?+\-*/%&|^~@#])
+""", re.S | re.X)
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    line = 1
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if match is None:
+            # Carácter que no interesa (p. ej. unicode fuera de cadenas)
+            position += 1
+            continue
+        if match.lastgroup != 'space':
+            tokens.append((match.lastgroup, match.group(), line))
+        line += match.group().count('\n')
+        position = match.end()
+    return tokens
+
+
+def literal(token):
+    """Valor de una cadena literal sin interpolación, o None"""
+    kind, text, _line = token
+    if kind != 'string':
+        return None
+    raw = text.startswith('r')
+    body = text[1:] if raw else text
+    quote = 3 if body[:3] in ("'''", '"""') else 1
+    value = body[quote:-quote]
+    if not raw and '$' in value:
+        return None
+    return value
+
+
+def matching(tokens, start):
+    """Índice del cierre del paréntesis/corchete/llave abierto en start"""
+    depth = 0
+    for j in range(start, len(tokens)):
+        if tokens[j][1] in ('(', '[', '{'):
+            depth += 1
+        elif tokens[j][1] in (')', ']', '}'):
+            depth -= 1
+            if depth == 0:
+                return j
+    return len(tokens) - 1
+
+
+def split_arguments(tokens):
+    """Argumentos (listas de tokens) separados por comas de primer nivel"""
+    args = []
+    current = []
+    depth = 0
+    for token in tokens:
+        if token[1] in ('(', '[', '{'):
+            depth += 1
+        elif token[1] in (')', ']', '}'):
+            depth -= 1
+        if token[1] == ',' and depth == 0:
+            args.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        args.append(current)
+    return args
+
+
+class Query:
+    """Forma de una consulta: colección, filtros y orden"""
+
+    def __init__(self, collection, group=False, filters=(), orders=()):
+        self.collection = collection
+        self.group = group
+        self.filters = tuple(filters)
+        self.orders = tuple(orders)
+
+    def key(self):
+        return (self.collection, self.group, self.filters, self.orders)
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def extend(self, filters=(), orders=()):
+        return Query(self.collection, self.group, self.filters + tuple(filters),
+                     self.orders + tuple(orders))
+
+    def index_parts(self):
+        """(igualdades, resto) del índice compuesto que necesita, o None.
+
+        igualdades son los campos filtrados con == o array-contains, en
+        orden alfabético; resto, los de desigualdad y orderBy en su orden.
+        """
+        equality = {}
+        ranges = []
+        for field, op in self.filters:
+            if op in RANGE_OPS.values():
+                if field not in ranges:
+                    ranges.append(field)
+            else:
+                equality[field] = 'CONTAINS' if op in ARRAY_OPS else 'ASCENDING'
+        orders = list(self.orders)
+        ordered = [field for field, _direction in orders]
+        # Firestore ordena primero por los campos con desigualdad
+        orders = [(f, 'ASCENDING') for f in ranges if f not in ordered] + orders
+        orders = [(f, d) for f, d in orders if f not in equality or f in ranges]
+        prefix = tuple((f, equality[f]) for f in sorted(equality) if f != '__name__')
+        suffix = tuple((f, d) for f, d in orders if f != '__name__')
+        if not suffix or len(prefix) + len(suffix) < 2:
+            return None
+        return prefix, suffix
+
+    def index(self):
+        """Campos del índice compuesto que necesita, o None"""
+        parts = self.index_parts()
+        return None if parts is None else parts[0] + parts[1]
+
+    def mergeable(self):
+        """Si Firestore puede servirla mezclando índices de una igualdad:
+        solo igualdades (==) más orderBy, sin desigualdades"""
+        return not any(op in RANGE_OPS.values() or op in ARRAY_OPS
+                       for _field, op in self.filters)
+
+    def describe(self):
+        parts = [f"{f} {op}" for f, op in self.filters]
+        parts += [f"orderBy {f}{' desc' if d == 'DESCENDING' else ''}"
+                  for f, d in self.orders]
+        return f"{self.collection}: " + (', '.join(parts) or '(todo)')
+
+
+class Extractor:
+    """Encuentra las consultas de un archivo Dart"""
+
+    def __init__(self, tokens, source):
+        self.tokens = tokens
+        self.source = source
+        self.constants = {}     # nombre -> [valores]
+        self.variables = {}     # nombre -> [Query]
+        self.fields = set()     # nombres declarados en la clase
+        self.queries = []       # (Query, línea)
+        self.unresolved = []    # (línea, motivo)
+
+    def text(self, i):
+        return self.tokens[i][1] if i < len(self.tokens) else None
+
+    def closing(self, i):
+        return matching(self.tokens, i)
+
+    def arguments(self, start, end):
+        return split_arguments(self.tokens[start + 1:end])
+
+    def values(self, tokens):
+        """Valores posibles de una expresión de texto, o None"""
+        if len(tokens) == 1:
+            value = literal(tokens[0])
+            if value is not None:
+                return [value]
+            return self.constants.get(tokens[0][1])
+        if len(tokens) >= 2 and tokens[0][1] == 'FieldPath' and tokens[-1][1] == 'documentId':
+            return ['__name__']
+        # cond ? 'a' : 'b'
+        texts = [t[1] for t in tokens]
+        if '?' in texts and ':' in texts[texts.index('?'):]:
+            q = texts.index('?')
+            c = texts.index(':', q)
+            a = self.values(tokens[q + 1:c])
+            b = self.values(tokens[c + 1:])
+            if a is not None and b is not None:
+                return a + b
+        return None
+
+    def run(self):
+        depth = 0
+        i = 0
+        tokens = self.tokens
+        while i < len(tokens):
+            text = tokens[i][1]
+            if text == '{':
+                depth += 1
+            elif text == '}':
+                depth -= 1
+                if depth <= 1:
+                    # Fin de un método: sus variables locales ya no existen
+                    self.variables = {k: v for k, v in self.variables.items()
+                                      if k in self.fields}
+                    self.constants = {k: v for k, v in self.constants.items()
+                                      if k in self.fields}
+            if tokens[i][0] == 'name' and self.text(i - 1) != '.':
+                i = self.statement(i, depth)
+                continue
+            i += 1
+        return self
+
+    def statement(self, i, depth):
+        """Procesa lo que empieza en el nombre de la posición i"""
+        name = self.text(i)
+        # Constantes: NAME = 'x' / NAME = c ? 'x' : 'y' (hasta ';')
+        if self.text(i + 1) == '=' and self.text(i - 1) != '.':
+            end = i + 2
+            while end < len(self.tokens) and self.text(end) not in (';',):
+                if self.text(end) in ('(', '[', '{'):
+                    end = self.closing(end)
+                end += 1
+            if depth <= 1:
+                self.fields.add(name)
+            values = self.values(self.tokens[i + 2:end])
+            if values is not None:
+                self.constants[name] = values
+                return end
+            chain = self.chain(i + 2, end)
+            if chain is not None:
+                queries, stop = chain
+                line = self.tokens[i][2]
+                self.queries += [(query, line) for query in queries]
+                # Solo es una variable de consulta si no se ejecutó (get, snapshots)
+                if stop >= end:
+                    self.assign(name, queries)
+                return end
+            return i + 1
+        # Getters: get NAME => chain
+        if self.text(i - 1) == 'get' and self.text(i + 1) == '=>':
+            end = i + 2
+            while end < len(self.tokens) and self.text(end) != ';':
+                end += 1
+            chain = self.chain(i + 2, end)
+            if chain is not None:
+                self.fields.add(name)
+                self.variables[name] = chain[0]
+                return end
+            return i + 1
+        # for (final field in ['a', 'b'])
+        if name == 'for' and self.text(i + 1) == '(':
+            end = self.closing(i + 1)
+            texts = [t[1] for t in self.tokens[i + 2:end]]
+            if 'in' in texts:
+                k = texts.index('in')
+                var = texts[k - 1]
+                items = self.tokens[i + 2 + k + 1:end]
+                if items and items[0][1] == '[':
+                    values = [literal(t) for t in items[1:-1] if t[1] != ',']
+                    if values and None not in values:
+                        self.constants[var] = values
+            return i + 1
+        chain = self.chain(i, len(self.tokens))
+        if chain is None:
+            return i + 1
+        queries, stop = chain
+        line = self.tokens[i][2]
+        for query in queries:
+            self.queries.append((query, line))
+        return stop
+
+    def assign(self, name, queries):
+        previous = self.variables.get(name, [])
+        # query = query.where(...): ampliación opcional de la misma variable
+        self.variables[name] = previous + [q for q in queries if q not in previous]
+
+    def chain(self, i, end):
+        """Consultas de la cadena que empieza en i, y dónde termina"""
+        tokens = self.tokens
+        queries = None
+        j = i
+        # Base: una variable conocida o algo.collection(...)
+        while j < end:
+            name = self.text(j)
+            if name in self.variables and self.text(j - 1) != '.':
+                queries = list(self.variables[name])
+                j += 1
+                break
+            if name == '.' and self.text(j + 1) in ('collection', 'collectionGroup') \
+                    and self.text(j + 2) == '(':
+                break
+            if tokens[j][0] != 'name' and name not in ('.',):
+                return None
+            j += 1
+        else:
+            return None
+        while j < end and self.text(j) == '.' and self.text(j + 2) == '(':
+            method = self.text(j + 1)
+            close = self.closing(j + 2)
+            args = self.arguments(j + 2, close)
+            line = tokens[j][2]
+            if method in ('collection', 'collectionGroup'):
+                names = self.values(args[0]) if args else None
+                if names is None:
+                    self.unresolved.append((line, "colección no resuelta"))
+                    return None
+                queries = [Query(n, method == 'collectionGroup') for n in names]
+            elif queries is None:
+                return None
+            elif method == 'doc':
+                # Un documento: solo sigue siendo consulta si abre una subcolección
+                if self.text(close + 1) != '.' or self.text(close + 2) != 'collection':
+                    return [], close + 1
+            elif method == 'where':
+                filters = self.filters(args, line)
+                if filters is None:
+                    return None
+                queries = [q.extend(filters=f) for q in queries for f in filters]
+            elif method == 'orderBy':
+                fields = self.values(args[0]) if args else None
+                if fields is None:
+                    self.unresolved.append((line, "orderBy no resuelto"))
+                    return None
+                descending = any(len(a) >= 3 and a[0][1] == 'descending'
+                                 and a[2][1] == 'true' for a in args[1:])
+                direction = 'DESCENDING' if descending else 'ASCENDING'
+                queries = [q.extend(orders=[(f, direction)]) for q in queries
+                           for f in fields]
+            elif method not in PASSTHROUGH:
+                break
+            queries = queries[:MAX_VARIANTS]
+            j = close + 1
+        if queries is None:
+            return None
+        return queries, j
+
+    def filters(self, args, line):
+        """Alternativas de filtros de un where(...): lista de listas"""
+        if not args:
+            return None
+        first = args[0]
+        if first and first[0][1] == '(':
+            # Iterable.where((x) => ...), no es Firestore
+            return None
+        if first and first[0][1] == 'Filter':
+            return self.filter_expression(first, line)
+        fields = self.values(first)
+        if fields is None:
+            self.unresolved.append((line, "campo de where no resuelto"))
+            return None
+        op = None
+        for arg in args[1:]:
+            if len(arg) >= 2 and arg[1][1] == ':':
+                key = arg[0][1]
+                op = EQUALITY_OPS.get(key) or RANGE_OPS.get(key)
+                if key == 'isNull' and arg[2:] and arg[2][1] == 'false':
+                    op = '!='
+        if op is None:
+            return None
+        return [[(field, op)] for field in fields]
+
+    def filter_expression(self, tokens, line):
+        """Filter(...), Filter.and(...) y Filter.or(...) en alternativas"""
+        texts = [t[1] for t in tokens]
+        if texts[:3] in (['Filter', '.', 'or'], ['Filter', '.', 'and']):
+            kind, offset = texts[2], 3
+        elif texts[:2] == ['Filter', '(']:
+            kind, offset = None, 1
+        else:
+            return None
+        args = split_arguments(tokens[offset + 1:matching(tokens, offset)])
+        if kind is None:
+            return self.filters(args, line)
+        parts = []
+        for arg in args:
+            alternatives = self.filter_expression(arg, line)
+            if alternatives is None:
+                return None
+            parts.append(alternatives)
+        if kind == 'or':
+            return [alt for part in parts for alt in part]
+        return [sum(combo, []) for combo in itertools.product(*parts)]
+
+
+def extract(paths):
+    """(consultas, no resueltas) de todos los archivos"""
+    queries = []
+    unresolved = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            extractor = Extractor(tokenize(f.read()), path).run()
+        rel = os.path.relpath(path, REPO)
+        queries += [(query, f"{rel}:{line}") for query, line in extractor.queries]
+        unresolved += [(f"{rel}:{line}", reason) for line, reason in extractor.unresolved]
+    return queries, unresolved
+
+
+def index_key(collection, scope, fields):
+    return (collection, scope, tuple(fields))
+
+
+def minimal_prefixes(shapes):
+    """Conjunto mínimo de prefijos de igualdad que cubre shapes mezclando.
+
+    Cada forma (frozenset de campos) debe ser la unión de prefijos elegidos
+    contenidos en ella: Firestore combina los índices (a, orden) y
+    (b, orden) para servir a == y b == con ese orden. Los candidatos son
+    las propias formas y sus campos sueltos; se busca por tamaño creciente
+    (los grupos son pequeños) y, a igual número de índices, con menos
+    campos. Devuelve {prefijo: [formas que lo usan]}.
+    """
+    shapes = sorted(set(shapes), key=lambda shape: (len(shape), sorted(shape)))
+    candidates = sorted({frozenset([f]) for shape in shapes for f in shape}
+                        | set(shapes), key=lambda c: (len(c), sorted(c)))
+
+    def covers(chosen, shape):
+        parts = [c for c in chosen if c <= shape]
+        return frozenset().union(*parts) == shape
+
+    for size in range(1, len(shapes) + 1):
+        best = None
+        for chosen in itertools.combinations(candidates, size):
+            if all(covers(chosen, shape) for shape in shapes):
+                weight = sum(len(c) for c in chosen)
+                if best is None or weight < best[0]:
+                    best = (weight, chosen)
+        if best is not None:
+            return {c: [shape for shape in shapes if c <= shape] for c in best[1]}
+    return {shape: [shape] for shape in shapes}
+
+
+def required_indexes(queries):
+    """{clave: [ubicaciones]} del conjunto mínimo de índices compuestos.
+
+    Las consultas de solo igualdades con el mismo orden se agrupan y se
+    cubren con minimal_prefixes(): cada if opcional de la app ya no añade
+    su propio índice. El resto necesita su índice exacto.
+    """
+    indexes = {}
+    groups = {}
+    for query, where in queries:
+        parts = query.index_parts()
+        if parts is None:
+            continue
+        prefix, suffix = parts
+        scope = 'COLLECTION_GROUP' if query.group else 'COLLECTION'
+        if query.mergeable() and prefix:
+            group = groups.setdefault((query.collection, scope, suffix), {})
+            group.setdefault(frozenset(f for f, _d in prefix), []).append(where)
+            continue
+        indexes.setdefault(index_key(query.collection, scope, prefix + suffix),
+                           []).append(where)
+    for (collection, scope, suffix), shapes in groups.items():
+        for chosen, users in minimal_prefixes(shapes).items():
+            fields = tuple((f, 'ASCENDING') for f in sorted(chosen)) + suffix
+            wheres = indexes.setdefault(index_key(collection, scope, fields), [])
+            wheres += [where for shape in users for where in shapes[shape]]
+    return indexes
+
+
+def to_json(key):
+    collection, scope, fields = key
+    return {
+        'collectionGroup': collection,
+        'queryScope': scope,
+        'fields': [{'fieldPath': f, 'arrayConfig': 'CONTAINS'} if d == 'CONTAINS'
+                   else {'fieldPath': f, 'order': d} for f, d in fields],
+    }
+
+
+def from_json(index):
+    fields = []
+    for field in index.get('fields', []):
+        if field.get('fieldPath') == '__name__':
+            continue
+        fields.append((field['fieldPath'],
+                       'CONTAINS' if field.get('arrayConfig') else field.get('order')))
+    return index_key(index['collectionGroup'], index.get('queryScope', 'COLLECTION'),
+                     fields)
+
+
+def merge_cover(key, keys):
+    """Índices de keys cuya mezcla sirve lo mismo que key, o None.
+
+    key = (igualdades..., orden...): si para algún corte hay otros índices
+    con el mismo orden cuyas igualdades (ascendentes, sin arrays) están
+    contenidas en las de key y entre todos las cubren, key sobra.
+    """
+    collection, scope, fields = key
+    for cut in range(len(fields) - 1, 1, -1):
+        prefix, suffix = fields[:cut], fields[cut:]
+        if any(d != 'ASCENDING' for _f, d in prefix):
+            continue
+        wanted = {f for f, _d in prefix}
+        parts = [other for other in keys
+                 if other != key and other[:2] == (collection, scope)
+                 and len(other[2]) > len(suffix) and other[2][-len(suffix):] == suffix
+                 and all(d == 'ASCENDING' for _f, d in other[2][:-len(suffix)])
+                 and {f for f, _d in other[2][:-len(suffix)]} < wanted]
+        covered = set()
+        for other in parts:
+            covered |= {f for f, _d in other[2][:-len(suffix)]}
+        if covered == wanted:
+            return parts
+    return None
+
+
+def compare(existing, required):
+    """(faltan, sin uso, redundantes) respecto a un indexes.json existente"""
+    keys = [from_json(index) for index in existing.get('indexes', [])]
+    seen = set()
+    redundant = []
+    for key in keys:
+        if key in seen:
+            redundant.append((key, "duplicado"))
+        elif len(key[2]) < 2:
+            redundant.append((key, "un solo campo; Firestore lo crea solo"))
+        else:
+            cover = merge_cover(key, keys)
+            if cover:
+                redundant.append((key, "prefijo cubierto mezclando "
+                                  + " + ".join(describe(other) for other in cover)))
+        seen.add(key)
+    missing = [key for key in required if key not in seen]
+    unused = [key for key in seen if key not in required and len(key[2]) >= 2]
+    return missing, unused, redundant
+
+
+def describe(key):
+    collection, scope, fields = key
+    group = ' (grupo)' if scope == 'COLLECTION_GROUP' else ''
+    return f"{collection}{group}: " + ', '.join(
+        f"{f} {d.lower()}" for f, d in fields)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Genera firestore.indexes.json desde el código")
+    parser.add_argument('--include', action='append', default=[],
+                        help="glob adicional de archivos .dart (relativo al repo)")
+    parser.add_argument('--out', default=os.path.join(REPO, 'firestore.indexes.json'))
+    parser.add_argument('--check', action='store_true',
+                        help="no escribir: comparar con --out y fallar si falta algo")
+    parser.add_argument('--verbose', action='store_true',
+                        help="listar cada consulta encontrada")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = sorted({path for pattern in DEFAULT_SOURCES + args.include
+                    for path in glob.glob(os.path.join(REPO, pattern), recursive=True)})
+    queries, unresolved = extract(paths)
+    required = required_indexes(queries)
+    print(f"🔍 {len(queries)} consultas en {len(paths)} archivos, "
+          f"{len(required)} índices compuestos necesarios")
+    if args.verbose:
+        for query, where in queries:
+            fields = query.index()
+            print(f"   {'📇' if fields else '  '} {query.describe()}  ({where})")
+    for key, wheres in sorted(required.items()):
+        print(f"   📇 {describe(key)}  ({', '.join(sorted(set(wheres)))})")
+    for where, reason in unresolved:
+        print(f"   ⚠️  {where}: {reason}")
+
+    existing = None
+    if os.path.exists(args.out):
+        with open(args.out) as f:
+            existing = json.load(f)
+    if existing is not None:
+        missing, unused, redundant = compare(existing, required)
+        for key in missing:
+            print(f"   ➕ falta: {describe(key)}")
+        for key in unused:
+            print(f"   🗑️  sin uso: {describe(key)}")
+        for key, reason in redundant:
+            print(f"   ♻️  redundante: {describe(key)} ({reason})")
+        if args.check:
+            sys.exit(1 if missing else 0)
+    elif args.check:
+        print(f"❌ No existe {args.out}")
+        sys.exit(1)
+
+    output = {
+        'indexes': [to_json(key) for key in sorted(required)],
+        # Se conservan las excepciones de campo que ya estuvieran definidas
+        'fieldOverrides': (existing or {}).get('fieldOverrides', []),
+    }
+    with open(args.out, 'w') as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    print(f"💾 {len(output['indexes'])} índices en {os.path.relpath(args.out, REPO)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Contabilidad de operaciones de Firestore para los scripts de mantenimiento.
+
+Con FIRESTORE_METRICS=<informe.json> en el entorno, connect() instrumenta
+el cliente por debajo de la API pública, en cada RPC que sale hacia
+Firestore, así que cualquier script queda medido sin cambios:
+
+  - lecturas facturables, escrituras, borrados, consultas de agregación y
+    bytes recibidos y enviados, por colección (una consulta sin
+    resultados cuenta una lectura; un COUNT, una por cada 1000 entradas);
+  - histograma de latencia por tipo de RPC (run_query, commit, ...), con
+    los reintentos y errores como llamadas propias;
+  - una línea de progreso en stderr cada FIRESTORE_METRICS_INTERVAL
+    segundos (10 por defecto) con el ritmo de lecturas y escrituras y, si
+    el script declara el trabajo total con expect()/advance(), el ETA;
+  - al terminar, un resumen en pantalla y el informe JSON (incluye la
+    memoria máxima del proceso).
+
+    FIRESTORE_METRICS=migrate.metrics.json python3 scripts/migrate_userid_fields.py
+    python3 scripts/firestore_metrics.py migrate.metrics.json other.metrics.json
+
+El segundo comando compara informes de varias ejecuciones.
+"""
+
+import argparse
+import atexit
+import bisect
+import json
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+REPORT_VERSION = 1
+METRICS_ENV = 'FIRESTORE_METRICS'
+INTERVAL_ENV = 'FIRESTORE_METRICS_INTERVAL'
+DEFAULT_INTERVAL = 10.0
+# Límites superiores de los cubos de latencia, en milisegundos
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+                      10000, 30000, 60000]
+# Entradas de índice por lectura facturada en una agregación
+AGGREGATION_ENTRIES_PER_READ = 1000
+# Métodos del cliente GAPIC que son RPC (el resto se deja pasar)
+RPCS = {'get_document', 'list_documents', 'create_document', 'update_document',
+        'delete_document', 'batch_get_documents', 'begin_transaction', 'commit',
+        'rollback', 'run_query', 'run_aggregation_query', 'partition_query',
+        'list_collection_ids', 'batch_write'}
+COUNTERS = ['reads', 'writes', 'deletes', 'aggregations', 'bytes_received',
+            'bytes_sent']
+
+
+class Histogram:
+    """Latencias en cubos exponenciales fijos"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds, error=False):
+        ms = seconds * 1000
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.errors += bool(error)
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Límite superior (s) del cubo que alcanza la fracción q"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound / 1000, self.max)
+        return self.max
+
+    def to_json(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'seconds': round(self.total, 3),
+            'mean': round(self.total / self.count, 4) if self.count else 0.0,
+            'p50': round(self.percentile(0.50), 4),
+            'p95': round(self.percentile(0.95), 4),
+            'p99': round(self.percentile(0.99), 4),
+            'max': round(self.max, 4),
+            'buckets_ms': [[bound, n] for bound, n in
+                           zip(LATENCY_BUCKETS_MS + [None], self.buckets) if n],
+        }
+
+
+class Metrics:
+    """Contadores por colección, latencias por RPC y progreso; seguro entre hilos"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.started_at = datetime.now(timezone.utc)
+        self.collections = {}
+        self.rpcs = {}
+        self.total = None
+        self.done = 0
+        self.unit = 'documentos'
+        self._lock = threading.Lock()
+
+    def add(self, collection, **counts):
+        with self._lock:
+            entry = self.collections.setdefault(collection or '?',
+                                                dict.fromkeys(COUNTERS, 0))
+            for name, n in counts.items():
+                entry[name] += n
+
+    def rpc(self, name, seconds, error=False):
+        with self._lock:
+            self.rpcs.setdefault(name, Histogram()).record(seconds, error)
+
+    def expect(self, total, unit=None):
+        """Suma total al trabajo esperado (para el ETA)"""
+        with self._lock:
+            self.total = (self.total or 0) + total
+            if unit:
+                self.unit = unit
+
+    def advance(self, n=1):
+        with self._lock:
+            self.done += n
+
+    def totals(self):
+        with self._lock:
+            totals = dict.fromkeys(COUNTERS, 0)
+            for entry in self.collections.values():
+                for name in COUNTERS:
+                    totals[name] += entry[name]
+            return totals
+
+    def eta(self):
+        """Segundos restantes según el ritmo medio, o None"""
+        elapsed = time.monotonic() - self.started
+        if not self.total or not self.done or elapsed <= 0:
+            return None
+        return max(0.0, (self.total - self.done) / (self.done / elapsed))
+
+    def report(self, project=None):
+        elapsed = time.monotonic() - self.started
+        totals = self.totals()
+        with self._lock:
+            rpcs = {name: h.to_json() for name, h in sorted(self.rpcs.items())}
+            collections = {name: dict(entry)
+                           for name, entry in sorted(self.collections.items())}
+        return {
+            'version': REPORT_VERSION,
+            'script': os.path.basename(sys.argv[0]),
+            'argv': sys.argv[1:],
+            'project': project,
+            'emulator': bool(os.environ.get('FIRESTORE_EMULATOR_HOST')),
+            'started': self.started_at.isoformat(),
+            'finished': datetime.now(timezone.utc).isoformat(),
+            'elapsed': round(elapsed, 3),
+            'max_rss_mb': max_rss_mb(),
+            'totals': {**totals,
+                       'rpcs': sum(r['count'] for r in rpcs.values()),
+                       'errors': sum(r['errors'] for r in rpcs.values())},
+            'throughput': {
+                'reads_per_s': round(totals['reads'] / elapsed, 1) if elapsed else 0.0,
+                'writes_per_s': round((totals['writes'] + totals['deletes']) / elapsed, 1)
+                if elapsed else 0.0,
+            },
+            'progress': {'total': self.total, 'done': self.done, 'unit': self.unit},
+            'collections': collections,
+            'rpcs': rpcs,
+        }
+
+
+def max_rss_mb():
+    """Memoria residente máxima del proceso, en MB (None si no se sabe)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux da KB; macOS, bytes
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# --- Lectura de mensajes de la API ------------------------------------------
+
+def _pb(message):
+    """Protobuf crudo de un mensaje proto-plus (o el propio protobuf)"""
+    to_pb = getattr(type(message), 'pb', None)
+    return to_pb(message) if to_pb is not None else message
+
+
+def _size(message):
+    try:
+        return _pb(message).ByteSize()
+    except AttributeError:
+        return 0
+
+
+def _field(request, name):
+    if isinstance(request, dict):
+        return request.get(name)
+    return getattr(request, name, None)
+
+
+def _request(args, kwargs):
+    return kwargs.get('request', args[0] if args else None)
+
+
+def collection_of(name):
+    """Colección de la ruta completa de un documento"""
+    if not name:
+        return None
+    parts = name.split('/documents/', 1)[-1].split('/')
+    return parts[-2] if len(parts) >= 2 else parts[0]
+
+
+def _query_collection(structured_query):
+    if structured_query is None:
+        return None
+    pb = _pb(structured_query)
+    # 'from' es palabra reservada: según la versión el campo es from_
+    sources = pb.from_ if hasattr(pb, 'from_') else getattr(pb, 'from')
+    return sources[0].collection_id if sources else None
+
+
+class _Stream:
+    """Itera la respuesta de un RPC de streaming contando cada mensaje"""
+
+    def __init__(self, iterator, on_response, on_end):
+        self._iterator = iter(iterator)
+        self._source = iterator
+        self._on_response = on_response
+        self._on_end = on_end
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            response = next(self._iterator)
+        except StopIteration:
+            self._finish(False)
+            raise
+        except Exception:
+            self._finish(True)
+            raise
+        self._on_response(response)
+        return response
+
+    def _finish(self, error):
+        if not self._finished:
+            self._finished = True
+            self._on_end(error)
+
+    def __getattr__(self, name):
+        # cancel(), trailing_metadata(), ... del iterador de gRPC
+        return getattr(self._source, name)
+
+
+class InstrumentedAPI:
+    """Envuelve el cliente GAPIC de Firestore (db._firestore_api)"""
+
+    def __init__(self, api, metrics):
+        self._api = api
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        attr = getattr(self._api, name)
+        if name not in RPCS:
+            return attr
+        handler = getattr(self, f'_on_{name}', None)
+
+        def call(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception:
+                self._metrics.rpc(name, time.monotonic() - started, error=True)
+                raise
+            if handler is None:
+                self._metrics.rpc(name, time.monotonic() - started)
+                return result
+            return handler(_request(args, kwargs), result, started)
+        return call
+
+    def _end(self, name, started):
+        return lambda error: self._metrics.rpc(name, time.monotonic() - started, error)
+
+    def _on_run_query(self, request, result, started):
+        collection = _query_collection(_field(request, 'structured_query'))
+        state = {'docs': 0}
+
+        def on_response(response):
+            pb = _pb(response)
+            if pb.HasField('document'):
+                state['docs'] += 1
+                self._metrics.add(collection_of(pb.document.name) or collection,
+                                  reads=1, bytes_received=pb.ByteSize())
+            else:
+                self._metrics.add(collection, bytes_received=pb.ByteSize())
+
+        def on_end(error):
+            if not state['docs'] and not error:
+                # Una consulta sin resultados se cobra como una lectura
+                self._metrics.add(collection, reads=1)
+            self._end('run_query', started)(error)
+        return _Stream(result, on_response, on_end)
+
+    def _on_batch_get_documents(self, request, result, started):
+        def on_response(response):
+            pb = _pb(response)
+            kind = pb.WhichOneof('result')
+            if kind is None:
+                return
+            name = pb.found.name if kind == 'found' else pb.missing
+            self._metrics.add(collection_of(name), reads=1, bytes_received=pb.ByteSize())
+        return _Stream(result, on_response, self._end('batch_get_documents', started))
+
+    def _on_run_aggregation_query(self, request, result, started):
+        aggregation = _field(request, 'structured_aggregation_query')
+        collection = _query_collection(
+            _pb(aggregation).structured_query if aggregation is not None else None)
+        state = {'entries': 0}
+
+        def on_response(response):
+            pb = _pb(response)
+            for value in pb.result.aggregate_fields.values():
+                if value.WhichOneof('value_type') == 'integer_value':
+                    state['entries'] = max(state['entries'], value.integer_value)
+            self._metrics.add(collection, bytes_received=pb.ByteSize())
+
+        def on_end(error):
+            reads = max(1, math.ceil(state['entries'] / AGGREGATION_ENTRIES_PER_READ))
+            self._metrics.add(collection, aggregations=1, reads=reads)
+            self._end('run_aggregation_query', started)(error)
+        return _Stream(result, on_response, on_end)
+
+    def _on_list_documents(self, request, result, started):
+        collection = _field(request, 'collection_id')
+
+        def on_response(document):
+            self._metrics.add(collection_of(_pb(document).name) or collection,
+                              reads=1, bytes_received=_size(document))
+        return _Stream(result, on_response, self._end('list_documents', started))
+
+    def _on_get_document(self, request, result, started):
+        self._metrics.add(collection_of(_pb(result).name), reads=1,
+                          bytes_received=_size(result))
+        self._metrics.rpc('get_document', time.monotonic() - started)
+        return result
+
+    def _count_writes(self, request):
+        for write in _field(request, 'writes') or []:
+            pb = _pb(write)
+            operation = pb.WhichOneof('operation')
+            if operation == 'delete':
+                self._metrics.add(collection_of(pb.delete), deletes=1,
+                                  bytes_sent=pb.ByteSize())
+            else:
+                name = pb.update.name if operation == 'update' else pb.transform.document
+                self._metrics.add(collection_of(name), writes=1, bytes_sent=pb.ByteSize())
+
+    def _on_commit(self, request, result, started):
+        self._metrics.rpc('commit', time.monotonic() - started)
+        self._count_writes(request)
+        return result
+
+    def _on_batch_write(self, request, result, started):
+        self._metrics.rpc('batch_write', time.monotonic() - started)
+        self._count_writes(request)
+        return result
+
+
+# --- Activación desde el entorno ----------------------------------------------
+
+_metrics = None
+
+
+def attach(db):
+    """Instrumenta db si FIRESTORE_METRICS está definido; devuelve db"""
+    global _metrics
+    path = os.environ.get(METRICS_ENV)
+    if not path:
+        return db
+    if _metrics is None:
+        _metrics = Metrics()
+        display = LiveDisplay(_metrics, float(os.environ.get(INTERVAL_ENV)
+                                              or DEFAULT_INTERVAL))
+        display.start()
+        atexit.register(_finish, path, display, db)
+    try:
+        api = db._firestore_api
+    except AttributeError:
+        print("⚠️  Esta versión del cliente no admite métricas de Firestore",
+              file=sys.stderr)
+        return db
+    if not isinstance(api, InstrumentedAPI):
+        # El cliente crea la API una vez y la guarda en este atributo
+        db._firestore_api_internal = InstrumentedAPI(api, _metrics)
+    return db
+
+
+def enabled():
+    return _metrics is not None
+
+
+def expect(total, unit=None):
+    """Declara trabajo pendiente para el ETA (no hace nada sin métricas)"""
+    if _metrics is not None:
+        _metrics.expect(total, unit)
+
+
+def advance(n=1):
+    if _metrics is not None:
+        _metrics.advance(n)
+
+
+def _finish(path, display, db):
+    display.stop()
+    report = _metrics.report(project=getattr(db, 'project', None))
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+    print_report(report, out=sys.stderr)
+    print(f"💾 Informe de operaciones en {path}", file=sys.stderr)
+
+
+def _compact(n):
+    if n >= 1_000_000:
+        return f"{n / 1_000_000:.1f}M"
+    if n >= 10_000:
+        return f"{n / 1000:.1f}k"
+    return str(n)
+
+
+def _clock(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class LiveDisplay:
+    """Línea periódica en stderr con el ritmo actual y el ETA"""
+
+    def __init__(self, metrics, interval=DEFAULT_INTERVAL, out=sys.stderr):
+        self.metrics = metrics
+        self.interval = interval
+        self.out = out
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='firestore-metrics')
+        self._last = (time.monotonic(), 0, 0)
+
+    def start(self):
+        if self.interval > 0:
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def line(self):
+        now = time.monotonic()
+        totals = self.metrics.totals()
+        writes = totals['writes'] + totals['deletes']
+        last_time, last_reads, last_writes = self._last
+        span = max(now - last_time, 1e-9)
+        self._last = (now, totals['reads'], writes)
+        text = (f"📈 {_clock(now - self.metrics.started)} | "
+                f"lecturas {_compact(totals['reads'])} "
+                f"({(totals['reads'] - last_reads) / span:.0f}/s) | "
+                f"escrituras {_compact(writes)} ({(writes - last_writes) / span:.0f}/s)")
+        if self.metrics.total:
+            eta = self.metrics.eta()
+            text += (f" | {self.metrics.done}/{self.metrics.total} {self.metrics.unit}"
+                     f" ({min(100.0, 100 * self.metrics.done / self.metrics.total):.1f}%)")
+            if eta is not None:
+                text += f" ETA {_clock(eta)}"
+        return text
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(self.line(), file=self.out, flush=True)
+
+
+def print_report(report, out=sys.stdout):
+    totals = report['totals']
+    print(f"📊 {report['script']}: {report['elapsed']:.1f}s, "
+          f"{totals['reads']} lecturas, {totals['writes']} escrituras, "
+          f"{totals['deletes']} borrados, {totals['aggregations']} agregaciones "
+          f"({report['throughput']['reads_per_s']} lecturas/s, "
+          f"{report['throughput']['writes_per_s']} escrituras/s)", file=out)
+    print(f"   📦 {totals['bytes_received'] / 1024 / 1024:.1f} MB recibidos, "
+          f"{totals['bytes_sent'] / 1024 / 1024:.1f} MB enviados"
+          + (f", memoria máxima {report['max_rss_mb']} MB"
+             if report.get('max_rss_mb') is not None else ''), file=out)
+    for name, entry in report['collections'].items():
+        print(f"   📂 {name}: {entry['reads']} lecturas, {entry['writes']} escrituras"
+              + (f", {entry['deletes']} borrados" if entry['deletes'] else '')
+              + (f", {entry['aggregations']} agregaciones" if entry['aggregations'] else ''),
+              file=out)
+    for name, rpc in report['rpcs'].items():
+        print(f"   ⏱️  {name}: {rpc['count']} llamadas, p50 {rpc['p50'] * 1000:.0f} ms, "
+              f"p95 {rpc['p95'] * 1000:.0f} ms, máx {rpc['max'] * 1000:.0f} ms"
+              + (f", ❌ {rpc['errors']} errores" if rpc['errors'] else ''), file=out)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Muestra y compara informes de operaciones")
+    parser.add_argument('reports', nargs='+', help="informes JSON (FIRESTORE_METRICS)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    reports = []
+    for path in args.reports:
+        with open(path) as f:
+            reports.append(json.load(f))
+    for report in reports:
+        print_report(report)
+        print()
+    if len(reports) > 1:
+        print(f"{'informe':<32} {'segundos':>9} {'lecturas':>10} {'escrituras':>10} "
+              f"{'lect/s':>8} {'escr/s':>8}")
+        for path, report in zip(args.reports, reports):
+            totals = report['totals']
+            print(f"{os.path.basename(path):<32} {report['elapsed']:>9.1f} "
+                  f"{totals['reads']:>10} {totals['writes'] + totals['deletes']:>10} "
+                  f"{report['throughput']['reads_per_s']:>8} "
+                  f"{report['throughput']['writes_per_s']:>8}")
+
+
+if __name__ == "__main__":
+    main()
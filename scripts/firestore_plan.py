@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Planes de migración: un archivo compacto con los cambios por documento que
+se genera leyendo (plan) y se aplica después sin volver a leer (apply).
+
+Formato JSON Lines, en el que solo se añade al final:
+
+    {"version": 1, "project": ..., "created": ..., ...}     cabecera
+    ["ruta/del/doc", "2024-05-01T12:00:00.123456Z", {"campo": [antes, después]}]
+    ["ruta/del/doc", null, {"campo": [antes, después]}, "clienteEmail"]
+
+La segunda columna es el update_time leído al planificar (o null); la
+cuarta, opcional, de dónde sale el valor nuevo (p. ej. la regla de
+ownership.py que lo infirió), para revisar el plan por fuente. apply
+envía cada cambio en lotes paralelos con la precondición last_update_time,
+de modo que un documento modificado después de planificar no se pisa.
+Solo esos documentos en conflicto se vuelven a leer:
+
+  - si el campo ya tiene el valor nuevo, el cambio cuenta como aplicado;
+  - si sigue con el valor anterior, se reenvía con el update_time actual;
+  - si tiene otro valor, se deja como está y se informa.
+
+Cada documento confirmado se anota en <plan>.applied, así que repetir
+apply tras un corte solo envía lo pendiente.
+
+    python3 scripts/firestore_plan.py plan.jsonl            # resumen
+    python3 scripts/firestore_plan.py plan.jsonl --apply    # aplicar
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from google.api_core import exceptions as gexc
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+
+from firestore_batch import (COMMIT_WORKERS, CREDENTIALS_PATH, MAX_BATCH_SIZE,
+                             BatchWriter, retry_call)
+from firestore_snapshot import to_json
+
+PLAN_VERSION = 1
+# Documentos por get_all al revisar conflictos
+CONFLICT_READ_SIZE = 300
+
+
+def timestamp(value):
+    """update_time (datetime o texto ISO-8601) en RFC 3339, o None"""
+    if value is None:
+        return None
+    if isinstance(value, DatetimeWithNanoseconds):
+        return value.rfc3339()
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class PlanWriter:
+    """Escribe un plan línea a línea; add/extend son seguros entre hilos"""
+
+    def __init__(self, path, project, **meta):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path + '.tmp', 'w', encoding='utf-8')
+        header = {'version': PLAN_VERSION, 'project': project,
+                  'created': datetime.now(timezone.utc).isoformat(), **meta}
+        self._file.write(json.dumps(header, ensure_ascii=False) + '\n')
+
+    def add(self, path, update_time, changes):
+        self.extend([(path, update_time, changes)])
+
+    def extend(self, entries):
+        """Añade (ruta, update_time, {campo: [antes, después]}[, fuente]) y
+        vuelca a disco"""
+        lines = [json.dumps([entry[0], timestamp(entry[1]), *entry[2:]],
+                            ensure_ascii=False, separators=(',', ':')) + '\n'
+                 for entry in entries]
+        with self._lock:
+            self._file.writelines(lines)
+            self._file.flush()
+            self.count += len(lines)
+
+    def close(self):
+        """Publica el plan; uno a medio escribir nunca sustituye al anterior"""
+        self._file.close()
+        os.replace(self.path + '.tmp', self.path)
+        # Un plan nuevo empieza sin nada aplicado
+        try:
+            os.remove(self.path + '.applied')
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def read_plan(path):
+    """(cabecera, iterador de (ruta, update_time, cambios, fuente o None))"""
+    f = open(path, encoding='utf-8')
+    header = json.loads(f.readline())
+    if header.get('version') != PLAN_VERSION:
+        f.close()
+        raise ValueError(f"{path}: versión de plan no soportada")
+
+    def entries():
+        with f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield tuple(entry) if len(entry) == 4 else (*entry, None)
+    return header, entries()
+
+
+class AppliedLog:
+    """Rutas ya confirmadas de un plan, en un archivo append-only"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.paths = {line.rstrip('\n') for line in f if line.strip()}
+        except FileNotFoundError:
+            self.paths = set()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __contains__(self, path):
+        return path in self.paths
+
+    def add(self, paths):
+        with self._lock:
+            paths = [p for p in paths if p not in self.paths]
+            self.paths.update(paths)
+            self._file.writelines(p + '\n' for p in paths)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _field(snapshot, field):
+    try:
+        return to_json(snapshot.get(field))
+    except KeyError:
+        return None
+
+
+def apply_plan(db, path, batch_size=MAX_BATCH_SIZE, workers=COMMIT_WORKERS,
+               on_commit=None):
+    """Aplica el plan de path y devuelve un resumen.
+
+    El resumen tiene 'applied' (escrituras confirmadas), 'skipped' (ya
+    aplicadas en una ejecución anterior), 'already' (conflictos que ya
+    tenían el valor nuevo), 'conflicts' y 'failures' (listas de
+    (ruta, motivo)) y 'writer' con los contadores del BatchWriter.
+    """
+    header, entries = read_plan(path)
+    if header['project'] != db.project:
+        raise ValueError(f"El plan es del proyecto {header['project']}, "
+                         f"no de {db.project}")
+    log = AppliedLog(path + '.applied')
+
+    def committed(ops):
+        log.add(op[1].path for op in ops)
+        if on_commit is not None:
+            on_commit(ops)
+
+    writer = BatchWriter(db, batch_size=batch_size, workers=workers,
+                         on_commit=committed)
+    result = {'applied': 0, 'skipped': 0, 'already': 0,
+              'conflicts': [], 'failures': [], 'writer': writer}
+    try:
+        with writer:
+            for doc_path, update_time, changes, _source in entries:
+                if doc_path in log:
+                    result['skipped'] += 1
+                    continue
+                _send(db, writer, doc_path, update_time, changes)
+        stale = _split_failures(writer.failures, result)
+        if stale:
+            _resolve_conflicts(db, path, stale, log, result, batch_size, workers,
+                               committed)
+        result['applied'] = writer.writes + result.pop('retried', 0)
+    finally:
+        log.close()
+    return result
+
+
+def _send(db, writer, doc_path, update_time, changes):
+    option = None
+    if update_time is not None:
+        option = db.write_option(
+            last_update_time=DatetimeWithNanoseconds.from_rfc3339(update_time))
+    writer.update(db.document(doc_path),
+                  {field: new for field, (_old, new) in changes.items()},
+                  option=option)
+
+
+def _split_failures(failures, result):
+    """Separa las precondiciones incumplidas (a revisar) del resto"""
+    stale = set()
+    for doc_path, error in failures:
+        if isinstance(error, gexc.FailedPrecondition):
+            stale.add(doc_path)
+        elif isinstance(error, gexc.NotFound):
+            result['conflicts'].append((doc_path, 'borrado'))
+        else:
+            result['failures'].append((doc_path, error))
+    return stale
+
+
+def _resolve_conflicts(db, path, stale, log, result, batch_size, workers,
+                       committed):
+    """Relee solo los documentos en conflicto y reenvía los que sigan igual"""
+    _header, entries = read_plan(path)
+    planned = [entry for entry in entries if entry[0] in stale]
+    writer = BatchWriter(db, batch_size=batch_size, workers=workers,
+                         on_commit=committed)
+    with writer:
+        for start in range(0, len(planned), CONFLICT_READ_SIZE):
+            chunk = planned[start:start + CONFLICT_READ_SIZE]
+            refs = [db.document(doc_path) for doc_path, _t, _c in chunk]
+            snapshots = {s.reference.path: s
+                         for s in retry_call(lambda: list(db.get_all(refs)))}
+            for doc_path, _update_time, changes in chunk:
+                snapshot = snapshots.get(doc_path)
+                if snapshot is None or not snapshot.exists:
+                    result['conflicts'].append((doc_path, 'borrado'))
+                    continue
+                current = {field: _field(snapshot, field) for field in changes}
+                if all(current[f] == new for f, (_old, new) in changes.items()):
+                    log.add([doc_path])
+                    result['already'] += 1
+                elif all(current[f] == old for f, (old, _new) in changes.items()):
+                    _send(db, writer, doc_path, timestamp(snapshot.update_time),
+                          changes)
+                else:
+                    result['conflicts'].append((doc_path, 'modificado'))
+    for doc_path, error in writer.failures:
+        if isinstance(error, (gexc.FailedPrecondition, gexc.NotFound)):
+            result['conflicts'].append((doc_path, 'modificado'))
+        else:
+            result['failures'].append((doc_path, error))
+    result['retried'] = writer.writes
+
+
+def summarize(path):
+    """Cabecera, número de cambios y cambios por colección, campo y fuente"""
+    header, entries = read_plan(path)
+    by_collection = Counter()
+    by_field = Counter()
+    by_source = Counter()
+    total = 0
+    for doc_path, _update_time, changes, source in entries:
+        total += 1
+        by_collection[doc_path.split('/', 1)[0]] += 1
+        by_field.update(changes.keys())
+        if source:
+            by_source[source] += 1
+    return header, total, by_collection, by_field, by_source
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Revisa o aplica un plan de migración")
+    parser.add_argument('plan', help="archivo del plan (.jsonl)")
+    parser.add_argument('--apply', action='store_true',
+                        help="aplicar el plan en Firestore")
+    parser.add_argument('--credentials', default=CREDENTIALS_PATH,
+                        help="JSON de la cuenta de servicio (ignorado con el emulador)")
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=COMMIT_WORKERS)
+    return parser.parse_args(argv)
+
+
+def print_result(result):
+    writer = result['writer']
+    print(f"✅ {result['applied']} cambios aplicados"
+          + (f", {result['skipped']} ya aplicados antes" if result['skipped'] else '')
+          + (f", {result['already']} ya tenían el valor" if result['already'] else ''))
+    print(f"   {writer.batches} lotes, {writer.retries} reintentos")
+    for doc_path, reason in result['conflicts'][:10]:
+        print(f"   ⚠️  {doc_path}: {reason} desde el plan")
+    if len(result['conflicts']) > 10:
+        print(f"   ⚠️  ... {len(result['conflicts']) - 10} conflictos más")
+    for doc_path, error in result['failures'][:10]:
+        print(f"   ❌ {doc_path}: {error}")
+    if result['failures']:
+        print("♻️  Vuelve a ejecutar apply para reintentar lo pendiente")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    header, total, by_collection, by_field, by_source = summarize(args.plan)
+    print(f"📋 Plan de {header['project']} ({header['created']}): {total} cambios")
+    for collection, n in by_collection.most_common():
+        print(f"   📂 {collection}: {n}")
+    for field, n in by_field.most_common():
+        print(f"   ✏️  {field}: {n}")
+    for source, n in by_source.most_common():
+        print(f"   🔎 {source}: {n}")
+    if not args.apply:
+        return
+    from firestore_batch import connect
+    db = connect(args.credentials)
+    started = time.monotonic()
+    result = apply_plan(db, args.plan, batch_size=args.batch_size,
+                        workers=args.workers)
+    print_result(result)
+    print(f"⏱️  {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Snapshots locales de Firestore para análisis sin lecturas de red.
+
+`export` descarga las colecciones relevantes en paralelo, proyectando solo
+los campos que usan los scripts (propiedad, relaciones y fechas), a un
+directorio con un JSONL por colección más un índice ruta -> (offset,
+longitud) y un manifest.json. `export --refresh` solo vuelve a leer lo
+modificado desde el export anterior (ver CHANGE_FIELDS en
+firestore_batch.py); si el conteo no cuadra, esa colección se exporta
+entera de nuevo.
+
+Snapshot/Table cargan el snapshot en columnas y filtran con máscaras sobre
+columnas completas, p. ej.:
+
+    snap = Snapshot('snapshots/latest')
+    tickets = snap.table('tickets')
+    sin_dueno = tickets.filter(~tickets['userId'].truthy())
+
+`analyze` trae análisis listos (missing-userid, orphan-rooms), y
+verify_userid_fields.py acepta --snapshot para verificar sobre disco.
+
+Uso:
+    python3 scripts/firestore_snapshot.py export --out snapshots/latest
+    python3 scripts/firestore_snapshot.py export --out snapshots/latest --refresh
+    python3 scripts/firestore_snapshot.py analyze --snapshot snapshots/latest orphan-rooms
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SNAPSHOT_VERSION = 1
+
+# nombre en el snapshot -> (colección, es collection group, campos o None = todo).
+# 'rooms' es un collection group: incluye las habitaciones de primer nivel y
+# las subcolecciones properties/{id}/rooms (con '_parent' = ruta del padre).
+SNAPSHOT_COLLECTIONS = {
+    'users': ('users', False, ['uid', 'rol', 'nombre', 'email']),
+    'properties': ('properties', False,
+                   ['userId', 'clienteEmail', 'fechaActualizacion']),
+    'rooms': ('rooms', True, ['userId', 'propertyId', 'fechaActualizacion']),
+    'tickets': ('tickets', False,
+                ['userId', 'clienteId', 'cliente.id', 'tecnicoId', 'toderoId',
+                 'maestroId', 'maestroAsignado.id', 'participantIds', 'estado',
+                 'fechaActualizacion']),
+    'property_listings': ('property_listings', False,
+                          ['userId', 'propietarioEmail', 'fechaActualizacion']),
+    'inventory_acts': ('inventory_acts', False,
+                       ['userId', 'propertyId', 'createdBy', 'updatedAt']),
+    'virtual_tours': ('virtual_tours', False,
+                      ['userId', 'property_id', 'created_at']),
+}
+
+# Campos reservados de cada registro
+ID, PATH, PARENT, UPDATED = '_id', '_path', '_parent', '_updated'
+
+
+def to_json(value):
+    """Convierte un valor de Firestore a algo serializable en JSON"""
+    if isinstance(value, dict):
+        return {k: to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    if hasattr(value, 'path') and hasattr(value, 'id'):
+        # DocumentReference
+        return value.path
+    if hasattr(value, 'latitude') and hasattr(value, 'longitude'):
+        # GeoPoint
+        return [value.latitude, value.longitude]
+    return value
+
+
+def to_record(doc):
+    record = to_json(doc.to_dict() or {})
+    record[ID] = doc.id
+    record[PATH] = doc.reference.path
+    parent = doc.reference.parent.parent
+    record[PARENT] = parent.path if parent is not None else None
+    record[UPDATED] = doc.update_time.isoformat() if doc.update_time else None
+    return record
+
+
+def write_collection(out_dir, name, records):
+    """Escribe name.jsonl y name.idx.json de forma atómica; devuelve bytes"""
+    data_path = os.path.join(out_dir, f'{name}.jsonl')
+    index = {}
+    offset = 0
+    with open(data_path + '.tmp', 'wb') as f:
+        for record in records:
+            line = (json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+                    + '\n').encode()
+            f.write(line)
+            index[record[PATH]] = [offset, len(line)]
+            offset += len(line)
+    with open(os.path.join(out_dir, f'{name}.idx.json.tmp'), 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(data_path + '.tmp', data_path)
+    os.replace(os.path.join(out_dir, f'{name}.idx.json.tmp'),
+               os.path.join(out_dir, f'{name}.idx.json'))
+    return offset
+
+
+def read_records(out_dir, name):
+    with open(os.path.join(out_dir, f'{name}.jsonl'), encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def source_query(db, name):
+    collection, group, fields = SNAPSHOT_COLLECTIONS[name]
+    query = db.collection_group(collection) if group else db.collection(collection)
+    return query, fields
+
+
+def load_table(db, name):
+    """Lee una colección proyectada directamente a una Table, sin disco"""
+    from firestore_batch import paginate
+    query, fields = source_query(db, name)
+    return Table([to_record(doc) for page in paginate(query.select(fields))
+                  for doc in page])
+
+
+def export_collection(db, out_dir, name, previous=None, all_fields=False):
+    """Exporta (o refresca, si hay un export previous) una colección.
+
+    Devuelve la entrada del manifest.
+    """
+    from firestore_batch import CHANGE_FIELDS, WATERMARK_MARGIN, changed_since, count, paginate
+    from google.api_core import exceptions as gexc
+
+    started = datetime.datetime.now(datetime.timezone.utc)
+    query, fields = source_query(db, name)
+    if all_fields:
+        fields = None
+    change_field = CHANGE_FIELDS.get(SNAPSHOT_COLLECTIONS[name][0])
+    mode = 'completo'
+    changed = None
+
+    if (previous is not None and change_field
+            and previous.get('fields') == fields):
+        total = count(query)
+        records = {record[PATH]: record for record in read_records(out_dir, name)}
+        try:
+            docs = changed_since(query, change_field,
+                                 datetime.datetime.fromisoformat(previous['watermark']),
+                                 fields)
+        except gexc.FailedPrecondition:
+            # Falta el índice de collection group para el filtro por fecha
+            docs = None
+        if docs is not None:
+            for doc in docs:
+                records[doc.reference.path] = to_record(doc)
+            if len(records) == total:
+                mode = 'incremental'
+                changed = len(docs)
+                records = sorted(records.values(), key=lambda r: r[PATH])
+
+    if mode == 'completo':
+        projected = query.select(fields) if fields is not None else query
+
+        def pages():
+            for page in paginate(projected):
+                for doc in page:
+                    yield to_record(doc)
+        records = pages()
+
+    size = write_collection(out_dir, name, records)
+    with open(os.path.join(out_dir, f'{name}.idx.json')) as f:
+        documents = len(json.load(f))
+    return {
+        'documents': documents,
+        'bytes': size,
+        'fields': fields,
+        'mode': mode,
+        'changed': changed,
+        'watermark': (started - WATERMARK_MARGIN).isoformat(),
+        'exported_at': started.isoformat(),
+    }
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+
+def export(db, out_dir, names, refresh=False, all_fields=False, workers=None):
+    """Exporta names a out_dir en paralelo y devuelve el manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir) if refresh else None
+    if manifest is None or manifest.get('project') != db.project:
+        manifest = {'version': SNAPSHOT_VERSION, 'project': db.project,
+                    'collections': {}}
+    previous = manifest['collections']
+
+    with ThreadPoolExecutor(max_workers=workers or len(names)) as pool:
+        futures = {
+            name: pool.submit(export_collection, db, out_dir, name,
+                              previous.get(name) if refresh else None, all_fields)
+            for name in names
+        }
+    errors = {}
+    for name, future in futures.items():
+        try:
+            previous[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+
+    tmp = os.path.join(out_dir, 'manifest.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, 'manifest.json'))
+    return manifest, errors
+
+
+class Mask:
+    """Vector de booleanos con operadores &, | y ~"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __and__(self, other):
+        return Mask([a and b for a, b in zip(self.values, other.values)])
+
+    def __or__(self, other):
+        return Mask([a or b for a, b in zip(self.values, other.values)])
+
+    def __invert__(self):
+        return Mask([not a for a in self.values])
+
+    def sum(self):
+        return sum(self.values)
+
+
+class Column:
+    """Una columna completa; las comparaciones devuelven una Mask"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __eq__(self, other):
+        return Mask([v == other for v in self.values])
+
+    def __ne__(self, other):
+        return Mask([v != other for v in self.values])
+
+    def isin(self, options):
+        options = set(options)
+        return Mask([v in options for v in self.values])
+
+    def isnull(self):
+        return Mask([v is None for v in self.values])
+
+    def truthy(self):
+        return Mask([bool(v) for v in self.values])
+
+    def map(self, fn):
+        return Column([fn(v) for v in self.values])
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+
+def _get_path(record, field):
+    value = record
+    for part in field.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class Table:
+    """Registros de una colección con acceso por columnas.
+
+    Las columnas se materializan una vez, la primera vez que se piden; los
+    campos anidados se piden con puntos ('maestroAsignado.id').
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, field):
+        column = self._columns.get(field)
+        if column is None:
+            if '.' in field:
+                values = [_get_path(r, field) for r in self.records]
+            else:
+                values = [r.get(field) for r in self.records]
+            column = self._columns[field] = Column(values)
+        return column
+
+    def filter(self, mask):
+        return Table([r for r, keep in zip(self.records, mask.values) if keep])
+
+    def index(self, key, value=None):
+        """Índice hash {key: record} o {key: record[value]}"""
+        keys = self[key].values
+        if value is None:
+            return {k: r for k, r in zip(keys, self.records) if k is not None}
+        values = self[value].values
+        return {k: v for k, v in zip(keys, values) if k is not None}
+
+    def ids(self):
+        return self[ID].values
+
+
+class Snapshot:
+    """Snapshot exportado en un directorio"""
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = load_manifest(path)
+        if self.manifest is None:
+            raise FileNotFoundError(f"{path} no contiene un snapshot válido")
+        self._tables = {}
+        # Índices ruta -> (offset, longitud), cargados una vez por colección
+        self._indexes = {}
+
+    def table(self, name):
+        if name not in self._tables:
+            if name not in self.manifest['collections']:
+                raise KeyError(f"'{name}' no está en el snapshot {self.path}")
+            self._tables[name] = Table(list(read_records(self.path, name)))
+        return self._tables[name]
+
+    def get(self, name, path):
+        """Un registro por su ruta, leyendo solo su línea gracias al índice"""
+        if name not in self._indexes:
+            with open(os.path.join(self.path, f'{name}.idx.json')) as f:
+                self._indexes[name] = json.load(f)
+        entry = self._indexes[name].get(path)
+        if entry is None:
+            return None
+        with open(os.path.join(self.path, f'{name}.jsonl'), 'rb') as f:
+            f.seek(entry[0])
+            return json.loads(f.read(entry[1]))
+
+
+def top_level(table):
+    """Solo los documentos de colecciones de primer nivel"""
+    return table.filter(table[PARENT].isnull())
+
+
+def analyze_missing_userid(snap):
+    for name in SNAPSHOT_COLLECTIONS:
+        if name == 'users' or name not in snap.manifest['collections']:
+            continue
+        table = snap.table(name)
+        missing = table.filter(~table['userId'].truthy())
+        print(f"📂 {name}: {len(missing)}/{len(table)} sin userId")
+        if len(missing):
+            print(f"      Ejemplos: {', '.join(missing[PATH].values[:3])}")
+
+
+def analyze_orphan_rooms(snap):
+    properties = snap.table('properties')
+    rooms = snap.table('rooms')
+    known = set(properties[PATH].values)
+    owners = properties.index(PATH, 'userId')
+    # Padre: la propiedad contenedora o, en rooms de primer nivel, propertyId
+    parents = Column([parent or (f'properties/{pid}' if pid else None)
+                      for parent, pid in zip(rooms[PARENT], rooms['propertyId'])])
+    orphan = Column([p for p, keep in zip(parents, (~parents.isin(known)).values)
+                     if keep])
+    print(f"🏠 {len(orphan)}/{len(rooms)} habitaciones cuya propiedad no existe")
+    by_property = {}
+    for parent in orphan:
+        by_property[parent] = by_property.get(parent, 0) + 1
+    for parent, n in sorted(by_property.items(), key=lambda kv: -kv[1])[:10]:
+        print(f"      {parent or '(sin propiedad)'}: {n} habitaciones")
+    no_owner = sum(1 for p in parents if p in known and not owners.get(p))
+    print(f"⚠️  {no_owner} habitaciones cuya propiedad no tiene userId")
+
+
+ANALYSES = {
+    'missing-userid': analyze_missing_userid,
+    'orphan-rooms': analyze_orphan_rooms,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshots locales de Firestore")
+    sub = parser.add_subparsers(dest='command', required=True)
+    exp = sub.add_parser('export', help="exportar colecciones a disco")
+    exp.add_argument('--out', default='snapshots/latest')
+    exp.add_argument('--collections', default=','.join(SNAPSHOT_COLLECTIONS),
+                     help="colecciones a exportar, separadas por coma")
+    exp.add_argument('--refresh', action='store_true',
+                     help="leer solo lo modificado desde el export anterior")
+    exp.add_argument('--all-fields', action='store_true',
+                     help="guardar documentos completos en vez de la proyección")
+    exp.add_argument('--credentials',
+                     help="JSON de la cuenta de servicio (ignorado con el emulador)")
+    ana = sub.add_parser('analyze', help="análisis sobre un snapshot")
+    ana.add_argument('--snapshot', default='snapshots/latest')
+    ana.add_argument('analysis', choices=sorted(ANALYSES))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'analyze':
+        started = time.monotonic()
+        ANALYSES[args.analysis](Snapshot(args.snapshot))
+        print(f"⏱️  {time.monotonic() - started:.2f}s")
+        return
+
+    from firestore_batch import CREDENTIALS_PATH, connect
+    names = [n.strip() for n in args.collections.split(',') if n.strip()]
+    unknown = [n for n in names if n not in SNAPSHOT_COLLECTIONS]
+    if unknown:
+        print(f"❌ Colecciones desconocidas: {', '.join(unknown)}")
+        sys.exit(2)
+    db = connect(args.credentials or CREDENTIALS_PATH)
+    started = time.monotonic()
+    manifest, errors = export(db, args.out, names, refresh=args.refresh,
+                              all_fields=args.all_fields)
+    for name in names:
+        if name in errors:
+            print(f"❌ {name}: {errors[name]}")
+            continue
+        entry = manifest['collections'][name]
+        detail = (f", {entry['changed']} modificados" if entry['mode'] == 'incremental'
+                  else '')
+        print(f"📦 {name}: {entry['documents']} documentos, "
+              f"{entry['bytes'] / 1024:.0f} KiB ({entry['mode']}{detail})")
+    print(f"💾 Snapshot en {args.out} ({time.monotonic() - started:.1f}s)")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Precalcula las estadísticas de cada maestro (MaestroStats) en
+maestro_stats/{maestroId}, para que un dashboard las obtenga con una sola
+lectura en vez de recorrer sus evaluaciones.
+
+La colección evaluations se recorre una vez, por páginas y descargando
+solo los campos necesarios, y se agrupa por maestroId acumulando sumas
+(evaluaciones, promedioFinal, cada criterio y recontrataría). Cada
+documento de estadísticas guarda los promedios que lee la app y las sumas
+de las que salen, y se escribe en lotes con BatchWriter.
+
+Modos:
+  - completo (--full, o sin estado previo): recorre todas las evaluaciones.
+  - incremental (por defecto si hay estado): parte de las sumas de la
+    ejecución anterior (archivo --state) y solo lee las evaluaciones con
+    fechaEvaluacion posterior a la marca de agua. Las ya contadas dentro
+    del margen de la marca no se suman dos veces. Si el COUNT de la
+    colección no cuadra con las sumas (evaluaciones borradas o con fecha
+    antigua escritas tarde) se rehace en modo completo.
+
+Solo se escriben los maestros cuyas sumas cambiaron. En modo completo se
+parte de los documentos de maestro_stats existentes: los de maestros sin
+evaluaciones se ponen a cero.
+
+    python3 scripts/maestro_stats.py --full
+    python3 scripts/maestro_stats.py          # p. ej. desde cron
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from google.cloud import firestore as gfirestore
+
+from firestore_batch import (COMMIT_WORKERS, CREDENTIALS_PATH, MAX_BATCH_SIZE,
+                             PAGE_SIZE, WATERMARK_MARGIN, BatchWriter, changed_since,
+                             connect, count, paginate, using_emulator)
+
+STATE_VERSION = 1
+EVALUATIONS = 'evaluations'
+STATS_COLLECTION = 'maestro_stats'
+EVALUATION_FIELDS = ['maestroId', 'criterios', 'promedioFinal', 'recontrataria',
+                     'fechaEvaluacion']
+# Criterio de la evaluación -> campo de MaestroStats con su promedio
+CRITERIA = {
+    'puntualidad': 'promedioPuntualidad',
+    'calidadTrabajo': 'promedioCalidad',
+    'limpieza': 'promedioLimpieza',
+    'profesionalismo': 'promedioProfesionalismo',
+}
+# Acumuladores por maestro, en este orden
+SUMS = ['total', 'general', *CRITERIA, 'recontratariaSi']
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def evaluation_row(data):
+    """(maestroId, valores a sumar según SUMS), o None si no tiene maestro.
+
+    Los valores por defecto son los de MaestroEvaluation.fromMap.
+    """
+    maestro = data.get('maestroId')
+    if not isinstance(maestro, str) or not maestro:
+        return None
+    criterios = data.get('criterios') or {}
+    return maestro, (1, _number(data.get('promedioFinal')),
+                     *(_number(criterios.get(name)) for name in CRITERIA),
+                     0 if data.get('recontrataria') is False else 1)
+
+
+def accumulate(sums, rows):
+    """Suma rows [(maestroId, valores)] en sums {maestroId: [acumuladores]}"""
+    for maestro, values in rows:
+        acc = sums.get(maestro)
+        if acc is None:
+            sums[maestro] = list(values)
+        else:
+            for i, value in enumerate(values):
+                acc[i] += value
+    return sums
+
+
+def stats_document(maestro, acc):
+    """Documento de maestro_stats con los campos de MaestroStats y sus sumas"""
+    total = acc[0]
+    sums = dict(zip(SUMS, acc))
+
+    def average(name):
+        return sums[name] / total if total else 0.0
+
+    return {
+        'maestroId': maestro,
+        'totalEvaluaciones': total,
+        'promedioGeneral': average('general'),
+        **{field: average(name) for name, field in CRITERIA.items()},
+        'totalRecontratariaSi': sums['recontratariaSi'],
+        'sumas': {name: sums[name] for name in SUMS[1:-1]},
+        'lastUpdate': gfirestore.SERVER_TIMESTAMP,
+    }
+
+
+def _fecha(data):
+    value = data.get('fechaEvaluacion')
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return None
+
+
+def read_all(db, page_size=PAGE_SIZE):
+    """Sumas por maestro y {id: fecha} de toda la colección, en una pasada"""
+    sums = {}
+    dates = {}
+    query = db.collection(EVALUATIONS).select(EVALUATION_FIELDS)
+    for page in paginate(query, page_size=page_size):
+        rows = []
+        for doc in page:
+            data = doc.to_dict() or {}
+            dates[doc.id] = _fecha(data)
+            row = evaluation_row(data)
+            if row is not None:
+                rows.append(row)
+        accumulate(sums, rows)
+    return sums, dates
+
+
+def read_since(db, watermark, counted):
+    """Sumas de las evaluaciones posteriores a watermark no contadas aún"""
+    sums = {}
+    dates = {}
+    rows = []
+    docs = changed_since(db.collection(EVALUATIONS), 'fechaEvaluacion', watermark,
+                         EVALUATION_FIELDS)
+    for doc in docs:
+        if doc.id in counted:
+            continue
+        data = doc.to_dict() or {}
+        dates[doc.id] = _fecha(data)
+        row = evaluation_row(data)
+        if row is not None:
+            rows.append(row)
+    return accumulate(sums, rows), dates
+
+
+def load_state(path, key):
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('version') != STATE_VERSION or state.get('key') != key:
+        return None
+    return state
+
+
+def save_state(path, key, watermark, evaluations, recent, sums):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': STATE_VERSION, 'key': key,
+                   'watermark': watermark.isoformat(), 'evaluations': evaluations,
+                   'recent': recent, 'sums': sums}, f)
+    os.replace(tmp, path)
+
+
+def compute(db, state, page_size=PAGE_SIZE):
+    """Sumas actuales por maestro a partir del estado (o de cero).
+
+    Devuelve (modo, sumas, evaluaciones contadas, evaluaciones leídas,
+    {id: fecha} de las contadas que puede volver a leer la próxima vez).
+    """
+    if state is not None:
+        total = count(db.collection(EVALUATIONS))
+        counted = state['recent']
+        delta, dates = read_since(db, datetime.fromisoformat(state['watermark']),
+                                  counted)
+        read = len(dates)
+        evaluations = state['evaluations'] + read
+        if evaluations == total:
+            sums = {maestro: list(acc) for maestro, acc in state['sums'].items()}
+            accumulate(sums, delta.items())
+            dates.update({doc_id: datetime.fromisoformat(fecha)
+                          for doc_id, fecha in counted.items()})
+            return 'incremental', sums, evaluations, read, dates
+        mode = f'completo ({total - evaluations:+d} evaluaciones sin cuadrar)'
+    else:
+        mode = 'completo'
+    sums, dates = read_all(db, page_size)
+    return mode, sums, len(dates), len(dates), dates
+
+
+def existing_stats(db, page_size=PAGE_SIZE):
+    """IDs de los documentos de maestro_stats ya escritos (sin descargar campos)"""
+    return [doc.id for page in paginate(db.collection(STATS_COLLECTION).select([]),
+                                        page_size=page_size)
+            for doc in page]
+
+
+def changed_maestros(sums, previous):
+    """Maestros cuyas sumas difieren de previous; sin evaluaciones, a cero"""
+    changed = {maestro: acc for maestro, acc in sums.items()
+               if previous.get(maestro) != acc}
+    for maestro in previous:
+        if maestro not in sums:
+            changed[maestro] = [0] * len(SUMS)
+    return changed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Precalcula maestro_stats desde evaluations")
+    parser.add_argument('--credentials', default=CREDENTIALS_PATH,
+                        help="JSON de la cuenta de servicio (ignorado con el emulador)")
+    parser.add_argument('--full', action='store_true',
+                        help="recorrer todas las evaluaciones y reescribir todo")
+    parser.add_argument('--state', default='maestro_stats.state.json',
+                        help="sumas y marca de agua de la última ejecución")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help="evaluaciones por página de lectura")
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=COMMIT_WORKERS)
+    parser.add_argument('--dry-run', action='store_true',
+                        help="mostrar las estadísticas sin escribirlas")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("📊 Calculando estadísticas de maestros...")
+    print()
+    try:
+        db = connect(args.credentials)
+        if using_emulator():
+            print("🧪 Usando el emulador de Firestore")
+    except Exception as e:
+        print(f"❌ Error al inicializar Firebase: {e}")
+        sys.exit(1)
+
+    started = time.monotonic()
+    now = datetime.now(timezone.utc)
+    key = db.project
+    state = None if args.full else load_state(args.state, key)
+    mode, sums, evaluations, read, dates = compute(db, state, args.page_size)
+    print(f"🔎 Modo {mode}: {read} evaluaciones leídas, {evaluations} en total, "
+          f"{len(sums)} maestros ({time.monotonic() - started:.1f}s)")
+
+    if state is None:
+        # Con --full o sin estado se reescribe todo, y se ponen a cero los
+        # documentos de maestros que ya no tienen evaluaciones
+        previous = dict.fromkeys(existing_stats(db, args.page_size))
+    else:
+        previous = state['sums']
+    changed = changed_maestros(sums, previous)
+    print(f"✏️  {len(changed)} maestros con estadísticas por actualizar")
+
+    if args.dry_run:
+        for maestro, acc in list(changed.items())[:20]:
+            doc = stats_document(maestro, acc)
+            print(f"   {maestro}: {doc['totalEvaluaciones']} evaluaciones, "
+                  f"promedio {doc['promedioGeneral']:.2f}, "
+                  f"{doc['totalRecontratariaSi']} recontrataría")
+        return
+
+    stats = db.collection(STATS_COLLECTION)
+    with BatchWriter(db, batch_size=args.batch_size, workers=args.workers) as writer:
+        for maestro, acc in changed.items():
+            writer.set(stats.document(maestro), stats_document(maestro, acc))
+    elapsed = time.monotonic() - started
+    print(f"✅ {writer.writes} documentos escritos en {elapsed:.1f}s, "
+          f"{writer.batches} lotes, {writer.retries} reintentos")
+    for path, error in writer.failures[:10]:
+        print(f"   ❌ {path}: {error}")
+    if writer.failures:
+        # Sin guardar el estado, la próxima ejecución parte de las sumas
+        # anteriores y vuelve a escribir todo lo que cambió
+        print("♻️  Vuelve a ejecutar para reintentar lo pendiente")
+        sys.exit(1)
+
+    # Lo posterior a la nueva marca de agua se vuelve a leer la próxima
+    # vez; sus IDs evitan contarlo dos veces
+    watermark = now - WATERMARK_MARGIN
+    recent = {doc_id: fecha.isoformat() for doc_id, fecha in dates.items()
+              if fecha is not None and fecha > watermark}
+    save_state(args.state, key, watermark, evaluations, recent, sums)
+
+
+if __name__ == "__main__":
+    main()
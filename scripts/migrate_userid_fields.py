@@ -2,30 +2,157 @@
 """
 Script para migrar datos existentes agregando campo userId
 IMPORTANTE: Este script asignará el primer usuario admin como propietario de todos los datos huérfanos
+(con --infer-owners se asigna el propietario real; ver ownership.py)
+
+Las colecciones se recorren en paralelo y los updates se confirman en lotes
+atómicos de hasta 500 escrituras (ver firestore_batch.py), con reintentos y
+ritmo adaptativo ante errores de cuota o contención.
+
+La lectura es paginada por ID de documento y el último cursor confirmado
+de cada colección se guarda en un checkpoint local: si el proceso se corta,
+volver a ejecutarlo retoma donde quedó (--restart empieza de cero).
+
+Con --infer-owners se leen una sola vez los campos de propiedad de todas las
+colecciones, se resuelve el dueño de cada huérfano en memoria y solo el resto
+va al admin (o queda sin tocar con --no-fallback).
+
+En vez de leer y escribir en la misma pasada, 'plan' recorre las colecciones
+y guarda los cambios en un archivo compacto sin escribir nada, y 'apply' lo
+aplica después sin volver a leer, con precondiciones de update_time para no
+pisar documentos modificados entretanto (ver firestore_plan.py). apply se
+puede repetir: solo envía lo que falte.
+
+    python3 scripts/migrate_userid_fields.py plan --plan plan.jsonl
+    python3 scripts/migrate_userid_fields.py plan --infer-owners --snapshot snapshots/latest
+    python3 scripts/migrate_userid_fields.py apply --plan plan.jsonl
+
+Prueba local contra el emulador:
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python3 scripts/migrate_userid_fields.py --yes
 """
 
-import sys
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    print("✅ firebase-admin importado correctamente")
-except ImportError as e:
-    print(f"❌ Error al importar firebase-admin: {e}")
-    print("📦 Instalando firebase-admin...")
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "firebase-admin==7.1.0"])
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    print("✅ firebase-admin instalado e importado")
-
-def main():
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import firestore_metrics
+from firestore_batch import (COMMIT_WORKERS, CREDENTIALS_PATH, MAX_BATCH_SIZE,
+                             PAGE_SIZE, BatchWriter, Checkpoint, CommitTracker,
+                             connect, count, paginate, using_emulator)
+
+PROGRESS_EVERY = 1000
+
+# Colecciones que deben tener userId
+COLLECTIONS_TO_MIGRATE = [
+    'properties',
+    'rooms',
+    'tickets',
+    'property_listings',
+    'inventory_acts',
+    'virtual_tours',
+]
+
+
+def find_admin(db):
+    """Primer usuario con rol admin, o None"""
+    print("🔍 Buscando usuario administrador...")
+    try:
+        for user in db.collection('users').where('rol', '==', 'admin').limit(1).stream():
+            admin_user = user.to_dict()
+            print(f"✅ Usuario admin encontrado: {admin_user['nombre']} (UID: {admin_user['uid']})")
+            return admin_user
+    except Exception as e:
+        print(f"❌ Error buscando admin: {e}")
+    return None
+
+
+def migrate_collection(db, writer, tracker, collection_name, user_id,
+                       page_size=PAGE_SIZE):
+    """Encola el userId de los documentos que no lo tienen.
+
+    Recorre la colección por páginas desde el cursor del checkpoint y
+    devuelve (encolados, ya tenían userId), o None si una ejecución
+    anterior ya la completó. Solo se descarga el campo userId.
+    """
+    checkpoint = tracker.checkpoint
+    if checkpoint.done(collection_name):
+        return None
+    collection = db.collection(collection_name)
+    cursor = checkpoint.cursor(collection_name)
+    if firestore_metrics.enabled():
+        # Solo para el ETA: un COUNT cuesta una lectura por cada 1000 documentos.
+        # Al retomar se cuenta solo lo que queda tras el cursor, que es lo
+        # que recorren las páginas de abajo
+        remaining = collection
+        if cursor:
+            remaining = collection.order_by('__name__').start_after(
+                {'__name__': collection.document(cursor)})
+        firestore_metrics.expect(count(remaining), 'documentos')
+    queued_count = 0
+    skipped_count = 0
+    for page in paginate(collection.select(['userId']), page_size=page_size,
+                         start_after=collection.document(cursor) if cursor else None):
+        firestore_metrics.advance(len(page))
+        # Si ya tiene userId, saltar
+        todo = [doc for doc in page if not (doc.to_dict() or {}).get('userId')]
+        skipped_count += len(page) - len(todo)
+
+        # La página se registra antes de encolar para no perder ningún commit
+        tracker.page(collection_name, page[-1].id,
+                     [doc.reference.path for doc in todo])
+        for doc in todo:
+            writer.update(doc.reference, {'userId': user_id})
+        queued_count += len(todo)
+    tracker.finish(collection_name)
+    return queued_count, skipped_count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Agrega userId a los documentos huérfanos")
+    parser.add_argument('--credentials', default=CREDENTIALS_PATH,
+                        help="JSON de la cuenta de servicio (ignorado con el emulador)")
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f"escrituras por lote atómico (máx. {MAX_BATCH_SIZE})")
+    parser.add_argument('--workers', type=int, default=COMMIT_WORKERS,
+                        help="lotes confirmándose en paralelo")
+    parser.add_argument('--collection-workers', type=int, default=6,
+                        help="colecciones leídas en paralelo")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help="documentos por página de lectura")
+    parser.add_argument('--checkpoint', default='migrate_userid_fields.checkpoint.json',
+                        help="archivo con el último cursor confirmado por colección")
+    parser.add_argument('--restart', action='store_true',
+                        help="ignorar el checkpoint y recorrer todo de nuevo")
+    parser.add_argument('--yes', action='store_true',
+                        help="no pedir confirmación")
+    parser.add_argument('command', nargs='?', default='migrate',
+                        choices=['migrate', 'plan', 'apply'],
+                        help="migrate: leer y escribir en una pasada (por defecto); "
+                             "plan: solo escribir el plan; apply: aplicar un plan")
+    parser.add_argument('--plan', default='migrate_userid_fields.plan.jsonl',
+                        help="archivo del plan para plan/apply")
+    parser.add_argument('--infer-owners', action='store_true',
+                        help="asignar el propietario real inferido en vez del admin")
+    parser.add_argument('--snapshot',
+                        help="con --infer-owners, inferir desde un snapshot local")
+    parser.add_argument('--no-fallback', action='store_true',
+                        help="con --infer-owners, no asignar al admin lo no resuelto")
+    parser.add_argument('--match-emails', action='store_true',
+                        help="con --infer-owners, resolver también por clienteEmail "
+                             "y propietarioEmail")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
     print("🔄 Migrando datos existentes - Agregando campo userId...")
     print()
-    
-    # Inicializar Firebase Admin SDK
+
+    # Inicializar Firebase Admin SDK (o el emulador con FIRESTORE_EMULATOR_HOST)
     try:
-        cred = credentials.Certificate("/opt/flutter/firebase-admin-sdk.json")
-        firebase_admin.initialize_app(cred)
+        db = connect(args.credentials)
+        if using_emulator():
+            print("🧪 Usando el emulador de Firestore")
         print("✅ Firebase Admin SDK inicializado")
     except Exception as e:
         print(f"❌ Error al inicializar Firebase: {e}")
@@ -42,95 +169,123 @@ def main():
         print("      • Click 'Save'")
         print()
         return
-    
-    db = firestore.client()
-    
+
+    if args.command == 'apply':
+        return apply_command(db, args)
+    if args.infer_owners:
+        return migrate_inferred(db, args)
+
     # Buscar primer usuario admin
-    print("🔍 Buscando usuario administrador...")
-    admin_user = None
-    try:
-        users = db.collection('users').where('rol', '==', 'admin').limit(1).stream()
-        for user in users:
-            admin_user = user.to_dict()
-            print(f"✅ Usuario admin encontrado: {admin_user['nombre']} (UID: {admin_user['uid']})")
-            break
-    except Exception as e:
-        print(f"❌ Error buscando admin: {e}")
-    
+    admin_user = find_admin(db)
     if not admin_user:
         print("⚠️  No se encontró usuario admin. Los datos huérfanos no podrán ser migrados.")
         print("💡 Crea primero un usuario admin antes de ejecutar la migración.")
         return
-    
+
     default_user_id = admin_user['uid']
     print(f"📌 Los datos sin propietario se asignarán a: {admin_user['nombre']}")
     print()
-    
+
+    if args.command == 'plan':
+        return plan_command(db, args, COLLECTIONS_TO_MIGRATE, default_user_id)
+
     # Preguntar confirmación
     print("⚠️  ADVERTENCIA: Esta operación modificará documentos en Firestore.")
     print()
-    response = input("¿Deseas continuar? (escribe 'SI' para confirmar): ")
+    response = 'SI' if args.yes else input("¿Deseas continuar? (escribe 'SI' para confirmar): ")
     if response.upper() != 'SI':
         print("❌ Migración cancelada.")
         return
-    
+
     print()
     print("🚀 Iniciando migración...")
     print()
-    
-    # Colecciones que deben tener userId
-    collections_to_migrate = [
-        'properties',
-        'rooms',
-        'tickets',
-        'property_listings',
-        'inventory_acts',
-        'virtual_tours',
-    ]
-    
+
+    progress_lock = threading.Lock()
+    progress = {'last': 0}
+
+    def report_progress(ops):
+        with progress_lock:
+            if writer.writes - progress['last'] >= PROGRESS_EVERY:
+                progress['last'] = writer.writes
+                print(f"   Progreso: {writer.writes} documentos migrados "
+                      f"({writer.throttle.rate:.0f} escrituras/s)...")
+
+    checkpoint = Checkpoint(args.checkpoint, key=f"{db.project}:{default_user_id}")
+    if args.restart:
+        checkpoint.clear()
+    elif checkpoint.data:
+        print(f"♻️  Retomando desde el checkpoint {args.checkpoint}")
+    tracker = CommitTracker(checkpoint)
+
+    def on_commit(ops):
+        tracker.committed(ops)
+        report_progress(ops)
+
+    writer = BatchWriter(db, batch_size=args.batch_size, workers=args.workers,
+                         on_commit=on_commit)
+    started = time.monotonic()
+    results = {}
+
+    # Las colecciones se leen en paralelo y comparten el pool de commits
+    with writer, ThreadPoolExecutor(max_workers=args.collection_workers) as pool:
+        futures = {
+            pool.submit(migrate_collection, db, writer, tracker, name,
+                        default_user_id, args.page_size): name
+            for name in COLLECTIONS_TO_MIGRATE
+        }
+        for future in as_completed(futures):
+            collection_name = futures[future]
+            try:
+                results[collection_name] = future.result()
+            except Exception as e:
+                results[collection_name] = e
+
+    failed = {}
+    for path, _error in writer.failures:
+        collection_name = path.split('/', 1)[0]
+        failed[collection_name] = failed.get(collection_name, 0) + 1
+
     total_migrated = 0
-    
-    for collection_name in collections_to_migrate:
-        print(f"📂 Migrando colección: {collection_name}")
-        
-        try:
-            # Obtener documentos sin userId
-            docs = db.collection(collection_name).stream()
-            
-            migrated_count = 0
-            skipped_count = 0
-            
-            for doc in docs:
-                data = doc.to_dict()
-                
-                # Si ya tiene userId, saltar
-                if 'userId' in data and data['userId']:
-                    skipped_count += 1
-                    continue
-                
-                # Agregar userId
-                doc.reference.update({'userId': default_user_id})
-                migrated_count += 1
-                
-                if migrated_count % 10 == 0:
-                    print(f"   Progreso: {migrated_count} documentos migrados...")
-            
-            total_migrated += migrated_count
-            
-            if migrated_count == 0 and skipped_count == 0:
-                print(f"   ⚪ Colección vacía (0 documentos)")
-            elif migrated_count == 0:
-                print(f"   ✅ {skipped_count} documentos ya tenían userId")
-            else:
-                print(f"   ✅ {migrated_count} documentos migrados exitosamente")
-                if skipped_count > 0:
-                    print(f"      {skipped_count} documentos ya tenían userId")
-            
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
-        
+    for collection_name in COLLECTIONS_TO_MIGRATE:
+        print(f"📂 Colección: {collection_name}")
+        result = results[collection_name]
+        if isinstance(result, Exception):
+            print(f"   ❌ Error: {result}")
+            print()
+            continue
+        if result is None:
+            print(f"   ⏭️  Ya completada en una ejecución anterior")
+            print()
+            continue
+        queued_count, skipped_count = result
+        migrated_count = queued_count - failed.get(collection_name, 0)
+        total_migrated += migrated_count
+
+        if queued_count == 0 and skipped_count == 0:
+            print(f"   ⚪ Colección vacía (0 documentos)")
+        elif queued_count == 0:
+            print(f"   ✅ {skipped_count} documentos ya tenían userId")
+        else:
+            print(f"   ✅ {migrated_count} documentos migrados exitosamente")
+            if skipped_count > 0:
+                print(f"      {skipped_count} documentos ya tenían userId")
+            if failed.get(collection_name):
+                print(f"   ❌ {failed[collection_name]} documentos no se pudieron migrar")
         print()
-    
+
+    elapsed = time.monotonic() - started
+    print(f"⏱️  {writer.writes} escrituras en {writer.batches} lotes, "
+          f"{elapsed:.1f}s ({writer.writes / elapsed if elapsed else 0:.0f}/s), "
+          f"{writer.retries} reintentos, {writer.throttle.throttled} frenadas por cuota")
+    for path, error in writer.failures[:10]:
+        print(f"   ❌ {path}: {error}")
+    if writer.failures or any(isinstance(r, Exception) for r in results.values()):
+        print(f"♻️  Vuelve a ejecutar el script para retomar desde {args.checkpoint}")
+    else:
+        checkpoint.clear()
+    print()
+
     # Resumen
     print("=" * 60)
     print("📊 RESUMEN DE MIGRACIÓN")
@@ -140,7 +295,7 @@ def main():
     print(f"👤 Propietario asignado: {admin_user['nombre']}")
     print(f"🔑 UID asignado: {default_user_id}")
     print()
-    
+
     if total_migrated > 0:
         print("✅ MIGRACIÓN COMPLETADA")
         print()
@@ -157,8 +312,125 @@ def main():
         print("✅ NO SE REQUIRIÓ MIGRACIÓN")
         print()
         print("   Todas las colecciones ya tenían el campo userId.")
-    
+
+    print()
+
+
+def migrate_inferred(db, args):
+    """Asigna a cada huérfano su propietario inferido (ver ownership.py)"""
+    from ownership import build_plan, load_tables, print_stats, write_plan
+    fallback = None
+    if not args.no_fallback:
+        admin_user = find_admin(db)
+        if not admin_user:
+            print("⚠️  No se encontró usuario admin; lo no resuelto quedará sin userId.")
+        else:
+            fallback = admin_user['uid']
+
+    started = time.monotonic()
+    if args.snapshot:
+        from firestore_snapshot import Snapshot
+        print(f"📸 Infiriendo propietarios desde {args.snapshot}...")
+        tables = load_tables(snapshot=Snapshot(args.snapshot))
+    else:
+        print("📥 Cargando campos de propiedad (una lectura por documento)...")
+        tables = load_tables(db=db)
+    plan = build_plan(tables, fallback=fallback, match_emails=args.match_emails)
+    print(f"🧩 Plan calculado en {time.monotonic() - started:.1f}s")
+    print()
+    print_stats(plan)
     print()
+    write_plan(args.plan, plan, db.project, fallback=fallback,
+               match_emails=args.match_emails)
+    if plan['unresolved']:
+        print(f"❓ {len(plan['unresolved'])} documentos quedaron sin propietario")
+
+    if args.command == 'plan':
+        print(f"💾 Plan con {len(plan['entries'])} cambios guardado en {args.plan}")
+        print("   No se escribió nada en Firestore; revísalo y ejecuta 'apply'.")
+        return
+    if not plan['entries']:
+        print("✅ NO SE REQUIRIÓ MIGRACIÓN")
+        return
+    apply_command(db, args)
+
+
+def plan_collection(db, out, collection_name, user_id, page_size=PAGE_SIZE):
+    """Añade al plan el userId de los documentos que no lo tienen.
+
+    Devuelve (planificados, ya tenían userId). Solo se descarga userId; el
+    update_time de cada documento va al plan como precondición.
+    """
+    planned_count = 0
+    skipped_count = 0
+    for page in paginate(db.collection(collection_name).select(['userId']),
+                         page_size=page_size):
+        entries = []
+        for doc in page:
+            current = (doc.to_dict() or {}).get('userId')
+            if not current:
+                entries.append((doc.reference.path, doc.update_time,
+                                {'userId': [current, user_id]}))
+        out.extend(entries)
+        planned_count += len(entries)
+        skipped_count += len(page) - len(entries)
+    return planned_count, skipped_count
+
+
+def plan_command(db, args, collections, user_id):
+    """Recorre las colecciones y escribe el plan sin modificar nada"""
+    from firestore_plan import PlanWriter
+    started = time.monotonic()
+    results = {}
+    with PlanWriter(args.plan, db.project, source='admin', fallback=user_id) as out, \
+            ThreadPoolExecutor(max_workers=args.collection_workers) as pool:
+        futures = {
+            pool.submit(plan_collection, db, out, name, user_id,
+                        args.page_size): name
+            for name in collections
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    for collection_name in collections:
+        planned_count, skipped_count = results[collection_name]
+        print(f"📂 {collection_name}: {planned_count} por migrar, "
+              f"{skipped_count} ya tenían userId")
+    print()
+    print(f"💾 Plan con {out.count} cambios guardado en {args.plan} "
+          f"({time.monotonic() - started:.1f}s)")
+    print("   No se escribió nada en Firestore; revísalo y ejecuta 'apply'.")
+
+
+def apply_command(db, args):
+    """Aplica un plan revisado sin volver a recorrer las colecciones"""
+    from firestore_plan import apply_plan, print_result, summarize
+    header, total, by_collection, _by_field, _by_source = summarize(args.plan)
+    print(f"📋 Plan {args.plan} ({header['created']}): {total} cambios")
+    for collection_name, n in by_collection.most_common():
+        print(f"   📂 {collection_name}: {n}")
+    print()
+    print("⚠️  ADVERTENCIA: Esta operación modificará documentos en Firestore.")
+    response = 'SI' if args.yes else input("¿Deseas continuar? (escribe 'SI' para confirmar): ")
+    if response.upper() != 'SI':
+        print("❌ Migración cancelada.")
+        return
+
+    progress_lock = threading.Lock()
+    progress = {'done': 0, 'last': 0}
+
+    def report_progress(ops):
+        with progress_lock:
+            progress['done'] += len(ops)
+            if progress['done'] - progress['last'] >= PROGRESS_EVERY:
+                progress['last'] = progress['done']
+                print(f"   Progreso: {progress['done']} documentos migrados...")
+
+    started = time.monotonic()
+    result = apply_plan(db, args.plan, batch_size=args.batch_size,
+                        workers=args.workers, on_commit=report_progress)
+    print_result(result)
+    print(f"⏱️  {time.monotonic() - started:.1f}s")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Inferencia del propietario real de los documentos sin userId.
+
+Los campos de propiedad de users y de cada colección migrada se cargan una
+sola vez (de Firestore con proyección, o de un snapshot local) en índices
+hash, y cada huérfano se resuelve con búsquedas O(1) siguiendo las mismas
+relaciones que usa la app:
+
+  rooms              propertyId -> userId de la propiedad
+  tickets            cliente.id, clienteId, tecnicoId, toderoId,
+                     maestroAsignado.id (ticket_service.dart)
+  inventory_acts     createdBy, o propertyId -> userId de la propiedad
+  virtual_tours      property_id -> userId de la propiedad
+  properties         clienteEmail -> usuario con ese email (--match-emails)
+  property_listings  propietarioEmail -> usuario con ese email (--match-emails)
+
+Un candidato solo se acepta si es un usuario existente. Lo que no se puede
+resolver queda sin asignar, o va al UID de fallback si se indica uno.
+
+Las reglas por email van aparte porque el email del cliente o del
+propietario no dice quién creó el documento: solo se aplican con
+--match-emails. Cada línea del plan lleva la regla que la resolvió; lo que
+hereda el dueño de una propiedad del mismo plan la lleva entre paréntesis
+(p. ej. "propertyId (clienteEmail)"), para revisarlo antes de aplicar:
+
+    python3 scripts/firestore_plan.py plan.jsonl
+
+El resultado es un plan de firestore_plan.py, que se revisa y se aplica sin
+volver a leer:
+
+    python3 scripts/ownership.py --snapshot snapshots/latest --out plan.jsonl
+    python3 scripts/firestore_plan.py plan.jsonl --apply
+"""
+
+import argparse
+import time
+
+from firestore_snapshot import ID, PATH, UPDATED, Snapshot, _get_path, load_table, top_level
+
+# Colecciones con documentos huérfanos a resolver (las de la migración)
+ORPHAN_COLLECTIONS = [
+    'properties',
+    'rooms',
+    'tickets',
+    'property_listings',
+    'inventory_acts',
+    'virtual_tours',
+]
+
+# Campos de tickets con un UID, en orden de preferencia
+TICKET_OWNER_FIELDS = ['cliente.id', 'clienteId', 'tecnicoId', 'toderoId',
+                       'maestroAsignado.id']
+
+
+class OwnershipIndex:
+    """Índices hash de usuarios y propiedades para resolver propietarios"""
+
+    def __init__(self, users, properties, match_emails=False):
+        self.match_emails = match_emails
+        # UID -> usuario; se aceptan tanto el ID del documento como 'uid'
+        self.users = users.index(ID)
+        self.users.update(users.index('uid'))
+        self.by_email = {email.strip().lower(): uid
+                         for email, uid in zip(users['email'], users[ID])
+                         if isinstance(email, str) and email.strip()}
+        # Ruta e ID de la propiedad -> userId
+        self.property_owner = {}
+        # Ruta e ID de la propiedad -> regla que la resolvió en este plan
+        self.property_source = {}
+        for path, doc_id, owner in zip(properties[PATH], properties[ID],
+                                       properties['userId']):
+            if owner:
+                self.property_owner[path] = owner
+                self.property_owner[doc_id] = owner
+
+    def user(self, uid):
+        return uid if isinstance(uid, str) and uid in self.users else None
+
+    def email(self, email):
+        if not isinstance(email, str):
+            return None
+        return self.by_email.get(email.strip().lower())
+
+    def owner_of_property(self, key):
+        return self.user(self.property_owner.get(key)) if key else None
+
+    def set_property_owner(self, record, uid, source):
+        """Dueño asignado a una propiedad en el plan, para sus dependientes"""
+        for key in (record[PATH], record[ID]):
+            self.property_owner[key] = uid
+            self.property_source[key] = source
+
+    def _via_property(self, field, key):
+        uid = self.owner_of_property(key)
+        if uid is None:
+            return None, None
+        inherited = self.property_source.get(key)
+        return uid, f"{field} ({inherited})" if inherited else field
+
+    def resolve(self, collection, record):
+        """(uid, fuente) del propietario de record, o (None, None)"""
+        if collection == 'rooms':
+            uid, source = self._via_property('propertyId', record.get('propertyId'))
+            if uid:
+                return uid, source
+        elif collection == 'tickets':
+            for field in TICKET_OWNER_FIELDS:
+                uid = self.user(_get_path(record, field))
+                if uid:
+                    return uid, field
+        elif collection == 'inventory_acts':
+            uid = self.user(record.get('createdBy'))
+            if uid:
+                return uid, 'createdBy'
+            uid, source = self._via_property('propertyId', record.get('propertyId'))
+            if uid:
+                return uid, source
+        elif collection == 'virtual_tours':
+            uid, source = self._via_property('property_id', record.get('property_id'))
+            if uid:
+                return uid, source
+        elif not self.match_emails:
+            pass
+        elif collection == 'properties':
+            uid = self.email(record.get('clienteEmail'))
+            if uid:
+                return uid, 'clienteEmail'
+        elif collection == 'property_listings':
+            uid = self.email(record.get('propietarioEmail'))
+            if uid:
+                return uid, 'propietarioEmail'
+        return None, None
+
+
+def load_tables(snapshot=None, db=None):
+    """Tablas de todas las colecciones necesarias, una lectura por documento"""
+    names = ['users'] + ORPHAN_COLLECTIONS
+    if snapshot is not None:
+        return {name: snapshot.table(name) for name in names}
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        futures = {name: pool.submit(load_table, db, name) for name in names}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def build_plan(tables, fallback=None, match_emails=False):
+    """Cambios de userId para todos los huérfanos.
+
+    Devuelve {'stats', 'entries', 'unresolved'}; entries son líneas de plan
+    (ruta, update_time, {'userId': [antes, después]}, fuente) para
+    firestore_plan. Con match_emails se aplican también las reglas por email.
+
+    Las habitaciones anidadas en properties/{id}/rooms no entran en el plan:
+    las reglas solo exigen userId en la colección rooms de primer nivel.
+    properties se resuelve primero para que sus dependientes hereden el dueño.
+    """
+    index = OwnershipIndex(tables['users'], tables['properties'], match_emails)
+    entries = []
+    unresolved = []
+    stats = {}
+    for collection in ORPHAN_COLLECTIONS:
+        table = tables[collection]
+        if collection == 'rooms':
+            table = top_level(table)
+        orphans = table.filter(~table['userId'].truthy())
+        counts = stats.setdefault(collection, {'orphans': len(orphans)})
+        for record in orphans.records:
+            uid, source = index.resolve(collection, record)
+            if uid is None and fallback:
+                uid, source = fallback, 'fallback'
+            if uid is None:
+                unresolved.append(record[PATH])
+                counts['unresolved'] = counts.get('unresolved', 0) + 1
+                continue
+            entries.append((record[PATH], record[UPDATED],
+                            {'userId': [record.get('userId'), uid]}, source))
+            counts[source] = counts.get(source, 0) + 1
+            if collection == 'properties':
+                # Sus habitaciones, actas y tours se resuelven con este dueño
+                index.set_property_owner(record, uid, source)
+    return {'stats': stats, 'entries': entries, 'unresolved': unresolved}
+
+
+def write_plan(path, plan, project, fallback=None, match_emails=False):
+    """Guarda el plan en el formato de firestore_plan"""
+    from firestore_plan import PlanWriter
+    with PlanWriter(path, project, source='ownership', fallback=fallback,
+                    match_emails=match_emails,
+                    stats=plan['stats'], unresolved=plan['unresolved']) as out:
+        out.extend(plan['entries'])
+
+
+def print_stats(plan):
+    for collection, counts in plan['stats'].items():
+        sources = ', '.join(f"{source}: {n}" for source, n in sorted(counts.items())
+                            if source not in ('orphans', 'unresolved'))
+        print(f"📂 {collection}: {counts['orphans']} huérfanos"
+              + (f" → {sources}" if sources else '')
+              + (f", ❓ {counts['unresolved']} sin resolver"
+                 if counts.get('unresolved') else ''))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Infiere el propietario de los huérfanos")
+    parser.add_argument('--snapshot', help="usar un snapshot local en vez de Firestore")
+    parser.add_argument('--credentials',
+                        help="JSON de la cuenta de servicio (ignorado con el emulador)")
+    parser.add_argument('--fallback',
+                        help="UID a asignar a lo que no se pueda resolver")
+    parser.add_argument('--match-emails', action='store_true',
+                        help="resolver properties por clienteEmail y "
+                             "property_listings por propietarioEmail")
+    parser.add_argument('--out', default='ownership_plan.jsonl')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.monotonic()
+    if args.snapshot:
+        snap = Snapshot(args.snapshot)
+        project = snap.manifest['project']
+        tables = load_tables(snapshot=snap)
+    else:
+        from firestore_batch import CREDENTIALS_PATH, connect
+        db = connect(args.credentials or CREDENTIALS_PATH)
+        project = db.project
+        tables = load_tables(db=db)
+    plan = build_plan(tables, fallback=args.fallback, match_emails=args.match_emails)
+    write_plan(args.out, plan, project, fallback=args.fallback,
+               match_emails=args.match_emails)
+    print_stats(plan)
+    print(f"💾 Plan con {len(plan['entries'])} asignaciones en {args.out} "
+          f"({time.monotonic() - started:.1f}s)")
+    if plan['unresolved']:
+        print(f"⚠️  {len(plan['unresolved'])} documentos sin propietario resoluble")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Recomprime las fotos subidas antes de que la app las comprimiera
+(StorageService._compressImage), con los mismos perfiles:
+
+  normal  calidad 70, mínimo 1920x1080   tickets/{id}/{problema|resultado}/*
+                                          inventory_acts/{id}/*
+                                          property_listings/{id}/{tipo}/*
+  360     calidad 85, mínimo 4096x2048   property_listings/{id}/360/*
+
+Como flutter_image_compress, la imagen se reduce en proporción hasta que el
+lado que menos sobra llega al mínimo, se endereza según la orientación EXIF
+y se guarda como JPEG sin metadatos. Solo se tocan JPEG; la firma y la foto
+de reconocimiento facial de las actas se conservan tal cual.
+
+Se omiten las fotos que ya están dentro del perfil y ocupan poco, y las
+que no ganarían al menos un 10%. El resto se reescribe en el mismo objeto,
+conservando sus metadatos (y con ellos el token de las URLs de descarga),
+con verificación MD5 y precondición de generación: un objeto que cambia
+durante el proceso no se pisa.
+
+El trabajo de imagen va en un pool de procesos. Cada objeto terminado se
+anota en un manifiesto JSON Lines (--manifest), así que repetir la
+ejecución tras un corte solo procesa lo pendiente.
+
+Almacenamiento:
+  - bucket de Firebase Storage (--bucket); con STORAGE_EMULATOR_HOST
+    definido (p. ej. localhost:9199) se usa el emulador sin credenciales.
+  - directorio local con la misma estructura de rutas (--local).
+
+    python3 scripts/recompress_photos.py --local /tmp/storage --dry-run
+    python3 scripts/recompress_photos.py --bucket su-todero.firebasestorage.app
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+try:
+    from PIL import Image, ImageOps
+except ImportError as e:
+    print(f"❌ Error al importar Pillow: {e}")
+    print("📦 Instálalo con: pip install Pillow")
+    sys.exit(1)
+
+from firestore_batch import CREDENTIALS_PATH, EMULATOR_PROJECT
+
+Profile = namedtuple('Profile', 'quality min_width min_height max_bytes')
+
+# Los de StorageService._compressImage; max_bytes es el tamaño a partir del
+# cual una foto que ya cabe en el perfil se recomprime igualmente
+PROFILES = {
+    'normal': Profile(quality=70, min_width=1920, min_height=1080,
+                      max_bytes=1024 * 1024),
+    '360': Profile(quality=85, min_width=4096, min_height=2048,
+                   max_bytes=3 * 1024 * 1024),
+}
+PREFIXES = ['tickets/', 'inventory_acts/', 'property_listings/']
+# Archivos de las actas que no son fotos subidas por uploadInventoryActPhoto
+KEEP_ORIGINAL = {'signature.png', 'facial_recognition.jpg'}
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+# Ahorro mínimo para que merezca la pena reescribir
+MIN_SAVING = 0.10
+PHOTO_WORKERS = os.cpu_count() or 4
+# Etiqueta en los metadatos de los objetos reescritos
+RECOMPRESSED = 'recompressedProfile'
+
+StoredObject = namedtuple('StoredObject', 'name size md5 generation')
+
+
+def profile_for(name):
+    """Perfil de la ruta de Storage, o None si no es una foto de la app"""
+    if not name.lower().endswith(JPEG_EXTENSIONS):
+        return None
+    parts = name.split('/')
+    if parts[0] == 'tickets' and len(parts) == 4:
+        return 'normal'
+    if parts[0] == 'inventory_acts' and len(parts) == 3 and parts[2] not in KEEP_ORIGINAL:
+        return 'normal'
+    if parts[0] == 'property_listings' and len(parts) == 4:
+        return '360' if parts[2] == '360' else 'normal'
+    return None
+
+
+def scale_factor(width, height, profile):
+    """Divisor de las dimensiones, como calcScale de flutter_image_compress"""
+    return max(1.0, min(width / profile.min_width, height / profile.min_height))
+
+
+def md5_base64(data):
+    """MD5 en el formato de Cloud Storage (md5Hash)"""
+    return base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+
+
+def recompress(data, profile):
+    """(JPEG recomprimido, None) o (None, motivo para dejar el original)"""
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format != 'JPEG':
+            return None, 'formato'
+        width, height = image.size
+        # Orientaciones 5-8 giran 90°: el perfil se aplica a la imagen derecha
+        rotated = image.getexif().get(0x0112) in (5, 6, 7, 8)
+        oriented = (height, width) if rotated else (width, height)
+        scale = scale_factor(*oriented, profile)
+        if scale == 1.0 and len(data) <= profile.max_bytes:
+            return None, 'pequeña'
+        # libjpeg decodifica directamente a 1/2, 1/4 o 1/8 si basta
+        image.draft('RGB', (int(width / scale), int(height / scale)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if scale > 1.0:
+            size = (round(oriented[0] / scale), round(oriented[1] / scale))
+            if image.size != size:
+                image = image.resize(size, Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=profile.quality, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None, 'ilegible'
+    result = out.getvalue()
+    if len(result) > len(data) * (1 - MIN_SAVING):
+        return None, 'sin ganancia'
+    return result, None
+
+
+class LocalBackend:
+    """Directorio con las rutas de Storage como rutas de archivo"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def list(self, prefix):
+        top = self._path(prefix.rstrip('/'))
+        for directory, _dirs, files in os.walk(top):
+            for filename in sorted(files):
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                stat = os.stat(path)
+                yield StoredObject(name, stat.st_size, None, stat.st_mtime_ns)
+
+    def read(self, obj):
+        with open(self._path(obj.name), 'rb') as f:
+            data = f.read()
+        if os.stat(self._path(obj.name)).st_mtime_ns != obj.generation:
+            raise RuntimeError("modificado durante la lectura")
+        return data
+
+    def write(self, obj, data, profile):
+        path = self._path(obj.name)
+        if os.stat(path).st_mtime_ns != obj.generation:
+            raise RuntimeError("modificado desde el listado")
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        with open(tmp, 'rb') as f:
+            if md5_base64(f.read()) != md5_base64(data):
+                os.remove(tmp)
+                raise RuntimeError("MD5 distinto tras escribir")
+        os.replace(tmp, path)
+
+
+class StorageBackend:
+    """Bucket de Cloud Storage (o el emulador de Firebase Storage)"""
+
+    def __init__(self, bucket, credentials_path=CREDENTIALS_PATH):
+        from google.cloud import storage
+        if os.environ.get('STORAGE_EMULATOR_HOST'):
+            from google.auth.credentials import AnonymousCredentials
+            client = storage.Client(project=EMULATOR_PROJECT,
+                                    credentials=AnonymousCredentials())
+        else:
+            client = storage.Client.from_service_account_json(credentials_path)
+        self.bucket = client.bucket(bucket)
+
+    def list(self, prefix):
+        for blob in self.bucket.list_blobs(prefix=prefix):
+            yield StoredObject(blob.name, blob.size, blob.md5_hash, blob.generation)
+
+    def read(self, obj):
+        return self.bucket.blob(obj.name).download_as_bytes(
+            if_generation_match=obj.generation, checksum='md5')
+
+    def write(self, obj, data, profile):
+        blob = self.bucket.get_blob(obj.name, if_generation_match=obj.generation)
+        # Solo se envían las propiedades asignadas: los metadatos (con
+        # firebaseStorageDownloadTokens) se reasignan para conservarlos
+        blob.metadata = {**(blob.metadata or {}), RECOMPRESSED: profile}
+        blob.cache_control = blob.cache_control
+        blob.content_disposition = blob.content_disposition
+        blob.upload_from_string(data, content_type='image/jpeg',
+                                if_generation_match=obj.generation, checksum='md5')
+        if blob.md5_hash != md5_base64(data):
+            raise RuntimeError("MD5 distinto tras subir")
+
+
+def open_backend(spec):
+    kind, location, credentials_path = spec
+    if kind == 'local':
+        return LocalBackend(location)
+    return StorageBackend(location, credentials_path)
+
+
+_backend = None
+
+
+def _init_worker(spec):
+    global _backend
+    _backend = open_backend(spec)
+
+
+def process(obj, profile_name, dry_run=False):
+    """Recomprime un objeto en un proceso del pool y devuelve su entrada de manifiesto"""
+    entry = {'name': obj.name, 'profile': profile_name, 'before': obj.size}
+    try:
+        data = _backend.read(obj)
+        if obj.md5 is not None and md5_base64(data) != obj.md5:
+            raise RuntimeError("MD5 distinto al descargar")
+        result, reason = recompress(data, PROFILES[profile_name])
+        if result is None:
+            entry.update(status='skipped', reason=reason, size=len(data))
+            return entry
+        if not dry_run:
+            _backend.write(obj, result, profile_name)
+        entry.update(status='rewritten', size=len(result), md5=md5_base64(result))
+    except Exception as e:
+        entry.update(status='error', reason=f"{type(e).__name__}: {e}")
+    return entry
+
+
+class Manifest:
+    """Objetos ya procesados, en un archivo JSON Lines append-only"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['name']] = entry
+        except FileNotFoundError:
+            pass
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def done(self, obj):
+        """True si obj ya se procesó y no ha cambiado desde entonces"""
+        entry = self.entries.get(obj.name)
+        return entry is not None and entry['size'] == obj.size
+
+    def add(self, entry):
+        with self._lock:
+            self.entries[entry['name']] = entry
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def pending_objects(backend, prefixes, manifest):
+    """(objeto, perfil) de lo que queda por procesar, y cuántos se omiten"""
+    skipped = Counter()
+    pending = []
+    for prefix in prefixes:
+        for obj in backend.list(prefix):
+            profile_name = profile_for(obj.name)
+            if profile_name is None:
+                skipped['otros'] += 1
+            elif manifest is not None and manifest.done(obj):
+                skipped['manifiesto'] += 1
+            else:
+                pending.append((obj, profile_name))
+    return pending, skipped
+
+
+def run(spec, pending, manifest=None, workers=PHOTO_WORKERS, dry_run=False,
+        on_result=None):
+    """Procesa pending en el pool, con como mucho 2 * workers en vuelo"""
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(spec,)) as pool:
+        in_flight = set()
+        for obj, profile_name in pending:
+            if len(in_flight) >= 2 * workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _finish(future.result(), manifest, dry_run, on_result)
+            in_flight.add(pool.submit(process, obj, profile_name, dry_run))
+        for future in wait(in_flight).done:
+            _finish(future.result(), manifest, dry_run, on_result)
+
+
+def _finish(entry, manifest, dry_run, on_result):
+    # Los errores no se anotan: se reintentan en la siguiente ejecución
+    if manifest is not None and not dry_run and entry['status'] != 'error':
+        manifest.add(entry)
+    if on_result is not None:
+        on_result(entry)
+
+
+class Report:
+    """Totales por perfil y estado"""
+
+    def __init__(self):
+        self.by_status = Counter()
+        self.reasons = Counter()
+        self.before = Counter()
+        self.after = Counter()
+        self.errors = []
+
+    def __call__(self, entry):
+        self.by_status[entry['status']] += 1
+        if entry['status'] == 'rewritten':
+            self.before[entry['profile']] += entry['before']
+            self.after[entry['profile']] += entry['size']
+        elif entry['status'] == 'skipped':
+            self.reasons[entry['reason']] += 1
+        else:
+            self.errors.append((entry['name'], entry['reason']))
+
+
+def _mb(n):
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+def print_report(report, dry_run=False):
+    verb = "se recomprimirían" if dry_run else "recomprimidas"
+    print(f"✅ {report.by_status['rewritten']} fotos {verb}, "
+          f"{report.by_status['skipped']} sin cambios, "
+          f"{report.by_status['error']} con error")
+    for profile_name in sorted(report.before):
+        before, after = report.before[profile_name], report.after[profile_name]
+        print(f"   🗜️  {profile_name}: {_mb(before)} → {_mb(after)} "
+              f"(-{(1 - after / before) * 100:.1f}%)")
+    saved = sum(report.before.values()) - sum(report.after.values())
+    print(f"💾 {_mb(saved)} ahorrados")
+    for reason, n in report.reasons.most_common():
+        print(f"   ⏭️  {reason}: {n}")
+    for name, reason in report.errors[:10]:
+        print(f"   ❌ {name}: {reason}")
+    if report.errors:
+        print("♻️  Vuelve a ejecutar para reintentar lo pendiente")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recomprime las fotos antiguas de Storage")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--bucket', help="bucket de Firebase Storage")
+    source.add_argument('--local', help="directorio con la estructura de Storage")
+    parser.add_argument('--credentials', default=CREDENTIALS_PATH,
+                        help="JSON de la cuenta de servicio (ignorado con el emulador)")
+    parser.add_argument('--prefix', action='append',
+                        help=f"prefijo a recorrer (repetible; por defecto {' '.join(PREFIXES)})")
+    parser.add_argument('--manifest', default='recompress_photos.manifest.jsonl',
+                        help="objetos ya procesados, para retomar")
+    parser.add_argument('--workers', type=int, default=PHOTO_WORKERS,
+                        help="procesos de compresión")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="calcular el ahorro sin reescribir nada")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.local:
+        spec = ('local', args.local, None)
+        print(f"📁 Directorio local {args.local}")
+    else:
+        spec = ('storage', args.bucket, args.credentials)
+        if os.environ.get('STORAGE_EMULATOR_HOST'):
+            print("🧪 Usando el emulador de Storage")
+    try:
+        backend = open_backend(spec)
+    except Exception as e:
+        print(f"❌ Error al abrir el almacenamiento: {e}")
+        sys.exit(1)
+
+    started = time.monotonic()
+    manifest = Manifest(args.manifest)
+    try:
+        pending, skipped = pending_objects(backend, args.prefix or PREFIXES, manifest)
+        print(f"🔎 {len(pending)} fotos por revisar"
+              + (f", {skipped['manifiesto']} ya procesadas" if skipped['manifiesto'] else '')
+              + (f", {skipped['otros']} archivos que no son fotos" if skipped['otros'] else ''))
+        report = Report()
+        run(spec, pending, manifest, workers=args.workers, dry_run=args.dry_run,
+            on_result=report)
+    finally:
+        manifest.close()
+    print_report(report, dry_run=args.dry_run)
+    print(f"⏱️  {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,602 @@
+#!/usr/bin/env python3
+"""
+Costo en lecturas de las reglas de seguridad de Firestore.
+
+Análisis estático: parsea firestore.rules, arma el grafo de llamadas entre
+funciones (isAdmin → getUserRole → get()) y reporta, para cada match y
+cada operación (get, list, create, update, delete), el peor caso de
+get()/exists() evaluados. Se cuentan todas las ramas, sin cortocircuito:
+es el peor caso, el de un usuario al que se le niega el acceso. Firestore
+cobra una sola vez cada documento distinto dentro de la misma petición,
+así que también se reportan las rutas distintas (lo que se factura) y se
+marca lo que supera el límite de 10 accesos por petición.
+
+Benchmark: --bench reproduce un archivo de peticiones contra el emulador
+local de Firestore, una vez por cada archivo de reglas y otra con reglas
+abiertas como referencia, y reporta la latencia p50/p95 por operación,
+la diferencia con la referencia (lo que cuesta evaluar las reglas) y las
+peticiones cuyo resultado (permitida o denegada) cambia entre versiones.
+
+    python3 scripts/rules_cost.py firestore.rules
+    python3 scripts/rules_cost.py firestore.rules --graph
+    python3 scripts/rules_cost.py firestore.rules firestore.claims.rules \\
+        --bench requests.jsonl --seed seed.jsonl
+
+Formato de --bench (JSON Lines, una petición por línea):
+    {"op": "get", "path": "tickets/t1", "uid": "u1", "claims": {"rol": "admin"}}
+    {"op": "list", "path": "tickets", "uid": "u1"}
+    {"op": "create", "path": "tickets/t2", "uid": "u1", "data": {"userId": "u1"}}
+    {"op": "update", "path": "tickets/t2", "uid": "u1", "data": {"estado": "ok"}}
+    {"op": "delete", "path": "tickets/t2"}          (sin uid: anónimo)
+--seed: {"path": "users/u1", "data": {...}} por línea, escrito sin reglas.
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+
+OPERATIONS = ['get', 'list', 'create', 'update', 'delete']
+OPERATION_GROUPS = {
+    'read': ['get', 'list'],
+    'write': ['create', 'update', 'delete'],
+}
+ACCESS_FUNCTIONS = {'get', 'exists', 'getAfter', 'existsAfter'}
+# Documentos distintos que una petición puede leer desde las reglas
+ACCESS_LIMIT = 10
+
+TOKEN_RE = re.compile(r"""
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<op>==|!=|<=|>=|&&|\|\||[{}()\[\];:,.=<>!?+\-*/%$])
+""", re.S | re.X)
+
+
+class RulesSyntaxError(ValueError):
+    pass
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    line = 1
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if match is None:
+            raise RulesSyntaxError(f"línea {line}: carácter inesperado "
+                                   f"{text[position]!r}")
+        kind = match.lastgroup
+        if kind != 'space':
+            tokens.append((match.group(), line))
+        line += match.group().count('\n')
+        position = match.end()
+    return tokens
+
+
+class Function:
+    def __init__(self, name, params, body, scope, line):
+        self.name = name
+        self.params = params
+        self.body = body
+        self.scope = scope
+        self.line = line
+
+
+class Allow:
+    def __init__(self, operations, condition, line):
+        self.operations = operations
+        self.condition = condition
+        self.line = line
+
+
+class Match:
+    def __init__(self, path, parent=None):
+        self.path = path
+        self.parent = parent
+        self.functions = {}
+        self.allows = []
+        self.children = []
+
+    @property
+    def full_path(self):
+        if self.parent is None:
+            return self.path
+        return self.parent.full_path.rstrip('/') + self.path
+
+    def lookup(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.functions:
+                return scope.functions[name]
+            scope = scope.parent
+        return None
+
+
+class Parser:
+    """Parser de la estructura de las reglas (match, function, allow).
+
+    Las expresiones no se parsean: se guardan como listas de tokens, que
+    bastan para encontrar las llamadas.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index][0] if index < len(self.tokens) else None
+
+    def line(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][1]
+        return self.tokens[-1][1] if self.tokens else 0
+
+    def next(self):
+        if self.position >= len(self.tokens):
+            raise RulesSyntaxError("fin de archivo inesperado")
+        token = self.tokens[self.position][0]
+        self.position += 1
+        return token
+
+    def expect(self, token):
+        line = self.line()
+        found = self.next()
+        if found != token:
+            raise RulesSyntaxError(f"línea {line}: se esperaba {token!r} "
+                                   f"y se encontró {found!r}")
+
+    def until(self, *stops):
+        """Tokens hasta uno de stops fuera de paréntesis/llaves/corchetes"""
+        depth = 0
+        tokens = []
+        while True:
+            token = self.peek()
+            if token is None:
+                raise RulesSyntaxError("fin de archivo inesperado")
+            if depth == 0 and token in stops:
+                return tokens
+            if token in ('(', '[', '{'):
+                depth += 1
+            elif token in (')', ']', '}'):
+                depth -= 1
+            tokens.append(self.next())
+
+    def match_path(self):
+        """Ruta de un match: sus {variables} no abren el bloque"""
+        tokens = []
+        while True:
+            token = self.peek()
+            if token is None:
+                raise RulesSyntaxError("fin de archivo inesperado")
+            if token == '{' and not (self.peek(1) not in (None, '}')
+                                     and self.peek(2) in ('}', '=')):
+                return ''.join(tokens)
+            if token == '{':
+                while self.peek() != '}':
+                    tokens.append(self.next())
+            tokens.append(self.next())
+
+    def parse(self):
+        root = Match('')
+        while self.peek() is not None:
+            token = self.next()
+            if token == 'service':
+                self.until('{')
+                self.expect('{')
+                self.block(root)
+            elif token == 'rules_version':
+                self.until(';')
+                self.expect(';')
+            else:
+                raise RulesSyntaxError(f"línea {self.line()}: {token!r} inesperado")
+        return root
+
+    def block(self, scope):
+        while True:
+            token = self.peek()
+            if token == '}':
+                self.next()
+                return
+            line = self.line()
+            token = self.next()
+            if token == 'match':
+                path = self.match_path()
+                self.expect('{')
+                child = Match(path, scope)
+                scope.children.append(child)
+                self.block(child)
+            elif token == 'function':
+                name = self.next()
+                self.expect('(')
+                params = [t for t in self.until(')') if t != ',']
+                self.expect(')')
+                self.expect('{')
+                body = self.until('}')
+                self.expect('}')
+                scope.functions[name] = Function(name, params, body, scope, line)
+            elif token == 'allow':
+                operations = [t for t in self.until(':', ';') if t != ',']
+                condition = []
+                if self.peek() == ':':
+                    self.next()
+                    self.expect('if')
+                    condition = self.until(';')
+                self.expect(';')
+                scope.allows.append(Allow(operations, condition, line))
+            else:
+                raise RulesSyntaxError(f"línea {line}: {token!r} inesperado")
+
+
+def parse_rules(text):
+    return Parser(tokenize(text)).parse()
+
+
+def calls(tokens):
+    """[(nombre, tokens de los argumentos)] de las llamadas a funciones"""
+    found = []
+    for i, token in enumerate(tokens[:-1]):
+        if tokens[i + 1] != '(' or not (token[0].isalpha() or token[0] == '_'):
+            continue
+        if i > 0 and tokens[i - 1] == '.':
+            # Método de un valor: role.lower()
+            continue
+        depth = 0
+        for j in range(i + 1, len(tokens)):
+            if tokens[j] == '(':
+                depth += 1
+            elif tokens[j] == ')':
+                depth -= 1
+                if depth == 0:
+                    break
+        found.append((token, tokens[i + 2:j]))
+    return found
+
+
+class Cost:
+    """Accesos a documentos del peor caso de una expresión o función"""
+
+    def __init__(self):
+        # Cada acceso: (función, ruta, cadena de llamadas)
+        self.accesses = []
+
+    @property
+    def calls(self):
+        return len(self.accesses)
+
+    @property
+    def documents(self):
+        return len({path for _fn, path, _chain in self.accesses})
+
+    def add(self, other, via=None):
+        for fn, path, chain in other.accesses:
+            self.accesses.append((fn, path, ([via] if via else []) + chain))
+
+
+class Analyzer:
+    """Costo memoizado de cada función y de cada regla"""
+
+    def __init__(self, root):
+        self.root = root
+        self._costs = {}
+        self.graph = {}
+
+    def function_cost(self, function):
+        key = id(function)
+        if key in self._costs:
+            return self._costs[key]
+        self._costs[key] = Cost()  # las reglas no admiten recursión
+        cost = self.expression_cost(function.body, function.scope,
+                                    caller=function.name)
+        self._costs[key] = cost
+        return cost
+
+    def expression_cost(self, tokens, scope, caller=None):
+        cost = Cost()
+        for name, args in calls(tokens):
+            if name in ACCESS_FUNCTIONS:
+                path = ''.join(args)
+                cost.accesses.append((name, path, []))
+                if caller:
+                    self.graph.setdefault(caller, set()).add(f"{name}()")
+                continue
+            function = scope.lookup(name)
+            if function is None:
+                continue
+            if caller:
+                self.graph.setdefault(caller, set()).add(name)
+            cost.add(self.function_cost(function), via=name)
+        return cost
+
+    def matches(self, scope=None):
+        scope = scope or self.root
+        for child in scope.children:
+            yield child
+            yield from self.matches(child)
+
+    def report(self):
+        """[(match, línea, {operación: Cost o None si se deniega})]"""
+        rows = []
+        for match in self.matches():
+            if not match.allows:
+                continue
+            costs = {}
+            for allow in match.allows:
+                cost = self.expression_cost(allow.condition, match)
+                for operation in allow.operations:
+                    for op in OPERATION_GROUPS.get(operation, [operation]):
+                        costs.setdefault(op, Cost()).add(cost)
+            rows.append((match.full_path, match.allows[0].line,
+                         {op: costs.get(op) for op in OPERATIONS}))
+        return rows
+
+
+def short_path(path):
+    """Ruta sin el prefijo común de la base de datos"""
+    for prefix in ('/databases/$(database)/documents', '/databases/{database}/documents'):
+        path = path.replace(prefix, '')
+    return path or '/'
+
+
+def print_report(name, analyzer, graph=False):
+    print(f"📜 {name}")
+    rows = analyzer.report()
+    if graph:
+        print("   Grafo de llamadas:")
+        for caller in sorted(analyzer.graph):
+            print(f"     {caller} → {', '.join(sorted(analyzer.graph[caller]))}")
+        print()
+    print(f"   {'match':<40}" + ''.join(f"{op:>10}" for op in OPERATIONS))
+    chains = {}
+    for path, _line, costs in rows:
+        cells = []
+        for op in OPERATIONS:
+            cost = costs[op]
+            if cost is None:
+                cells.append(f"{'-':>10}")
+                continue
+            flag = '⚠️' if cost.documents > ACCESS_LIMIT else ''
+            cells.append(f"{f'{cost.calls}/{cost.documents}{flag}':>10}")
+            for fn, doc_path, chain in cost.accesses:
+                chains[' → '.join(chain + [f"{fn}({short_path(doc_path)})"])] = True
+        print(f"   {short_path(path):<40}" + ''.join(cells))
+    print("   (llamadas evaluadas / documentos distintos facturados; '-' = denegado)")
+    if chains:
+        print("   Lecturas:")
+        for chain in chains:
+            print(f"     {chain}")
+    print()
+
+
+def analyze(paths, graph=False):
+    results = {}
+    for path in paths:
+        with open(path) as f:
+            analyzer = Analyzer(parse_rules(f.read()))
+        print_report(path, analyzer, graph)
+        results[path] = {
+            match: {op: (None if cost is None else
+                         {'calls': cost.calls, 'documents': cost.documents})
+                    for op, cost in costs.items()}
+            for match, _line, costs in analyzer.report()
+        }
+    return results
+
+
+# --- Benchmark contra el emulador -------------------------------------------
+
+OPEN_RULES = """rules_version = '2';
+service cloud.firestore {
+  match /databases/{database}/documents {
+    match /{document=**} {
+      allow read, write: if true;
+    }
+  }
+}
+"""
+
+
+def encode_value(value):
+    """Valor JSON -> Value de la API REST de Firestore"""
+    if value is None:
+        return {'nullValue': None}
+    if isinstance(value, bool):
+        return {'booleanValue': value}
+    if isinstance(value, int):
+        return {'integerValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, str):
+        return {'stringValue': value}
+    if isinstance(value, list):
+        return {'arrayValue': {'values': [encode_value(v) for v in value]}}
+    if isinstance(value, dict):
+        return {'mapValue': {'fields': {k: encode_value(v) for k, v in value.items()}}}
+    raise TypeError(f"Valor no soportado: {value!r}")
+
+
+def id_token(uid, claims=None):
+    """JWT sin firmar; el emulador lo acepta para evaluar las reglas"""
+    def part(data):
+        raw = json.dumps(data, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+    now = int(time.time())
+    payload = {'sub': uid, 'user_id': uid, 'iat': now, 'exp': now + 3600,
+               'auth_time': now, 'firebase': {'sign_in_provider': 'custom'},
+               **(claims or {})}
+    return f"{part({'alg': 'none', 'typ': 'JWT'})}.{part(payload)}."
+
+
+class Emulator:
+    """Cliente REST mínimo del emulador de Firestore"""
+
+    def __init__(self, host, project):
+        self.base = f"http://{host}"
+        self.documents = (f"{self.base}/v1/projects/{project}"
+                          f"/databases/(default)/documents")
+        self.project = project
+
+    def call(self, method, url, body=None, token=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(url, data=data, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if token:
+            request.add_header('Authorization', f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+    def load_rules(self, rules):
+        status = self.call('PUT', f"{self.base}/emulator/v1/projects/"
+                                  f"{self.project}:securityRules",
+                           {'rules': {'files': [{'name': 'firestore.rules',
+                                                 'content': rules}]}})
+        if status != 200:
+            raise RuntimeError(f"El emulador rechazó las reglas (HTTP {status})")
+
+    def write(self, path, data, token='owner'):
+        # 'owner' es el token de administrador del emulador: ignora las reglas
+        return self.call('PATCH', f"{self.documents}/{path}",
+                         {'fields': {k: encode_value(v) for k, v in data.items()}},
+                         token=token)
+
+    def request(self, entry):
+        """Ejecuta una petición grabada y devuelve el código HTTP"""
+        token = id_token(entry['uid'], entry.get('claims')) if entry.get('uid') else None
+        op, path = entry['op'], entry['path']
+        url = f"{self.documents}/{path}"
+        if op in ('get', 'list'):
+            return self.call('GET', url, token=token)
+        if op == 'delete':
+            return self.call('DELETE', url, token=token)
+        fields = {'fields': {k: encode_value(v)
+                             for k, v in entry.get('data', {}).items()}}
+        if op == 'create':
+            collection, doc_id = path.rsplit('/', 1)
+            return self.call('POST', f"{self.documents}/{collection}"
+                                     f"?documentId={doc_id}", fields, token=token)
+        mask = '&'.join(f"updateMask.fieldPaths={k}" for k in entry.get('data', {}))
+        return self.call('PATCH', f"{url}?{mask}&currentDocument.exists=true",
+                         fields, token=token)
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def bench_rules(emulator, rules, requests, seed, rounds):
+    """Latencias por operación y resultado de cada petición con rules"""
+    emulator.load_rules(rules)
+    latencies = {}
+    outcomes = []
+    for round_number in range(rounds):
+        # Cada ronda parte de los mismos datos: create/delete son repetibles
+        for entry in seed:
+            emulator.write(entry['path'], entry['data'])
+        for entry in requests:
+            started = time.perf_counter()
+            status = emulator.request(entry)
+            latencies.setdefault(entry['op'], []).append(time.perf_counter() - started)
+            if round_number == 0:
+                outcomes.append(status)
+    return latencies, outcomes
+
+
+def bench(paths, args):
+    requests = read_jsonl(args.bench)
+    seed = read_jsonl(args.seed) if args.seed else []
+    emulator = Emulator(args.emulator, args.project)
+    runs = {'(abiertas)': OPEN_RULES}
+    for path in paths:
+        with open(path) as f:
+            runs[path] = f.read()
+    results = {}
+    for name, rules in runs.items():
+        latencies, outcomes = bench_rules(emulator, rules, requests, seed, args.rounds)
+        results[name] = {
+            'latency_ms': {op: {'p50': percentile(v, 50) * 1000,
+                                'p95': percentile(v, 95) * 1000,
+                                'n': len(v)}
+                           for op, v in latencies.items()},
+            'outcomes': outcomes,
+        }
+    emulator.load_rules(runs[paths[0]])
+
+    base = results['(abiertas)']['latency_ms']
+    print(f"⏱️  {len(requests)} peticiones × {args.rounds} rondas contra {args.emulator}")
+    for name, result in results.items():
+        allowed = sum(1 for status in result['outcomes'] if status < 400)
+        print(f"📜 {name}: {allowed}/{len(requests)} permitidas")
+        for op in OPERATIONS:
+            if op not in result['latency_ms']:
+                continue
+            stats = result['latency_ms'][op]
+            delta = stats['p50'] - base[op]['p50']
+            print(f"   {op:<8} p50 {stats['p50']:7.2f} ms  p95 {stats['p95']:7.2f} ms"
+                  + ('' if name == '(abiertas)' else f"  ({delta:+.2f} ms reglas)"))
+    if len(paths) > 1:
+        first = results[paths[0]]['outcomes']
+        for path in paths[1:]:
+            changed = [i for i, (a, b) in enumerate(zip(first, results[path]['outcomes']))
+                       if (a < 400) != (b < 400)]
+            print(f"🔀 {path}: {len(changed)} peticiones cambian de resultado "
+                  f"respecto a {paths[0]}")
+            for i in changed[:10]:
+                entry = requests[i]
+                print(f"   {entry['op']} {entry['path']} uid={entry.get('uid')}: "
+                      f"{first[i]} → {results[path]['outcomes'][i]}")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Costo en lecturas de firestore.rules")
+    parser.add_argument('rules', nargs='*', default=['firestore.rules'],
+                        help="archivos de reglas (por defecto firestore.rules)")
+    parser.add_argument('--graph', action='store_true',
+                        help="mostrar el grafo de llamadas entre funciones")
+    parser.add_argument('--bench', help="peticiones (JSONL) a reproducir en el emulador")
+    parser.add_argument('--seed', help="documentos (JSONL) a escribir antes de cada ronda")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--emulator', default=os.environ.get('FIRESTORE_EMULATOR_HOST',
+                                                             'localhost:8080'))
+    parser.add_argument('--project', default=os.environ.get('GCLOUD_PROJECT',
+                                                            'demo-sutodero'))
+    parser.add_argument('--out', help="guardar los resultados en JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        output = {'analysis': analyze(args.rules, args.graph)}
+    except RulesSyntaxError as e:
+        print(f"❌ Error de sintaxis: {e}")
+        sys.exit(1)
+    if args.bench:
+        output['bench'] = bench(args.rules, args)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
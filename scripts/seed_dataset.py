@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Dataset sintético en el emulador de Firestore para probar los scripts de
+mantenimiento a escala.
+
+Llena users, properties, rooms, tickets, property_listings,
+inventory_acts, virtual_tours y evaluations con documentos con la forma de
+los modelos de lib/models/ (toMap), repartiendo --documents entre las
+colecciones según WEIGHTS. Una fracción --orphan-ratio de los documentos
+se escribe sin userId (y los tickets, sin participantIds), como los datos
+anteriores a la migración; conservan los campos de relación (propertyId,
+cliente.id, createdBy, clienteEmail...) para que ownership.py pueda
+resolver su propietario. Siempre hay un usuario admin, el que busca
+migrate_userid_fields.py.
+
+El contenido depende solo de --seed y del índice de cada documento (IDs
+incluidos), así que dos ejecuciones con los mismos parámetros generan los
+mismos datos y se pueden comparar sus benchmarks. Los documentos se
+generan sobre la marcha y se escriben en lotes confirmados en paralelo
+(BatchWriter), sin tenerlos todos en memoria.
+
+Solo funciona contra el emulador (FIRESTORE_EMULATOR_HOST):
+
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python3 scripts/seed_dataset.py \\
+        --documents 100000 --orphan-ratio 0.3 --clear
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import string
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+from firestore_batch import (COMMIT_WORKERS, MAX_BATCH_SIZE, MAX_RATE, AdaptiveThrottle,
+                             BatchWriter, connect, using_emulator)
+
+# Parte de --documents que va a cada colección
+WEIGHTS = {
+    'users': 0.02,
+    'properties': 0.12,
+    'rooms': 0.36,
+    'tickets': 0.22,
+    'property_listings': 0.08,
+    'inventory_acts': 0.08,
+    'virtual_tours': 0.04,
+    'evaluations': 0.08,
+}
+# Fechas entre START y START + SPAN_DAYS
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SPAN_DAYS = 700
+ID_ALPHABET = string.ascii_letters + string.digits
+
+NOMBRES = ['Andrés', 'Camila', 'Juan', 'Valentina', 'Carlos', 'Laura', 'Santiago',
+           'Daniela', 'Felipe', 'Mariana', 'Jorge', 'Natalia', 'Luis', 'Paula']
+APELLIDOS = ['Gómez', 'Rodríguez', 'Martínez', 'López', 'García', 'Hernández',
+             'Ramírez', 'Torres', 'Vargas', 'Moreno', 'Rojas', 'Castro']
+CIUDADES = {
+    'Bogotá': ['Chapinero', 'Usaquén', 'Suba', 'Teusaquillo', 'Kennedy'],
+    'Medellín': ['El Poblado', 'Laureles', 'Belén', 'Envigado'],
+    'Cali': ['Granada', 'San Fernando', 'Ciudad Jardín'],
+    'Barranquilla': ['El Prado', 'Riomar', 'Alto Prado'],
+}
+PROPERTY_TYPES = ['casa', 'apartamento', 'oficina', 'local', 'bodega', 'terreno', 'otro']
+ROOM_TYPES = ['sala', 'comedor', 'cocina', 'alcoba', 'bano', 'estudio', 'patio',
+              'balcon', 'garaje', 'lavanderia', 'otro']
+ROOM_STATES = ['excelente', 'bueno', 'regular', 'malo', 'critico']
+ITEM_TYPES = ['puerta', 'ventana', 'lampara', 'toma', 'interruptor', 'closet']
+MATERIALS = ['madera', 'metal', 'vidrio', 'pvc', 'ceramica']
+TICKET_STATES = ['nuevo', 'pendiente', 'asignado', 'en_camino', 'en_lugar',
+                 'en_ejecucion', 'pendiente_repuestos', 'finalizado', 'cancelado']
+PRIORITIES = ['baja', 'media', 'alta', 'urgente']
+SERVICES = ['plomeria', 'electricidad', 'pintura', 'carpinteria', 'albanileria',
+            'climatizacion', 'limpieza', 'jardineria', 'cerrajeria',
+            'electrodomesticos', 'otro']
+TRANSACTIONS = ['venta', 'arriendo', 'ventaArriendo']
+LISTING_STATES = ['activo', 'enNegociacion', 'vendido', 'arrendado', 'cancelado']
+TOUR_OPTIONS = ['tour', 'images', 'both']
+STORAGE = 'https://firebasestorage.googleapis.com/v0/b/demo-sutodero.appspot.com/o/'
+
+
+def collection_sizes(documents):
+    """Documentos por colección para un total de documents (al menos 2 usuarios)"""
+    sizes = {name: int(documents * weight) for name, weight in WEIGHTS.items()}
+    sizes['users'] = max(sizes['users'], 2)
+    return sizes
+
+
+class Dataset:
+    """Generador determinista de documentos.
+
+    Cada documento sale de un Random propio sembrado con (seed, colección,
+    índice): se puede generar cualquiera sin generar los anteriores, y las
+    relaciones (propiedad de una habitación, dueño de una propiedad...) se
+    recalculan igual desde cualquier colección.
+    """
+
+    def __init__(self, documents, orphan_ratio=0.2, seed=0):
+        self.seed = seed
+        self.orphan_ratio = orphan_ratio
+        self.sizes = collection_sizes(documents)
+        # Usuario 0: admin; luego un maestro de cada 5 y algún coordinador
+        self.roles = [self._role(i) for i in range(self.sizes['users'])]
+        self.clients = [i for i, rol in enumerate(self.roles) if rol == 'cliente'] or [0]
+        self.maestros = [i for i, rol in enumerate(self.roles) if rol == 'maestro'] or [0]
+
+    @staticmethod
+    def _role(i):
+        if i == 0:
+            return 'admin'
+        if i % 5 == 1:
+            return 'maestro'
+        if i % 50 == 2:
+            return 'coordinador'
+        return 'cliente'
+
+    def rng(self, *key):
+        return random.Random(':'.join(str(k) for k in (self.seed, *key)))
+
+    def doc_id(self, collection, i):
+        """ID de 20 caracteres como los autogenerados por Firestore"""
+        digest = hashlib.blake2b(f"{self.seed}:{collection}:{i}".encode(),
+                                 digest_size=20).digest()
+        return ''.join(ID_ALPHABET[b % len(ID_ALPHABET)] for b in digest)
+
+    def uid(self, user):
+        return self.doc_id('users', user)
+
+    def name(self, user):
+        rng = self.rng('users', user)
+        return f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}"
+
+    def email(self, user):
+        return f"usuario{user}@sutodero.test"
+
+    def phone(self, rng):
+        return f"3{rng.randrange(10**9):09d}"
+
+    def date(self, rng, after=None):
+        start = after or START
+        end = START + timedelta(days=SPAN_DAYS)
+        seconds = max(1, int((end - start).total_seconds()))
+        return start + timedelta(seconds=rng.randrange(seconds))
+
+    def iso(self, value):
+        # DateTime.toIso8601String() de Dart: hora local, sin zona
+        return value.replace(tzinfo=None).isoformat(timespec='milliseconds')
+
+    def photos(self, rng, folder, n):
+        return [f"{STORAGE}{folder}%2F{rng.getrandbits(64):016x}.jpg?alt=media"
+                for _ in range(n)]
+
+    def address(self, rng):
+        ciudad = rng.choice(list(CIUDADES))
+        barrio = rng.choice(CIUDADES[ciudad])
+        return (f"Calle {rng.randrange(1, 200)} # {rng.randrange(1, 120)}-"
+                f"{rng.randrange(1, 99)}", ciudad, barrio)
+
+    def property_owner(self, i):
+        return self.clients[self.rng('owner', i).randrange(len(self.clients))]
+
+    def orphan(self, rng, data):
+        """Quita userId a una fracción orphan_ratio de los documentos"""
+        if rng.random() < self.orphan_ratio:
+            del data['userId']
+            data.pop('participantIds', None)
+        return data
+
+    # Un método por colección: índice -> documento (toMap del modelo)
+
+    def users(self, i):
+        rng = self.rng('users', i)
+        return {
+            'uid': self.uid(i),
+            'nombre': self.name(i),
+            'email': self.email(i),
+            'rol': self.roles[i],
+            'telefono': self.phone(rng),
+            'direccion': self.address(rng)[0],
+            'genero': rng.choice(['masculino', 'femenino', 'otro']),
+            'photoURL': None,
+            'fechaCreacion': self.date(rng),
+            'activo': rng.random() > 0.05,
+        }
+
+    def properties(self, i):
+        rng = self.rng('properties', i)
+        owner = self.property_owner(i)
+        direccion, ciudad, barrio = self.address(rng)
+        created = self.date(rng)
+        return self.orphan(rng, {
+            'id': self.doc_id('properties', i),
+            'userId': self.uid(owner),
+            'direccion': direccion,
+            'clienteNombre': self.name(owner),
+            'clienteTelefono': self.phone(rng),
+            'clienteEmail': self.email(owner),
+            'tipo': rng.choice(PROPERTY_TYPES),
+            'descripcion': f"Inmueble en {barrio}",
+            'fotos': self.photos(rng, 'properties', rng.randrange(6)),
+            'fechaCreacion': self.iso(created),
+            'fechaActualizacion': self.iso(self.date(rng, created)),
+            'observaciones': None,
+            'area': round(rng.uniform(30, 400), 1),
+            'numeroHabitaciones': rng.randrange(1, 6),
+            'numeroBanos': rng.randrange(1, 4),
+            'garaje': rng.random() < 0.5,
+            'activa': rng.random() > 0.1,
+            'pais': 'Colombia',
+            'ciudad': ciudad,
+            'municipio': ciudad,
+            'barrio': barrio,
+            'numeroNiveles': rng.randrange(1, 4),
+            'codigoInterno': f"INV-{i:07d}",
+        })
+
+    def rooms(self, i):
+        rng = self.rng('rooms', i)
+        prop = rng.randrange(max(1, self.sizes['properties']))
+        room_id = self.doc_id('rooms', i)
+        created = self.date(rng)
+        return self.orphan(rng, {
+            'id': room_id,
+            'userId': self.uid(self.property_owner(prop)),
+            'propertyId': self.doc_id('properties', prop),
+            'nombre': f"Espacio {i}",
+            'tipo': rng.choice(ROOM_TYPES),
+            'estado': rng.choice(ROOM_STATES),
+            'descripcion': None,
+            'fotos': self.photos(rng, 'rooms', rng.randrange(4)),
+            'foto360Url': None,
+            'fechaCreacion': self.iso(created),
+            'fechaActualizacion': self.iso(self.date(rng, created)),
+            'ancho': round(rng.uniform(2, 8), 2),
+            'largo': round(rng.uniform(2, 10), 2),
+            'altura': 2.4,
+            'nivel': 1,
+            'problemas': [],
+            'items': [{
+                'id': f"{room_id}_{n}",
+                'roomId': room_id,
+                'cantidad': rng.randrange(1, 4),
+                'tipo': rng.choice(ITEM_TYPES),
+                'material': rng.choice(MATERIALS),
+                'estado': rng.choice(ROOM_STATES),
+                'comentarios': None,
+                'fotos': [],
+                'fechaCreacion': self.iso(created),
+                'fechaActualizacion': None,
+            } for n in range(rng.randrange(4))],
+        })
+
+    def tickets(self, i):
+        rng = self.rng('tickets', i)
+        client = self.clients[rng.randrange(len(self.clients))]
+        estado = rng.choice(TICKET_STATES)
+        maestro = (None if estado in ('nuevo', 'pendiente')
+                   else self.maestros[rng.randrange(len(self.maestros))])
+        maestro_id = self.uid(maestro) if maestro is not None else None
+        maestro_nombre = self.name(maestro) if maestro is not None else None
+        created = self.date(rng)
+        client_id = self.uid(client)
+        direccion = self.address(rng)[0]
+        return self.orphan(rng, {
+            'id': self.doc_id('tickets', i),
+            'codigo': f"TK-{i:07d}",
+            'titulo': f"Servicio de {rng.choice(SERVICES)}",
+            'descripcion': 'Solicitud generada para pruebas de carga',
+            'estado': estado,
+            'prioridad': rng.choice(PRIORITIES),
+            'fechaCreacion': created,
+            'fechaProgramada': None,
+            'ubicacion': {'direccion': direccion, 'lat': None, 'lng': None},
+            'fotosAntes': self.photos(rng, 'tickets', rng.randrange(3)),
+            'fotosDurante': [],
+            'fotosDespues': [],
+            'materialesUsados': [],
+            'historial': [],
+            'cliente': {'id': client_id, 'nombre': self.name(client),
+                        'telefono': self.phone(rng), 'email': self.email(client)},
+            'clienteId': client_id,
+            'clienteNombre': self.name(client),
+            'clienteEmail': self.email(client),
+            'maestroAsignado': {'id': maestro_id, 'nombre': maestro_nombre},
+            'maestroId': maestro_id,
+            'maestroNombre': maestro_nombre,
+            'tecnicoId': maestro_id,
+            'toderoId': maestro_id,
+            'userId': client_id,
+            'participantIds': sorted({client_id} | ({maestro_id} if maestro_id else set())),
+            'tipoServicio': rng.choice(SERVICES),
+            'fechaActualizacion': self.date(rng, created),
+        })
+
+    def property_listings(self, i):
+        rng = self.rng('property_listings', i)
+        owner = self.clients[rng.randrange(len(self.clients))]
+        direccion, ciudad, barrio = self.address(rng)
+        transaccion = rng.choice(TRANSACTIONS)
+        created = self.date(rng)
+        return self.orphan(rng, {
+            'id': self.doc_id('property_listings', i),
+            'userId': self.uid(owner),
+            'titulo': f"{rng.choice(PROPERTY_TYPES).capitalize()} en {barrio}",
+            'direccion': direccion,
+            'ciudad': ciudad,
+            'barrio': barrio,
+            'tipo': rng.choice(PROPERTY_TYPES),
+            'transaccionTipo': transaccion,
+            'estado': rng.choice(LISTING_STATES),
+            'descripcion': None,
+            'area': round(rng.uniform(30, 400), 1),
+            'numeroHabitaciones': rng.randrange(1, 6),
+            'numeroBanos': rng.randrange(1, 4),
+            'numeroParqueaderos': rng.randrange(3),
+            'estrato': rng.randrange(1, 7),
+            'precioVenta': (rng.randrange(150, 2000) * 1_000_000
+                            if transaccion != 'arriendo' else None),
+            'precioArriendo': (rng.randrange(8, 80) * 100_000
+                               if transaccion != 'venta' else None),
+            'caracteristicas': [],
+            'fotos': self.photos(rng, 'property_listings', rng.randrange(8)),
+            'fotos360': self.photos(rng, 'property_listings_360', rng.randrange(3)),
+            'propietarioNombre': self.name(owner),
+            'propietarioTelefono': self.phone(rng),
+            'propietarioEmail': self.email(owner),
+            'fechaCreacion': self.iso(created),
+            'fechaActualizacion': self.iso(self.date(rng, created)),
+            'activo': rng.random() > 0.1,
+            'pais': 'Colombia',
+        })
+
+    def inventory_acts(self, i):
+        rng = self.rng('inventory_acts', i)
+        prop = rng.randrange(max(1, self.sizes['properties']))
+        owner = self.property_owner(prop)
+        created = self.date(rng)
+        n_rooms = max(1, self.sizes['rooms'])
+        return self.orphan(rng, {
+            'id': self.doc_id('inventory_acts', i),
+            'propertyId': self.doc_id('properties', prop),
+            'propertyAddress': self.address(rng)[0],
+            'propertyType': rng.choice(PROPERTY_TYPES),
+            'clientName': self.name(owner),
+            'clientEmail': self.email(owner),
+            'roomIds': [self.doc_id('rooms', rng.randrange(n_rooms))
+                        for _ in range(rng.randrange(1, 6))],
+            'photoUrls': self.photos(rng, 'inventory_acts', rng.randrange(6)),
+            'createdBy': self.uid(owner),
+            'userId': self.uid(owner),
+            'createdByName': self.name(owner),
+            'createdByRole': 'inventarios',
+            'createdAt': self.iso(created),
+            'updatedAt': self.iso(self.date(rng, created)),
+            'isCompleted': rng.random() < 0.7,
+        })
+
+    def virtual_tours(self, i):
+        rng = self.rng('virtual_tours', i)
+        prop = rng.randrange(max(1, self.sizes['properties']))
+        return self.orphan(rng, {
+            'property_id': self.doc_id('properties', prop),
+            'property_name': f"Inmueble {prop}",
+            'property_address': self.address(rng)[0],
+            'photo_360_urls': self.photos(rng, 'virtual_tours', rng.randrange(1, 6)),
+            'description': None,
+            'created_at': self.date(rng),
+            'tour_option': rng.choice(TOUR_OPTIONS),
+            'userId': self.uid(self.property_owner(prop)),
+        })
+
+    def evaluations(self, i):
+        rng = self.rng('evaluations', i)
+        maestro = self.maestros[rng.randrange(len(self.maestros))]
+        client = self.clients[rng.randrange(len(self.clients))]
+        criterios = {name: rng.randrange(1, 6) for name in
+                     ('puntualidad', 'calidadTrabajo', 'limpieza', 'profesionalismo')}
+        ticket = rng.randrange(max(1, self.sizes['tickets']))
+        return {
+            'id': self.doc_id('evaluations', i),
+            'ticketId': self.doc_id('tickets', ticket),
+            'ticketCodigo': f"TK-{ticket:07d}",
+            'maestroId': self.uid(maestro),
+            'maestroNombre': self.name(maestro),
+            'evaluadorId': self.uid(client),
+            'evaluadorNombre': self.name(client),
+            'evaluadorRol': 'cliente',
+            'criterios': criterios,
+            'promedioFinal': sum(criterios.values()) / len(criterios),
+            'recontrataria': rng.random() < 0.85,
+            'comentario': None,
+            'fotosEvidencia': [],
+            'fechaEvaluacion': self.date(rng),
+        }
+
+    def documents(self, collection):
+        """(ID, documento) de toda la colección, en orden de índice"""
+        make = getattr(self, collection)
+        for i in range(self.sizes[collection]):
+            doc_id = self.uid(i) if collection == 'users' else self.doc_id(collection, i)
+            yield doc_id, make(i)
+
+
+def clear_emulator(project):
+    """Borra todos los documentos del emulador (API REST del emulador)"""
+    host = os.environ['FIRESTORE_EMULATOR_HOST']
+    url = (f"http://{host}/emulator/v1/projects/{project}"
+           f"/databases/(default)/documents")
+    request = urllib.request.Request(url, method='DELETE')
+    with urllib.request.urlopen(request, timeout=120) as response:
+        response.read()
+
+
+def seed(db, dataset, collections, batch_size=MAX_BATCH_SIZE, workers=COMMIT_WORKERS,
+         rate=MAX_RATE):
+    """Escribe las colecciones de dataset.
+
+    Devuelve ({colección: documentos encolados}, writer) para el resumen.
+    """
+    written = {}
+    throttle = AdaptiveThrottle(rate=rate, max_rate=max(rate, MAX_RATE))
+    with BatchWriter(db, batch_size=batch_size, workers=workers,
+                     throttle=throttle) as writer:
+        for name in collections:
+            started = time.monotonic()
+            ref = db.collection(name)
+            for doc_id, data in dataset.documents(name):
+                writer.set(ref.document(doc_id), data)
+            written[name] = dataset.sizes[name]
+            print(f"   {name}: {written[name]} documentos "
+                  f"({time.monotonic() - started:.1f}s)")
+    for path, error in writer.failures[:10]:
+        print(f"   ❌ {path}: {error}")
+    return written, writer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dataset sintético en el emulador de Firestore")
+    parser.add_argument('--documents', type=int, default=10000,
+                        help="documentos en total, repartidos entre las colecciones")
+    parser.add_argument('--orphan-ratio', type=float, default=0.2,
+                        help="fracción de documentos sin userId (0-1)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--collections', default=','.join(WEIGHTS),
+                        help="colecciones a escribir, separadas por coma")
+    parser.add_argument('--clear', action='store_true',
+                        help="borrar todo el emulador antes de escribir")
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=COMMIT_WORKERS,
+                        help="lotes confirmándose en paralelo")
+    parser.add_argument('--rate', type=float, default=MAX_RATE,
+                        help="escrituras/s iniciales (el emulador no tiene cuota)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not using_emulator():
+        print("❌ seed_dataset.py solo escribe en el emulador: define "
+              "FIRESTORE_EMULATOR_HOST (p. ej. localhost:8080)")
+        sys.exit(2)
+    if not 0 <= args.orphan_ratio <= 1:
+        print("❌ --orphan-ratio debe estar entre 0 y 1")
+        sys.exit(2)
+    names = [n.strip() for n in args.collections.split(',') if n.strip()]
+    unknown = [n for n in names if n not in WEIGHTS]
+    if unknown:
+        print(f"❌ Colecciones desconocidas: {', '.join(unknown)}")
+        print(f"💡 Disponibles: {', '.join(WEIGHTS)}")
+        sys.exit(2)
+
+    db = connect()
+    print(f"🧪 Emulador {os.environ['FIRESTORE_EMULATOR_HOST']}, proyecto {db.project}")
+    if args.clear:
+        try:
+            clear_emulator(db.project)
+        except (OSError, urllib.error.URLError) as e:
+            print(f"❌ No se pudo vaciar el emulador: {e}")
+            sys.exit(1)
+        print("🧹 Emulador vaciado")
+
+    dataset = Dataset(args.documents, orphan_ratio=args.orphan_ratio, seed=args.seed)
+    print(f"🌱 Generando {sum(dataset.sizes[n] for n in names)} documentos "
+          f"({args.orphan_ratio:.0%} huérfanos, semilla {args.seed})...")
+    started = time.monotonic()
+    written, writer = seed(db, dataset, names, batch_size=args.batch_size,
+                           workers=args.workers, rate=args.rate)
+    elapsed = time.monotonic() - started
+    total = sum(written.values())
+    print(f"✅ {writer.writes} documentos escritos en {elapsed:.1f}s "
+          f"({writer.writes / elapsed if elapsed else 0:.0f} docs/s, "
+          f"{writer.batches} lotes, {writer.retries} reintentos)")
+    if writer.failures or writer.writes != total:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Sincroniza el rol de cada usuario (users/{uid}.rol) como custom claim 'rol'
+de Firebase Auth, para que las reglas lean request.auth.token.rol en vez de
+hacer get() del documento del usuario en cada petición.
+
+La colección users se recorre por páginas descargando solo 'rol'. Los
+claims se comparan con los actuales y solo se envían los que cambian, con
+llamadas en paralelo y ritmo adaptativo (el mismo AdaptiveThrottle que las
+escrituras masivas). El claim 'rol' se guarda normalizado (minúsculas, sin
+espacios) y el resto de claims del usuario se conserva.
+
+Modos:
+  - completo (--full, o sin estado previo): compara con los claims reales
+    de Auth, listados de 1000 en 1000, y quita 'rol' a las cuentas cuyo
+    documento ya no existe.
+  - incremental (por defecto si hay estado): compara con lo sincronizado la
+    última vez (archivo --state) y solo consulta en Auth los que cambiaron.
+
+--rules-out escribe una variante de firestore.rules en la que getUserRole()
+usa el claim; las cuentas aún sin claim siguen leyendo su documento, salvo
+con --strict-claims. Un claim nuevo llega al cliente cuando refresca su ID
+token (como mucho en una hora, o al instante con getIdToken(true)).
+
+    python3 scripts/sync_role_claims.py --rules-out firestore.claims.rules
+    python3 scripts/sync_role_claims.py --full
+
+Prueba local: FIRESTORE_EMULATOR_HOST=localhost:8080 y
+FIREBASE_AUTH_EMULATOR_HOST=localhost:9099.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from firestore_batch import (BACKOFF_BASE, BACKOFF_MAX, CREDENTIALS_PATH,
+                             EMULATOR_PROJECT, MAX_RETRIES, PAGE_SIZE,
+                             AdaptiveThrottle, connect, paginate, using_emulator)
+
+STATE_VERSION = 1
+CLAIM = 'rol'
+# Cuentas por llamada de get_users (límite de la API)
+GET_USERS_BATCH = 100
+# Llamadas a Auth por segundo: arranque y techo
+INITIAL_CALL_RATE = 50.0
+MAX_CALL_RATE = 500.0
+CALL_WORKERS = 8
+
+CLAIMS_GET_USER_ROLE = """\
+    // Función auxiliar para obtener el rol del usuario autenticado.
+    // Sale del custom claim 'rol' (scripts/sync_role_claims.py), sin leer
+    // ningún documento; las cuentas aún sin claim leen su documento.
+    function getUserRole() {
+      return !isAuthenticated()
+          ? null
+          : ('rol' in request.auth.token
+              ? request.auth.token.rol
+              : get(/databases/$(database)/documents/users/$(request.auth.uid)).data.rol);
+    }
+"""
+
+STRICT_GET_USER_ROLE = """\
+    // Función auxiliar para obtener el rol del usuario autenticado.
+    // Sale del custom claim 'rol' (scripts/sync_role_claims.py), sin leer
+    // ningún documento; una cuenta sin claim no tiene rol.
+    function getUserRole() {
+      return isAuthenticated() && 'rol' in request.auth.token
+          ? request.auth.token.rol
+          : null;
+    }
+"""
+
+GET_USER_ROLE_RE = re.compile(
+    r"(?:[ \t]*//[^\n]*\n)*[ \t]*function getUserRole\(\) \{.*?\n[ \t]*\}\n", re.S)
+
+
+def claims_rules(rules, strict=False):
+    """Variante de rules con getUserRole() basado en el claim 'rol'"""
+    function = STRICT_GET_USER_ROLE if strict else CLAIMS_GET_USER_ROLE
+    variant, n = GET_USER_ROLE_RE.subn(lambda _m: function, rules, count=1)
+    if n == 0:
+        raise ValueError("No se encontró function getUserRole() en las reglas")
+    return variant
+
+
+def normalize_role(role):
+    """Como isAdmin() en las reglas: minúsculas y sin espacios"""
+    if not isinstance(role, str) or not role.strip():
+        return None
+    return role.strip().lower()
+
+
+def auth_module(credentials_path):
+    """firebase_admin.auth con la app inicializada (o el emulador de Auth)"""
+    import firebase_admin
+    from firebase_admin import auth, credentials
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        if os.environ.get("FIREBASE_AUTH_EMULATOR_HOST"):
+            project = (os.environ.get("GCLOUD_PROJECT")
+                       or os.environ.get("GOOGLE_CLOUD_PROJECT")
+                       or EMULATOR_PROJECT)
+            firebase_admin.initialize_app(options={'projectId': project})
+        else:
+            firebase_admin.initialize_app(credentials.Certificate(credentials_path))
+    return auth
+
+
+def load_state(path, key):
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('version') != STATE_VERSION or state.get('key') != key:
+        return None
+    return state.get('claims', {})
+
+
+def save_state(path, key, claims):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': STATE_VERSION, 'key': key, 'claims': claims}, f)
+    os.replace(tmp, path)
+
+
+def read_roles(db, page_size=PAGE_SIZE):
+    """{uid: rol normalizado} de toda la colección users"""
+    roles = {}
+    for page in paginate(db.collection('users').select([CLAIM]), page_size=page_size):
+        for doc in page:
+            roles[doc.id] = normalize_role((doc.to_dict() or {}).get(CLAIM))
+    return roles
+
+
+def current_claims(auth, uids=None):
+    """{uid: custom_claims} de Auth: todas las cuentas, o solo uids"""
+    claims = {}
+    if uids is None:
+        page = auth.list_users()
+        while page:
+            for user in page.users:
+                claims[user.uid] = user.custom_claims or {}
+            page = page.get_next_page()
+        return claims
+    uids = list(uids)
+    for start in range(0, len(uids), GET_USERS_BATCH):
+        result = auth.get_users([auth.UidIdentifier(uid)
+                                 for uid in uids[start:start + GET_USERS_BATCH]])
+        for user in result.users:
+            claims[user.uid] = user.custom_claims or {}
+    return claims
+
+
+def pending_changes(roles, claims):
+    """[(uid, claims nuevos)] de las cuentas cuyo claim 'rol' no coincide"""
+    changes = []
+    for uid, existing in claims.items():
+        role = roles.get(uid)
+        if existing.get(CLAIM) == role:
+            continue
+        updated = {k: v for k, v in existing.items() if k != CLAIM}
+        if role is not None:
+            updated[CLAIM] = role
+        changes.append((uid, updated))
+    return changes
+
+
+class ClaimsWriter:
+    """set_custom_user_claims en paralelo, con ritmo adaptativo y reintentos"""
+
+    def __init__(self, auth, workers=CALL_WORKERS, throttle=None,
+                 max_retries=MAX_RETRIES):
+        from firebase_admin import exceptions as fexc
+        self.auth = auth
+        self.throttle = throttle if throttle is not None else AdaptiveThrottle(
+            rate=INITIAL_CALL_RATE, min_rate=1.0, max_rate=MAX_CALL_RATE,
+            increase=5.0)
+        self.max_retries = max_retries
+        self.workers = workers
+        self.updated = 0
+        self.retries = 0
+        self.failures = []
+        self._lock = threading.Lock()
+        self._retryable = (fexc.ResourceExhaustedError, fexc.UnavailableError,
+                           fexc.DeadlineExceededError, fexc.InternalError)
+        self._throttling = (fexc.ResourceExhaustedError,)
+
+    def _set(self, uid, claims):
+        attempt = 0
+        while True:
+            self.throttle.acquire(1)
+            try:
+                # None borra todos los claims; {} no se admite igual en todas
+                # las versiones del SDK
+                self.auth.set_custom_user_claims(uid, claims or None)
+            except self._retryable as e:
+                if isinstance(e, self._throttling):
+                    self.throttle.backoff()
+                attempt += 1
+                if attempt > self.max_retries:
+                    with self._lock:
+                        self.failures.append((uid, e))
+                    return False
+                with self._lock:
+                    self.retries += 1
+                time.sleep(random.uniform(0, min(BACKOFF_MAX,
+                                                 BACKOFF_BASE * 2 ** attempt)))
+                continue
+            except Exception as e:
+                with self._lock:
+                    self.failures.append((uid, e))
+                return False
+            self.throttle.success()
+            with self._lock:
+                self.updated += 1
+            return True
+
+    def apply(self, changes):
+        """Envía changes y devuelve los uid confirmados"""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            done = list(pool.map(lambda change: self._set(*change), changes))
+        return {uid for (uid, _claims), ok in zip(changes, done) if ok}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza users.rol como custom claim")
+    parser.add_argument('--credentials', default=CREDENTIALS_PATH,
+                        help="JSON de la cuenta de servicio (ignorado con el emulador)")
+    parser.add_argument('--full', action='store_true',
+                        help="comparar con los claims reales de Auth, no con el estado")
+    parser.add_argument('--state', default='sync_role_claims.state.json',
+                        help="roles sincronizados en la última ejecución")
+    parser.add_argument('--workers', type=int, default=CALL_WORKERS,
+                        help="llamadas a Auth en paralelo")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help="usuarios por página de lectura")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="mostrar los cambios sin tocar Auth")
+    parser.add_argument('--rules', default='firestore.rules',
+                        help="reglas de partida para --rules-out")
+    parser.add_argument('--rules-out',
+                        help="escribir la variante de las reglas basada en el claim y salir")
+    parser.add_argument('--strict-claims', action='store_true',
+                        help="en la variante, sin claim no hay rol (ningún get())")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.rules_out:
+        with open(args.rules) as f:
+            variant = claims_rules(f.read(), strict=args.strict_claims)
+        with open(args.rules_out, 'w') as f:
+            f.write(variant)
+        print(f"💾 Reglas basadas en request.auth.token.rol en {args.rules_out}")
+        print("   Despliega solo después de sincronizar los claims.")
+        return
+
+    print("🔐 Sincronizando roles como custom claims...")
+    print()
+    try:
+        db = connect(args.credentials)
+        auth = auth_module(args.credentials)
+        if using_emulator():
+            print("🧪 Usando el emulador de Firestore")
+    except Exception as e:
+        print(f"❌ Error al inicializar Firebase: {e}")
+        sys.exit(1)
+
+    started = time.monotonic()
+    roles = read_roles(db, args.page_size)
+    print(f"👥 {len(roles)} usuarios leídos ({time.monotonic() - started:.1f}s)")
+
+    key = db.project
+    synced = None if args.full else load_state(args.state, key)
+    if synced is None:
+        print("🔎 Comparando con los claims actuales de Auth (modo completo)")
+        claims = current_claims(auth)
+    else:
+        changed = [uid for uid, role in roles.items() if synced.get(uid) != role]
+        changed += [uid for uid in synced if uid not in roles]
+        print(f"🔎 {len(changed)} usuarios cambiaron desde la última sincronización")
+        claims = current_claims(auth, changed)
+    missing = [uid for uid in (roles if synced is None else changed)
+               if uid in roles and uid not in claims]
+    changes = pending_changes(roles, claims)
+    print(f"✏️  {len(changes)} claims por actualizar")
+    if missing:
+        print(f"⚠️  {len(missing)} documentos de users sin cuenta en Auth")
+
+    if args.dry_run:
+        for uid, updated in changes[:20]:
+            print(f"   {uid}: {claims[uid].get(CLAIM)!r} → {updated.get(CLAIM)!r}")
+        return
+
+    writer = ClaimsWriter(auth, workers=args.workers)
+    writer.apply(changes)
+    elapsed = time.monotonic() - started
+    print(f"✅ {writer.updated} claims actualizados en {elapsed:.1f}s, "
+          f"{writer.retries} reintentos, {writer.throttle.throttled} frenadas por cuota")
+    failed = {uid for uid, _error in writer.failures}
+    for uid, error in writer.failures[:10]:
+        print(f"   ❌ {uid}: {error}")
+
+    # Lo que falló o aún no tiene cuenta no se da por sincronizado: se
+    # vuelve a mirar la próxima vez
+    failed.update(missing)
+    state = {uid: role for uid, role in roles.items() if uid not in failed}
+    if synced is not None:
+        state.update({uid: synced[uid] for uid in failed if uid in synced})
+    save_state(args.state, key, state)
+
+
+if __name__ == "__main__":
+    main()
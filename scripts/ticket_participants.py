@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Índice desnormalizado de participantes de tickets: participantIds es la
+lista (ordenada y sin repetidos) de los UID de los campos que hoy consulta
+TicketService por separado:
+
+    userId, clienteId, cliente.id, tecnicoId, toderoId, maestroId,
+    maestroAsignado.id
+
+Con el campo completo en todos los tickets, la lista de un usuario es una
+sola consulta array-contains en vez de tres consultas mezcladas en el
+dispositivo.
+
+Comandos:
+  - backfill (por defecto): recorre tickets por páginas descargando solo
+    esos campos y escribe participantIds donde falta o no coincide, en
+    lotes con la precondición del update_time leído (un ticket modificado
+    mientras tanto no se pisa; se corrige en la siguiente ejecución). El
+    recorrido se retoma desde el checkpoint tras un corte.
+  - verify: solo lectura; informa de los tickets cuyo participantIds se
+    ha desviado de los campos de origen (tickets anteriores al campo o
+    escritos por versiones antiguas de la app) y sale con código 1 si hay
+    alguno. Admite un snapshot local (firestore_snapshot.py).
+
+La app recalcula participantIds completo al asignar un maestro, y
+firestore.rules rechaza los updates que lo dejan distinto de estos campos.
+
+    python3 scripts/ticket_participants.py verify --snapshot snapshots/latest
+    python3 scripts/ticket_participants.py backfill
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from firestore_batch import (COMMIT_WORKERS, CREDENTIALS_PATH, MAX_BATCH_SIZE,
+                             PAGE_SIZE, BatchWriter, Checkpoint, CommitTracker,
+                             connect, paginate, using_emulator)
+from firestore_snapshot import ID, Snapshot, _get_path, to_record
+
+FIELD = 'participantIds'
+COLLECTION = 'tickets'
+# Campos con el UID de un participante (las consultas de getAllTickets e
+# isTicketTechnician de firestore.rules)
+PARTICIPANT_FIELDS = ['userId', 'clienteId', 'cliente.id', 'tecnicoId', 'toderoId',
+                      'maestroId', 'maestroAsignado.id']
+PROGRESS_EVERY = 5000
+
+
+def participant_ids(record):
+    """UIDs de los participantes de un ticket, ordenados y sin repetidos"""
+    ids = set()
+    for field in PARTICIPANT_FIELDS:
+        value = _get_path(record, field)
+        if isinstance(value, str) and value:
+            ids.add(value)
+    return sorted(ids)
+
+
+def drift(record):
+    """None si participantIds está al día; si no, 'sin campo' o 'desviado'.
+
+    El orden no cuenta: array-contains no depende de él y arrayUnion
+    añade al final.
+    """
+    current = record.get(FIELD)
+    if not isinstance(current, list):
+        return 'sin campo'
+    if set(current) != set(participant_ids(record)):
+        return 'desviado'
+    return None
+
+
+def verify_records(records, examples=5):
+    """Tickets desviados de records.
+
+    Devuelve {'total', 'drifted': {motivo: n}, 'ids', 'examples'}, con
+    examples como (id, motivo, participantIds actual, esperado).
+    """
+    result = {'total': 0, 'drifted': {}, 'examples': [], 'ids': []}
+    for record in records:
+        result['total'] += 1
+        reason = drift(record)
+        if reason is None:
+            continue
+        result['drifted'][reason] = result['drifted'].get(reason, 0) + 1
+        result['ids'].append(record[ID])
+        if len(result['examples']) < examples:
+            result['examples'].append((record[ID], reason, record.get(FIELD),
+                                       participant_ids(record)))
+    return result
+
+
+def stream_records(db, page_size):
+    """Registros de tickets como los de un snapshot, proyectados a lo necesario"""
+    query = db.collection(COLLECTION).select(PARTICIPANT_FIELDS + [FIELD])
+    for page in paginate(query, page_size=page_size):
+        for doc in page:
+            yield to_record(doc)
+
+
+def backfill(db, writer, tracker, page_size):
+    """Encola participantIds de los tickets desviados desde el cursor del
+    checkpoint y devuelve (encolados, ya al día)."""
+    checkpoint = tracker.checkpoint
+    collection = db.collection(COLLECTION)
+    cursor = checkpoint.cursor(COLLECTION)
+    queued = 0
+    current = 0
+    query = collection.select(PARTICIPANT_FIELDS + [FIELD])
+    for page in paginate(query, page_size=page_size,
+                         start_after=collection.document(cursor) if cursor else None):
+        todo = [doc for doc in page if drift(doc.to_dict() or {}) is not None]
+        current += len(page) - len(todo)
+        # La página se registra antes de encolar para no perder ningún commit
+        tracker.page(COLLECTION, page[-1].id, [doc.reference.path for doc in todo])
+        for doc in todo:
+            writer.update(doc.reference,
+                          {FIELD: participant_ids(doc.to_dict() or {})},
+                          option=db.write_option(last_update_time=doc.update_time))
+        queued += len(todo)
+    tracker.finish(COLLECTION)
+    return queued, current
+
+
+def print_verify(result):
+    drifted = sum(result['drifted'].values())
+    if not drifted:
+        print(f"✅ {result['total']} tickets - participantIds al día")
+        return
+    print(f"⚠️  {result['total']} tickets - {drifted} con participantIds desviado")
+    for reason, n in sorted(result['drifted'].items()):
+        print(f"   • {reason}: {n}")
+    for doc_id, reason, current, expected in result['examples']:
+        print(f"   {doc_id} ({reason}): {current} → {expected}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mantiene tickets.participantIds")
+    parser.add_argument('command', nargs='?', default='backfill',
+                        choices=['backfill', 'verify'])
+    parser.add_argument('--credentials', default=CREDENTIALS_PATH,
+                        help="JSON de la cuenta de servicio (ignorado con el emulador)")
+    parser.add_argument('--snapshot', help="verify sobre un snapshot local")
+    parser.add_argument('--examples', type=int, default=5,
+                        help="tickets desviados de ejemplo en verify")
+    parser.add_argument('--ids-file', help="verify: escribir aquí los IDs desviados")
+    parser.add_argument('--checkpoint', default='ticket_participants.checkpoint.json',
+                        help="archivo para retomar el backfill")
+    parser.add_argument('--restart', action='store_true',
+                        help="ignorar el checkpoint y recorrer desde el principio")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=COMMIT_WORKERS)
+    return parser.parse_args(argv)
+
+
+def verify_command(args):
+    started = time.monotonic()
+    if args.snapshot:
+        records = Snapshot(args.snapshot).table(COLLECTION).records
+    else:
+        records = stream_records(connect(args.credentials), args.page_size)
+    result = verify_records(records, examples=args.examples)
+    print_verify(result)
+    if args.ids_file:
+        with open(args.ids_file, 'w') as f:
+            f.writelines(f"{COLLECTION}/{doc_id}\n" for doc_id in result['ids'])
+        print(f"💾 IDs desviados guardados en {args.ids_file}")
+    print(f"⏱️  {time.monotonic() - started:.1f}s")
+    return 1 if result['ids'] else 0
+
+
+def backfill_command(args):
+    try:
+        db = connect(args.credentials)
+        if using_emulator():
+            print("🧪 Usando el emulador de Firestore")
+    except Exception as e:
+        print(f"❌ Error al inicializar Firebase: {e}")
+        return 1
+
+    checkpoint = Checkpoint(args.checkpoint, key=f"{db.project}:{FIELD}")
+    if args.restart:
+        checkpoint.clear()
+    elif checkpoint.data:
+        print(f"♻️  Retomando desde el checkpoint {args.checkpoint}")
+    tracker = CommitTracker(checkpoint)
+    progress_lock = threading.Lock()
+    progress = {'last': 0}
+
+    def on_commit(ops):
+        tracker.committed(ops)
+        with progress_lock:
+            if writer.writes - progress['last'] >= PROGRESS_EVERY:
+                progress['last'] = writer.writes
+                print(f"   Progreso: {writer.writes} tickets actualizados "
+                      f"({writer.throttle.rate:.0f} escrituras/s)...")
+
+    writer = BatchWriter(db, batch_size=args.batch_size, workers=args.workers,
+                         on_commit=on_commit)
+    started = time.monotonic()
+    with writer:
+        queued, current = backfill(db, writer, tracker, args.page_size)
+    print(f"✅ {queued - len(writer.failures)} tickets actualizados, {current} ya al día "
+          f"({time.monotonic() - started:.1f}s, {writer.batches} lotes, "
+          f"{writer.retries} reintentos)")
+    for path, error in writer.failures[:10]:
+        print(f"   ❌ {path}: {error}")
+    if writer.failures:
+        print("♻️  Vuelve a ejecutar para reintentar lo pendiente "
+              "(los modificados durante el recorrido se releen)")
+        return 1
+    # Recorrido completo: la próxima ejecución vuelve a empezar
+    checkpoint.clear()
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'verify':
+        sys.exit(verify_command(args))
+    print("🔗 Calculando participantIds de tickets...")
+    print()
+    sys.exit(backfill_command(args))
+
+
+if __name__ == "__main__":
+    main()
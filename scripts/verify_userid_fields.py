@@ -1,106 +1,221 @@
 #!/usr/bin/env python3
 """
 Script para verificar qué colecciones de Firestore necesitan migración del campo userId
+
+Los totales salen de agregaciones COUNT en el servidor (una lectura por cada
+1000 documentos, sin descargarlos): total y documentos con userId no vacío.
+Solo cuando hacen falta los IDs de los documentos sin userId se recorre la
+colección por páginas proyectando únicamente ese campo, y el recorrido se
+detiene en cuanto se encontraron todos.
+
+Con --incremental se guarda un estado local por colección (IDs sin userId y
+una marca de agua de tiempo) y la siguiente ejecución solo lee los documentos
+modificados desde esa marca. Firestore no permite filtrar por el update_time
+del documento, así que la marca se compara con el campo de fecha que la app
+mantiene en cada colección (CHANGE_FIELDS). Los conteos COUNT de cada
+ejecución validan el estado: si no cuadran (p. ej. un cambio que no tocó la
+fecha, o un borrado) esa colección se vuelve a recorrer entera. --full fuerza
+el recorrido completo.
+
+Prueba local contra el emulador:
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python3 scripts/verify_userid_fields.py
 """
 
-import sys
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    print("✅ firebase-admin importado correctamente")
-except ImportError as e:
-    print(f"❌ Error al importar firebase-admin: {e}")
-    print("📦 Instalando firebase-admin...")
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "firebase-admin==7.1.0"])
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    print("✅ firebase-admin instalado e importado")
-
-def main():
-    print("🔍 Verificando campos userId en Firestore...")
-    print()
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import firestore_metrics
+from firestore_batch import (CHANGE_FIELDS, CREDENTIALS_PATH, PAGE_SIZE, WATERMARK_MARGIN,
+                             changed_since, connect, count, paginate, using_emulator)
+from firestore_snapshot import Snapshot, top_level
+
+# Colecciones que deben tener userId
+COLLECTIONS = [
+    'properties',
+    'rooms',
+    'tickets',
+    'property_listings',
+    'inventory_acts',
+    'virtual_tours',
+]
+
+STATE_VERSION = 1
+
+
+def missing_userid(collection, limit=None, expected=None):
+    """IDs de documentos sin userId, proyectando solo ese campo.
+
+    Se detiene al llegar a limit IDs o al encontrar los expected que
+    indicó el conteo.
+    """
+    found = []
+    limits = [n for n in (limit, expected) if n is not None]
+    wanted = min(limits) if limits else None
+    if wanted == 0:
+        return found
+    for page in paginate(collection.select(['userId']), page_size=PAGE_SIZE):
+        for doc in page:
+            if not (doc.to_dict() or {}).get('userId'):
+                found.append(doc.id)
+                if wanted is not None and len(found) >= wanted:
+                    return found
+    return found
+
+
+def verify_collection(db, collection_name, examples=5, all_ids=False):
+    """Conteos exactos de una colección (y los IDs sin userId que se pidan)"""
+    collection = db.collection(collection_name)
+    total = count(collection)
+    # Solo los strings no vacíos son > ''; docs sin el campo o con null no cuentan
+    with_userid = count(collection.where('userId', '>', ''))
+    without_userid = total - with_userid
+    missing_docs = []
+    if without_userid and (examples or all_ids):
+        missing_docs = missing_userid(collection,
+                                      limit=None if all_ids else examples,
+                                      expected=without_userid)
+    return {
+        'total': total,
+        'with_userid': with_userid,
+        'without_userid': without_userid,
+        'missing_docs': missing_docs,
+    }
+
+
+def verify_incremental(db, collection_name, entry, started, full=False):
+    """Como verify_collection, pero partiendo del estado de la ejecución anterior.
+
+    Devuelve (resultado, nuevo estado de la colección).
+    """
+    collection = db.collection(collection_name)
+    total = count(collection)
+    with_userid = count(collection.where('userId', '>', ''))
+    without_userid = total - with_userid
+    changed = 0
     
-    # Inicializar Firebase Admin SDK
+    if entry is None or full:
+        mode = 'completo'
+        missing = set(missing_userid(collection, expected=without_userid))
+    else:
+        mode = 'incremental'
+        missing = set(entry['missing'])
+        watermark = datetime.fromisoformat(entry['watermark'])
+        docs = changed_since(collection, CHANGE_FIELDS[collection_name], watermark,
+                             ['userId'])
+        changed = len(docs)
+        for doc in docs:
+            if (doc.to_dict() or {}).get('userId'):
+                missing.discard(doc.id)
+            else:
+                missing.add(doc.id)
+        if len(missing) != without_userid:
+            # Cambios sin fecha o borrados: el estado ya no es fiable
+            mode = 'completo (estado desactualizado)'
+            missing = set(missing_userid(collection, expected=without_userid))
+
+    missing_docs = sorted(missing)
+    result = {
+        'total': total,
+        'with_userid': with_userid,
+        'without_userid': without_userid,
+        'missing_docs': missing_docs,
+        'mode': mode,
+        'changed': changed,
+    }
+    new_entry = {
+        'watermark': (started - WATERMARK_MARGIN).isoformat(),
+        'total': total,
+        'with_userid': with_userid,
+        'missing': missing_docs,
+    }
+    return result, new_entry
+
+
+def verify_snapshot(snap, collection_name, examples=5, all_ids=False):
+    """verify_collection sobre un snapshot local (firestore_snapshot.py)"""
+    table = snap.table(collection_name)
+    if collection_name == 'rooms':
+        # El snapshot trae el collection group; aquí solo cuenta el primer nivel
+        table = top_level(table)
+    missing = table.filter(~table['userId'].truthy()).ids()
+    return {
+        'total': len(table),
+        'with_userid': len(table) - len(missing),
+        'without_userid': len(missing),
+        'missing_docs': missing if all_ids else missing[:examples],
+    }
+
+
+def load_state(path, key):
     try:
-        cred = credentials.Certificate("/opt/flutter/firebase-admin-sdk.json")
-        firebase_admin.initialize_app(cred)
-        print("✅ Firebase Admin SDK inicializado")
-    except Exception as e:
-        print(f"❌ Error al inicializar Firebase: {e}")
-        print()
-        print("💡 ALTERNATIVA: Verificar manualmente en Firebase Console")
-        print()
-        print("   1. Ve a: https://console.firebase.google.com/")
-        print("   2. Selecciona tu proyecto")
-        print("   3. Ve a Firestore Database")
-        print("   4. Revisa cada colección y verifica si tienen campo 'userId'")
-        print()
-        print("   Colecciones a verificar:")
-        print("   • properties")
-        print("   • rooms")
-        print("   • tickets")
-        print("   • property_listings")
-        print("   • inventory_acts")
-        print("   • virtual_tours")
-        print()
-        return
-    
-    db = firestore.client()
-    
-    # Colecciones que deben tener userId
-    collections_to_check = [
-        'properties',
-        'rooms',
-        'tickets',
-        'property_listings',
-        'inventory_acts',
-        'virtual_tours',
-    ]
-    
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get('version') != STATE_VERSION or state.get('key') != key:
+        return {}
+    return state.get('collections', {})
+
+
+def save_state(path, key, collections):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': STATE_VERSION, 'key': key,
+                   'collections': collections}, f, indent=2)
+    os.replace(tmp, path)
+
+
+def report(jobs, state=None):
+    """Imprime el resultado de cada colección; jobs[nombre]() lo calcula.
+
+    Con state (modo incremental) cada job devuelve (resultado, estado) y
+    el estado nuevo se guarda en state.
+    """
     results = {}
-    
-    for collection_name in collections_to_check:
+    firestore_metrics.expect(len(COLLECTIONS), 'colecciones')
+    for collection_name in COLLECTIONS:
         print(f"📂 Verificando colección: {collection_name}")
         
         try:
-            # Obtener todos los documentos
-            docs = db.collection(collection_name).limit(100).stream()
-            
-            total_docs = 0
-            docs_with_userid = 0
-            docs_without_userid = []
-            
-            for doc in docs:
-                total_docs += 1
-                data = doc.to_dict()
-                
-                if 'userId' in data and data['userId']:
-                    docs_with_userid += 1
-                else:
-                    docs_without_userid.append(doc.id)
-            
-            results[collection_name] = {
-                'total': total_docs,
-                'with_userid': docs_with_userid,
-                'without_userid': len(docs_without_userid),
-                'missing_docs': docs_without_userid[:5]  # Solo mostrar primeros 5
-            }
+            data = jobs[collection_name]()
+            if state is not None:
+                data, state[collection_name] = data
+                print(f"   🔄 Recorrido {data['mode']}"
+                      + (f", {data['changed']} documentos modificados"
+                         if data['mode'] == 'incremental' else ''))
+            results[collection_name] = data
+            total_docs = data['total']
             
             if total_docs == 0:
                 print(f"   ⚠️  Colección vacía (0 documentos)")
-            elif docs_with_userid == total_docs:
+            elif data['with_userid'] == total_docs:
                 print(f"   ✅ {total_docs} documentos - TODOS tienen userId")
             else:
-                print(f"   ⚠️  {total_docs} documentos - {len(docs_without_userid)} SIN userId")
-                if docs_without_userid:
-                    print(f"      Ejemplos: {', '.join(docs_without_userid[:3])}")
+                print(f"   ⚠️  {total_docs} documentos - {data['without_userid']} SIN userId")
+                if data['missing_docs']:
+                    print(f"      Ejemplos: {', '.join(data['missing_docs'][:3])}")
             
         except Exception as e:
             print(f"   ❌ Error: {e}")
             results[collection_name] = {'error': str(e)}
+        firestore_metrics.advance()
         
         print()
+
+    return results
+
+
+def summarize(results, args):
+    if args.ids_file:
+        with open(args.ids_file, 'w') as f:
+            for collection_name, data in results.items():
+                for doc_id in data.get('missing_docs', []):
+                    f.write(f"{collection_name}/{doc_id}\n")
+        print(f"💾 IDs sin userId guardados en {args.ids_file}")
+        print()
     
     # Resumen
     print("=" * 60)
@@ -149,5 +264,96 @@ def main():
     
     print()
 
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica el campo userId en Firestore")
+    parser.add_argument('--credentials', default=CREDENTIALS_PATH,
+                        help="JSON de la cuenta de servicio (ignorado con el emulador)")
+    parser.add_argument('--examples', type=int, default=5,
+                        help="IDs de ejemplo sin userId por colección (0: solo conteos)")
+    parser.add_argument('--snapshot',
+                        help="verificar sobre un snapshot local en vez de Firestore")
+    parser.add_argument('--incremental', action='store_true',
+                        help="leer solo lo modificado desde la ejecución anterior")
+    parser.add_argument('--full', action='store_true',
+                        help="con --incremental: recorrer todo y rehacer el estado")
+    parser.add_argument('--state', default='verify_userid_fields.state.json',
+                        help="archivo de estado del modo incremental")
+    parser.add_argument('--ids-file',
+                        help="escribir aquí todos los IDs sin userId (colección/ID)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("🔍 Verificando campos userId en Firestore...")
+    print()
+
+    if args.snapshot:
+        snap = Snapshot(args.snapshot)
+        print(f"💽 Usando el snapshot {args.snapshot} "
+              f"(proyecto {snap.manifest['project']})")
+        print()
+        results = report({name: (lambda name=name: verify_snapshot(
+            snap, name, args.examples, bool(args.ids_file))) for name in COLLECTIONS})
+        summarize(results, args)
+        return
+
+    # Inicializar Firebase Admin SDK (o el emulador con FIRESTORE_EMULATOR_HOST)
+    try:
+        db = connect(args.credentials)
+        if using_emulator():
+            print("🧪 Usando el emulador de Firestore")
+        print("✅ Firebase Admin SDK inicializado")
+    except Exception as e:
+        print(f"❌ Error al inicializar Firebase: {e}")
+        print()
+        print("💡 ALTERNATIVA: Verificar manualmente en Firebase Console")
+        print()
+        print("   1. Ve a: https://console.firebase.google.com/")
+        print("   2. Selecciona tu proyecto")
+        print("   3. Ve a Firestore Database")
+        print("   4. Revisa cada colección y verifica si tienen campo 'userId'")
+        print()
+        print("   Colecciones a verificar:")
+        print("   • properties")
+        print("   • rooms")
+        print("   • tickets")
+        print("   • property_listings")
+        print("   • inventory_acts")
+        print("   • virtual_tours")
+        print()
+        return
+
+    state = {}
+    if args.incremental:
+        state = load_state(args.state, db.project)
+        if state and not args.full:
+            print(f"♻️  Estado anterior: {args.state}")
+            print()
+    started = datetime.now(timezone.utc)
+
+    # Las agregaciones de cada colección son independientes: en paralelo
+    with ThreadPoolExecutor(max_workers=len(COLLECTIONS)) as pool:
+        if args.incremental:
+            futures = {
+                name: pool.submit(verify_incremental, db, name, state.get(name),
+                                  started, args.full)
+                for name in COLLECTIONS
+            }
+        else:
+            futures = {
+                name: pool.submit(verify_collection, db, name, args.examples,
+                                  bool(args.ids_file))
+                for name in COLLECTIONS
+            }
+
+    results = report({name: futures[name].result for name in COLLECTIONS},
+                     state if args.incremental else None)
+
+    if args.incremental:
+        save_state(args.state, db.project, state)
+
+    summarize(results, args)
+
 if __name__ == "__main__":
     main()
@@ -2,70 +2,1748 @@
 """
 Simple HTTP server for Flutter web app
 Serves the build/web directory with CORS headers
+
+Connections are handled concurrently by a bounded worker pool with
+HTTP/1.1 keep-alive, so one slow client no longer blocks everybody else.
+Text assets are precompressed once into .gz/.br sidecars and the best
+variant is picked per request from Accept-Encoding. Files carry strong
+content-hash ETags and a per-path Cache-Control policy, so repeat visits
+revalidate with a 304 instead of downloading the bundle again. Small hot
+files are kept in an LRU memory cache together with their headers; the
+rest is sent with sendfile(), including single and multi Range requests.
+With --processes the launcher preforks one server per core and
+supervises them.
+
+The served directory is indexed once at startup into an immutable route
+table (URL path -> file, size, MIME type, content hash, encoded variants)
+so dispatch is a dict lookup; unknown app routes resolve to index.html.
+With --watch, new builds are published as immutable snapshots and swapped
+in without a restart.
+
+GET /metrics reports request counts, latency histograms, bytes sent and
+cache statistics in the Prometheus text format. The access log is written
+by a background thread so requests never wait on stderr.
 """
 
+import argparse
+import bisect
+import email.utils
+import gzip
+import hashlib
 import http.server
-import socketserver
+import io
+import json
+import mimetypes
 import os
+import posixpath
+import re
+import selectors
+import shutil
+import signal
+import socket
 import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only gzip sidecars are generated
+    brotli = None
 
 PORT = 5060
 DIRECTORY = "build/web"
 
+# Concurrency defaults (overridable from the command line)
+WORKERS = 32
+MAX_CONNECTIONS = 256
+KEEPALIVE_TIMEOUT = 15
+
+# In-memory hot-file cache defaults
+HOT_CACHE_BYTES = 16 * 1024 * 1024
+HOT_CACHE_MAX_FILE = 512 * 1024
+HOT_CACHE_CHECK_INTERVAL = 1.0
+
+# Prefork supervisor
+HEARTBEAT_INTERVAL = 2.0
+# Workers silent for this long are considered hung and killed
+HEARTBEAT_TIMEOUT = 15.0
+SHUTDOWN_GRACE = 10.0
+RESTART_BACKOFF_MAX = 30.0
+
+# Instrumentation
+METRICS_PATH = '/metrics'
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0)
+# Route label of requests that did not resolve to a file
+OTHER_ROUTE = 'other'
+ACCESS_LOG_FLUSH_INTERVAL = 0.5
+
+# Precompression: only text-like formats are worth it. PNG, JPEG, MP4,
+# WOFF2 and friends are already compressed and are served as-is.
+COMPRESSIBLE_EXTENSIONS = {
+    '.html', '.js', '.mjs', '.css', '.json', '.wasm', '.svg', '.txt',
+    '.map', '.xml', '.ttf', '.otf', '.frag', '.webmanifest',
+}
+MIN_COMPRESS_SIZE = 1024
+# Sidecar suffix for each Content-Encoding, in server preference order
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def is_compressible(path):
+    """True if the file type benefits from precompression"""
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def _compress_file(path):
+    """Write missing or stale sidecars for one file, return bytes saved"""
+    st = os.stat(path)
+    if st.st_size < MIN_COMPRESS_SIZE:
+        return 0
+    data = None
+    saved = 0
+    for encoding, suffix in ENCODING_SUFFIXES:
+        if encoding == 'br' and brotli is None:
+            continue
+        sidecar = path + suffix
+        try:
+            if os.stat(sidecar).st_mtime >= st.st_mtime:
+                continue
+        except FileNotFoundError:
+            pass
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        if encoding == 'br':
+            packed = brotli.compress(data, quality=11)
+        else:
+            packed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(packed) >= len(data):
+            continue
+        # Write to a temp name first so readers never see a partial sidecar
+        tmp = sidecar + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(packed)
+        os.replace(tmp, sidecar)
+        saved += len(data) - len(packed)
+    return saved
+
+
+def precompress_directory(root, workers=None):
+    """Create .gz/.br sidecars for every compressible file under root.
+
+    Up-to-date sidecars are left alone, so running this on every startup
+    only costs a stat per file once the build has been processed.
+    """
+    paths = []
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            if is_compressible(name):
+                paths.append(os.path.join(dirpath, name))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        saved = sum(pool.map(_compress_file, paths))
+    return len(paths), saved
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for item in (header or '').split(','):
+        parts = item.strip().split(';')
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(header, available):
+    """Pick the best content coding the client accepts among available"""
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding, _suffix in ENCODING_SUFFIXES:
+        if encoding not in available:
+            continue
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+# Caching policy: ordered (pattern, Cache-Control) rules matched against the
+# URL path relative to the web root, first match wins. Entry points must
+# always revalidate so a new deploy is picked up on the next load; content
+# fingerprinted in its file name never changes and can be cached forever.
+REVALIDATE = 'no-cache'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+STATIC = 'public, max-age=86400, stale-while-revalidate=604800'
+CACHE_RULES = [
+    (re.compile(r'^(index\.html|flutter_service_worker\.js|version\.json)$'),
+     REVALIDATE),
+    (re.compile(r'[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$'), IMMUTABLE),
+    (re.compile(r'^(assets|icons|canvaskit)/|^favicon\.png$'), STATIC),
+]
+DEFAULT_CACHE_CONTROL = REVALIDATE
+# Used for errors, listings and preflight responses
+NO_STORE = 'no-cache, no-store, must-revalidate'
+
+
+def content_hash(path):
+    """Hex BLAKE2b digest of a file's content"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def guess_type(path):
+    """MIME type of a path, same lookup as SimpleHTTPRequestHandler"""
+    extensions_map = http.server.SimpleHTTPRequestHandler.extensions_map
+    _base, ext = posixpath.splitext(path)
+    if ext in extensions_map:
+        return extensions_map[ext]
+    ext = ext.lower()
+    if ext in extensions_map:
+        return extensions_map[ext]
+    guess, _encoding = mimetypes.guess_type(path)
+    return guess or 'application/octet-stream'
+
+
+class CachePolicy:
+    """Cache-Control rules plus a content-hash ETag table.
+
+    Hashes are computed on first use and memoised per (mtime, size), so a
+    rebuilt file gets a new ETag while unchanged files are hashed once.
+    """
+
+    def __init__(self, rules=CACHE_RULES, default=DEFAULT_CACHE_CONTROL):
+        self.rules = rules
+        self.default = default
+        self._etags = {}
+        self._lock = threading.Lock()
+
+    def cache_control(self, rel_path):
+        """Cache-Control value for a path relative to the web root"""
+        for pattern, value in self.rules:
+            if pattern.search(rel_path):
+                return value
+        return self.default
+
+    def etag(self, path, st):
+        """Strong ETag (quoted) for the identity representation of path"""
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._etags.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        etag = f'"{content_hash(path)}"'
+        with self._lock:
+            self._etags[path] = (key, etag)
+        return etag
+
+
+def etag_for_encoding(etag, encoding):
+    """Each content coding is a different representation with its own ETag"""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def etag_matches(header, etag):
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if header.strip() == '*':
+        return True
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified_since(header, mtime):
+    """True if an If-Modified-Since header is not older than mtime"""
+    try:
+        since = email.utils.parsedate_to_datetime(header)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return False
+    if since is None:
+        return False
+    return int(mtime) <= since.timestamp()
+
+
+class Variant:
+    """One stored encoding of a file with its precomputed headers"""
+
+    __slots__ = ('encoding', 'path', 'size', 'etag', 'body',
+                 'headers', 'validator_headers')
+
+    def __init__(self, encoding, path, size, etag, body=None):
+        self.encoding = encoding
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.body = body
+        self.headers = []
+        self.validator_headers = []
+
+
+class Resource:
+    """A servable file: metadata, Cache-Control and its variants by encoding.
+
+    ``url`` is the canonical URL path ('/' + path relative to the web root).
+    Response headers for every variant are computed once, here.
+    """
+
+    __slots__ = ('url', 'path', 'stamp', 'mtime', 'last_modified',
+                 'content_type', 'cache_control', 'variants', 'nbytes',
+                 'checked')
+
+    def __init__(self, url, path, stamp, mtime, content_type, cache_control,
+                 variants):
+        self.url = url
+        self.path = path
+        self.stamp = stamp
+        self.mtime = mtime
+        self.last_modified = email.utils.formatdate(mtime, usegmt=True)
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.variants = variants
+        self.nbytes = sum(len(v.body) for v in variants.values()
+                          if v.body is not None)
+        self.checked = time.monotonic()
+        for variant in variants.values():
+            validators = []
+            if len(variants) > 1:
+                validators.append(('Vary', 'Accept-Encoding'))
+            validators.append(('ETag', variant.etag))
+            validators.append(('Last-Modified', self.last_modified))
+            headers = [('Content-type', content_type)]
+            if variant.encoding:
+                headers.append(('Content-Encoding', variant.encoding))
+            headers.append(('Content-Length', str(variant.size)))
+            headers.append(('Accept-Ranges', 'bytes'))
+            variant.headers = headers + validators
+            variant.validator_headers = validators
+
+    def with_bodies(self):
+        """Copy of this resource with every variant read into memory"""
+        variants = {}
+        for encoding, variant in self.variants.items():
+            with open(variant.path, 'rb') as f:
+                body = f.read()
+            variants[encoding] = Variant(encoding, variant.path, len(body),
+                                         variant.etag, body)
+        return Resource(self.url, self.path, self.stamp, self.mtime,
+                        self.content_type, self.cache_control, variants)
+
+
+def file_stamp(st):
+    """Identity of a file version for invalidation purposes"""
+    return (st.st_mtime_ns, st.st_size)
+
+
+def build_resource(path, url, policy, etag=None, st=None):
+    """Stat a file and its sidecars and describe it as a Resource.
+
+    Sidecars older than the file are ignored, they belong to a previous
+    build. Pass etag/st when already known to skip hashing and stat.
+    """
+    if st is None:
+        st = os.stat(path)
+    if etag is None:
+        etag = policy.etag(path, st)
+    variants = {None: Variant(None, path, st.st_size, etag)}
+    if is_compressible(path):
+        for encoding, suffix in ENCODING_SUFFIXES:
+            try:
+                sidecar = os.stat(path + suffix)
+            except FileNotFoundError:
+                continue
+            if sidecar.st_mtime_ns < st.st_mtime_ns:
+                continue
+            variants[encoding] = Variant(encoding, path + suffix,
+                                         sidecar.st_size,
+                                         etag_for_encoding(etag, encoding))
+    return Resource(url, path, file_stamp(st), st.st_mtime, guess_type(path),
+                    policy.cache_control(url[1:]), variants)
+
+
+def is_sidecar(name, names):
+    """True for a .gz/.br file generated next to a compressible original"""
+    for _encoding, suffix in ENCODING_SUFFIXES:
+        if name.endswith(suffix):
+            original = name[:-len(suffix)]
+            return original in names and is_compressible(original)
+    return False
+
+
+def walk_build(root):
+    """Yield (relative URL path, absolute path) of every servable file"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        names = set(filenames)
+        for name in filenames:
+            if (name.startswith('.') or name.endswith('.tmp')
+                    or is_sidecar(name, names)):
+                continue
+            path = os.path.join(dirpath, name)
+            yield os.path.relpath(path, root).replace(os.sep, '/'), path
+
+
+class BuildManifest:
+    """Immutable route table of the web root: URL path -> Resource.
+
+    Built by walking the directory once at startup. Content hashes are
+    persisted to ``cache_path`` and reused for files whose mtime and size
+    did not change, so restarting on the same build only costs a stat per
+    file. Request dispatch is then a dict lookup.
+    """
+
+    VERSION = 1
+
+    def __init__(self, root, routes, rehashed=0, generation=0):
+        self.root = root
+        self.routes = routes
+        self.rehashed = rehashed
+        self.generation = generation
+        self.index = routes.get('/index.html')
+
+    def lookup(self, url_path):
+        """Resource for a request path, index.html for app routes"""
+        key = urllib.parse.unquote(url_path)
+        if key.endswith('/'):
+            key += 'index.html'
+        resource = self.routes.get(key)
+        if resource is None and '.' not in key.rsplit('/', 1)[-1]:
+            # Flutter path-based routing: /tickets/42 is rendered by the app
+            resource = self.index
+        return resource
+
+    @classmethod
+    def build(cls, root, policy, cache_path=None, workers=None, known=None):
+        """Index root; known maps rel path -> {size, mtime_ns, hash}"""
+        if known is not None:
+            previous = known
+        else:
+            previous = cls.load_hashes(root, cache_path)
+        files = [(rel, path, os.stat(path)) for rel, path in walk_build(root)]
+
+        hashes = {}
+        stale = []
+        for rel, path, st in files:
+            old = previous.get(rel)
+            if old and (old['mtime_ns'], old['size']) == file_stamp(st):
+                hashes[rel] = old['hash']
+            else:
+                stale.append((rel, path))
+        if stale:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                digests = pool.map(content_hash, [path for _rel, path in stale])
+                for (rel, _path), digest in zip(stale, digests):
+                    hashes[rel] = digest
+
+        routes = {}
+        for rel, path, st in files:
+            routes['/' + rel] = build_resource(path, '/' + rel, policy,
+                                               etag=f'"{hashes[rel]}"', st=st)
+        manifest = cls(root, routes, rehashed=len(stale))
+        if cache_path and (stale or set(previous) != set(hashes)):
+            manifest.save_hashes(cache_path, files, hashes)
+        return manifest
+
+    @classmethod
+    def load_hashes(cls, root, cache_path):
+        """Hashes of the previous run, {} if missing or for another root"""
+        if not cache_path:
+            return {}
+        try:
+            with open(cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != cls.VERSION or data.get('root') != root:
+            return {}
+        return data.get('files', {})
+
+    def save_hashes(self, cache_path, files, hashes):
+        data = {
+            'version': self.VERSION,
+            'root': self.root,
+            'files': {rel: {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                            'hash': hashes[rel]}
+                      for rel, _path, st in files},
+        }
+        tmp = cache_path + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, cache_path)
+        except OSError as e:
+            print(f"⚠️  Could not write manifest cache {cache_path}: {e}")
+
+
+# Larger multi-range requests are answered with the whole file
+MAX_RANGES = 16
+
+
+def parse_range(header, size):
+    """Parse a bytes Range header into sorted, merged (start, end) pairs.
+
+    Returns None when the header should be ignored (bad syntax, another
+    unit, too many ranges) and [] when no range is satisfiable.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+    ranges = []
+    items = spec.split(',')
+    if len(items) > MAX_RANGES:
+        return None
+    for item in items:
+        first, dash, last = item.strip().partition('-')
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else start
+                if end < start:
+                    return None
+                if not last:
+                    end = size - 1
+            else:
+                suffix = int(last)
+                start, end = max(size - suffix, 0), size - 1
+                if suffix == 0:
+                    continue
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class ResponseBody:
+    """Response payload made of byte strings and slices of a file.
+
+    File slices are sent with socket.sendfile(); in-memory variants are
+    written straight from their cached bytes.
+    """
+
+    def __init__(self, file=None):
+        self.file = file
+        self.parts = []
+
+    def add_bytes(self, data):
+        self.parts.append(data)
+
+    def add_slice(self, variant, offset, count):
+        if variant.body is not None:
+            self.parts.append(memoryview(variant.body)[offset:offset + count])
+        else:
+            self.parts.append((offset, count))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class HotFileCache:
+    """Byte-budgeted LRU of Resources keyed by URL path.
+
+    A hit is served without touching the filesystem. Entries are re-stat'ed
+    at most every ``check_interval`` seconds and dropped when the file's
+    mtime or size changed (0 checks on every hit).
+    """
+
+    def __init__(self, max_bytes=HOT_CACHE_BYTES, max_file_bytes=HOT_CACHE_MAX_FILE,
+                 check_interval=HOT_CACHE_CHECK_INTERVAL):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes if max_bytes else 0
+        self.check_interval = check_interval
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            resource = self._entries.get(key)
+            if resource is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        now = time.monotonic()
+        if now - resource.checked >= self.check_interval:
+            try:
+                stale = file_stamp(os.stat(resource.path)) != resource.stamp
+            except OSError:
+                stale = True
+            if stale:
+                self.discard(key, resource)
+                with self._lock:
+                    self.misses += 1
+                return None
+            resource.checked = now
+        with self._lock:
+            self.hits += 1
+        return resource
+
+    def put(self, key, resource):
+        if resource.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = resource
+            self.nbytes += resource.nbytes
+            while self.nbytes > self.max_bytes:
+                _key, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def migrate(self, manifest):
+        """Carry entries over to a new build generation.
+
+        Entries whose content hash and variants are unchanged keep their
+        bodies under the new generation's paths; the rest is dropped.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        kept = OrderedDict()
+        for key, cached in entries:
+            fresh = manifest.routes.get(key)
+            if (fresh is None or fresh.variants.keys() != cached.variants.keys()
+                    or any(fresh.variants[enc].etag != variant.etag
+                           for enc, variant in cached.variants.items())):
+                continue
+            variants = {enc: Variant(enc, fresh.variants[enc].path,
+                                     len(variant.body), variant.etag,
+                                     variant.body)
+                        for enc, variant in cached.variants.items()}
+            kept[key] = Resource(fresh.url, fresh.path, fresh.stamp,
+                                 fresh.mtime, fresh.content_type,
+                                 fresh.cache_control, variants)
+        with self._lock:
+            self._entries = kept
+            self.nbytes = sum(r.nbytes for r in kept.values())
+        return len(kept), len(entries) - len(kept)
+
+    def discard(self, key, resource=None):
+        """Drop key (only if it still maps to resource, when given)"""
+        with self._lock:
+            current = self._entries.get(key)
+            if current is None or (resource is not None and current is not resource):
+                return
+            del self._entries[key]
+            self.nbytes -= current.nbytes
+
+
+def _label(value):
+    """Escape a Prometheus label value"""
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class ServerMetrics:
+    """Request counters and latency histograms, rendered for Prometheus.
+
+    Routes are the canonical URL paths of the manifest (app routes count as
+    /index.html, anything unresolved as ``OTHER_ROUTE``), so the number of
+    series is bounded by the size of the build. Counters are per process:
+    with --processes every worker reports its own.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.started = time.time()
+        # (route, method, status) -> count
+        self.requests = {}
+        # route -> [per-bucket counts..., +Inf count, sum of seconds]
+        self.latency = {}
+        # Content-Encoding ('identity' for none) -> body bytes
+        self.bytes_sent = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, method, status, seconds):
+        key = (route, method, status)
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get(route)
+            if histogram is None:
+                histogram = self.latency[route] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram[-1] += seconds
+
+    def add_bytes(self, encoding, count):
+        encoding = encoding or 'identity'
+        with self._lock:
+            self.bytes_sent[encoding] = self.bytes_sent.get(encoding, 0) + count
+
+    def render(self, server):
+        """Prometheus text exposition (format 0.0.4)"""
+        with self._lock:
+            requests = dict(self.requests)
+            latency = {route: list(h) for route, h in self.latency.items()}
+            bytes_sent = dict(self.bytes_sent)
+        cache = server.hot_cache
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                if labels:
+                    labels = ','.join(f'{k}="{_label(v)}"' for k, v in labels)
+                    lines.append(f'{name}{{{labels}}} {value}')
+                else:
+                    lines.append(f'{name} {value}')
+
+        metric('http_requests_total', 'counter', 'Requests by route, method and status.',
+               [((('route', route), ('method', method), ('status', status)), count)
+                for (route, method, status), count in sorted(requests.items())])
+
+        lines.append('# HELP http_request_duration_seconds Time to serve a request.')
+        lines.append('# TYPE http_request_duration_seconds histogram')
+        for route, histogram in sorted(latency.items()):
+            route = _label(route)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), histogram):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket'
+                             f'{{route="{route}",le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{route="{route}"}} '
+                         f'{histogram[-1]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{route="{route}"}} '
+                         f'{cumulative}')
+
+        metric('http_response_bytes_total', 'counter',
+               'Response body bytes by Content-Encoding.',
+               [((('encoding', encoding),), count)
+                for encoding, count in sorted(bytes_sent.items())])
+
+        total = sum(requests.values())
+        not_modified = sum(count for (_r, _m, status), count in requests.items()
+                           if status == 304)
+        metric('http_not_modified_ratio', 'gauge',
+               'Share of responses that were 304 Not Modified.',
+               [((), f'{not_modified / total:.6f}' if total else 0)])
+        metric('http_open_connections', 'gauge', 'Connections being served.',
+               [((), server.open_connections)])
+        metric('hot_cache_hits_total', 'counter', 'Hot-file cache hits.',
+               [((), cache.hits)])
+        metric('hot_cache_misses_total', 'counter', 'Hot-file cache misses.',
+               [((), cache.misses)])
+        lookups = cache.hits + cache.misses
+        metric('hot_cache_hit_ratio', 'gauge', 'Hot-file cache hit ratio.',
+               [((), f'{cache.hits / lookups:.6f}' if lookups else 0)])
+        metric('hot_cache_bytes', 'gauge', 'Bytes held by the hot-file cache.',
+               [((), cache.nbytes)])
+        if server.manifest is not None:
+            metric('build_generation', 'gauge', 'Build generation being served.',
+                   [((), server.manifest.generation)])
+        metric('process_start_time_seconds', 'gauge',
+               'Start time of the process since the epoch.',
+               [((), f'{self.started:.3f}')])
+        return '\n'.join(lines) + '\n'
+
+
+class AccessLog:
+    """Buffered access log written by a background thread.
+
+    Request threads only append a tuple to a deque; formatting and the
+    write happen every ``flush_interval`` seconds in batch. The writer
+    thread is (re)started lazily, so a log created before a prefork fork
+    works in every worker.
+    """
+
+    def __init__(self, stream, flush_interval=ACCESS_LOG_FLUSH_INTERVAL):
+        self.stream = stream
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def write(self, address, message):
+        if self._pid != os.getpid():
+            self._start()
+        self._queue.append((address, time.time(), message))
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Entries queued by the parent are its own to write
+            self._queue.clear()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="access-log",
+                             daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        lines = []
+        while self._queue:
+            address, when, message = self._queue.popleft()
+            year, month, day, hh, mm, ss, _x, _y, _z = time.localtime(when)
+            lines.append("%s - - [%02d/%3s/%04d %02d:%02d:%02d] %s\n" % (
+                address, day, http.server.BaseHTTPRequestHandler.monthname[month],
+                year, hh, mm, ss, message))
+        if lines:
+            try:
+                self.stream.write(''.join(lines))
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
+
+
 class CORSRequestHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP request handler with CORS support"""
-    
+
+    # Persistent connections: the socket stays open between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and a sendfile() body are separate writes; with Nagle the
+    # body waits for the client's delayed ACK (~40 ms) on keep-alive
+    disable_nagle_algorithm = True
+
+    cache_policy = CachePolicy()
+    # Cache-Control for the response being built (None: NO_STORE)
+    _cache_control = None
+    # Per-request instrumentation, reset by parse_request()
+    _started = None
+    _status = None
+    _route = OTHER_ROUTE
+    _encoding = None
+
     def __init__(self, *args, directory=None, **kwargs):
         # Use the provided directory without changing cwd
         super().__init__(*args, directory=directory, **kwargs)
-    
+
+    def setup(self):
+        # Idle keep-alive connections are closed after this many seconds
+        self.timeout = self.server.keepalive_timeout
+        super().setup()
+
+    def parse_request(self):
+        self._started = time.monotonic()
+        self._status = None
+        self._route = OTHER_ROUTE
+        self._encoding = None
+        return super().parse_request()
+
+    def handle_one_request(self):
+        """Handle a request and record its status and latency"""
+        self._started = None
+        super().handle_one_request()
+        metrics = self.server.metrics
+        if self._started is not None and metrics is not None:
+            metrics.observe(self._route, self.command or '-', self._status or 0,
+                            time.monotonic() - self._started)
+
     def end_headers(self):
         """Add CORS headers to all responses"""
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-        self.send_header('Pragma', 'no-cache')
-        self.send_header('Expires', '0')
+        if self._cache_control is None:
+            self.send_header('Cache-Control', NO_STORE)
+            self.send_header('Pragma', 'no-cache')
+            self.send_header('Expires', '0')
+        else:
+            self.send_header('Cache-Control', self._cache_control)
+            self._cache_control = None
         super().end_headers()
-    
+
+    def send_head(self):
+        """Serve a file with validators, caching policy and the best encoding"""
+        url_path = self.path.split('?', 1)[0].split('#', 1)[0]
+        if url_path == METRICS_PATH and self.server.metrics is not None:
+            return self.send_metrics()
+        resource = self.server.manifest.lookup(url_path)
+        if resource is None:
+            self.send_error(http.HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        self._route = resource.url
+        cached = self.server.hot_cache.get(resource.url)
+        if cached is not None and cached.path != resource.path:
+            # Cached by a request that was still on the previous generation
+            cached = None
+        if cached is None:
+            try:
+                cached = self.load_resource(resource)
+            except OSError:
+                self.send_error(http.HTTPStatus.NOT_FOUND, "File not found")
+                return None
+        return self.send_resource(cached)
+
+    def load_resource(self, resource):
+        """Current version of a manifest entry, in memory if small enough"""
+        st = os.stat(resource.path)
+        if file_stamp(st) != resource.stamp:
+            # Changed on disk since the manifest was built
+            resource = build_resource(resource.path, resource.url,
+                                      self.cache_policy, st=st)
+        hot_cache = self.server.hot_cache
+        if st.st_size <= hot_cache.max_file_bytes:
+            resource = resource.with_bodies()
+            hot_cache.put(resource.url, resource)
+        return resource
+
+    def send_resource(self, resource):
+        """Send headers for the negotiated variant and return its body"""
+        encoding = negotiate_encoding(self.headers.get('Accept-Encoding'),
+                                      resource.variants)
+        variant = resource.variants[encoding]
+        self._encoding = encoding
+
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            not_modified = etag_matches(if_none_match, variant.etag)
+        else:
+            if_modified_since = self.headers.get('If-Modified-Since')
+            not_modified = (if_modified_since is not None and
+                            not_modified_since(if_modified_since,
+                                               resource.mtime))
+
+        if not_modified:
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            for keyword, value in variant.validator_headers:
+                self.send_header(keyword, value)
+            self._cache_control = resource.cache_control
+            self.end_headers()
+            return None
+
+        ranges = None
+        range_header = self.headers.get('Range')
+        if range_header is not None and self.if_range_matches(resource, variant):
+            ranges = parse_range(range_header, variant.size)
+            if ranges == []:
+                self.send_response(http.HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header('Content-Range', f'bytes */{variant.size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+
+        if variant.body is not None:
+            body = ResponseBody()
+        else:
+            try:
+                body = ResponseBody(open(variant.path, 'rb'))
+            except OSError:
+                self.send_error(http.HTTPStatus.NOT_FOUND, "File not found")
+                return None
+
+        if not ranges:
+            body.add_slice(variant, 0, variant.size)
+            self.send_response(http.HTTPStatus.OK)
+            headers = variant.headers
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            body.add_slice(variant, start, end - start + 1)
+            self.send_response(http.HTTPStatus.PARTIAL_CONTENT)
+            headers = [('Content-type', resource.content_type),
+                       ('Content-Range', f'bytes {start}-{end}/{variant.size}'),
+                       ('Content-Length', str(end - start + 1))]
+        else:
+            boundary = uuid.uuid4().hex
+            length = 0
+            for start, end in ranges:
+                part_head = (f'--{boundary}\r\n'
+                             f'Content-Type: {resource.content_type}\r\n'
+                             f'Content-Range: bytes {start}-{end}/{variant.size}'
+                             '\r\n\r\n').encode('latin-1')
+                body.add_bytes(part_head)
+                body.add_slice(variant, start, end - start + 1)
+                body.add_bytes(b'\r\n')
+                length += len(part_head) + end - start + 1 + 2
+            closing = f'--{boundary}--\r\n'.encode('latin-1')
+            body.add_bytes(closing)
+            length += len(closing)
+            self.send_response(http.HTTPStatus.PARTIAL_CONTENT)
+            headers = [('Content-type',
+                        f'multipart/byteranges; boundary={boundary}'),
+                       ('Content-Length', str(length))]
+
+        if ranges:
+            if variant.encoding:
+                headers.append(('Content-Encoding', variant.encoding))
+            headers.append(('Accept-Ranges', 'bytes'))
+            headers.extend(variant.validator_headers)
+        for keyword, value in headers:
+            self.send_header(keyword, value)
+        self._cache_control = resource.cache_control
+        self.end_headers()
+        return body
+
+    def send_metrics(self):
+        """Prometheus exposition of this process' counters"""
+        self._route = METRICS_PATH
+        body = self.server.metrics.render(self.server).encode()
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def if_range_matches(self, resource, variant):
+        """Evaluate If-Range: ranges only apply to the current representation"""
+        if_range = self.headers.get('If-Range')
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"'):
+            # Strong comparison is required here
+            return if_range == variant.etag
+        if if_range.startswith('W/'):
+            return False
+        return if_range == resource.last_modified
+
+    def copyfile(self, source, outputfile):
+        """Send a ResponseBody with sendfile(), anything else the usual way"""
+        if not isinstance(source, ResponseBody):
+            return super().copyfile(source, outputfile)
+        sent = 0
+        for part in source.parts:
+            if isinstance(part, tuple):
+                offset, count = part
+                # socket.sendfile() uses os.sendfile() when the socket
+                # allows it and falls back to send() otherwise
+                sent += self.connection.sendfile(source.file, offset, count)
+            else:
+                outputfile.write(part)
+                sent += len(part)
+        if self.server.metrics is not None:
+            self.server.metrics.add_bytes(self._encoding, sent)
+
     def do_OPTIONS(self):
         """Handle preflight OPTIONS requests"""
         self.send_response(200)
+        # Empty body; required so keep-alive clients know the response ended
+        self.send_header('Content-Length', '0')
         self.end_headers()
-    
+
+    def log_request(self, code='-', size='-'):
+        self.server.note_request()
+        if isinstance(code, int):
+            self._status = int(code)
+        super().log_request(code, size)
+
     def log_message(self, format, *args):
-        """Custom log format"""
-        sys.stderr.write("%s - - [%s] %s\n" %
-                         (self.address_string(),
-                          self.log_date_time_string(),
-                          format % args))
+        """Queue the line on the access log (dropped when logging is off)"""
+        access_log = self.server.access_log
+        if access_log is not None:
+            access_log.write(self.address_string(), format % args)
+
+
+class ConcurrentHTTPServer(http.server.HTTPServer):
+    """HTTP server that dispatches connections to a bounded worker pool.
+
+    At most ``max_connections`` accepted connections exist at any time. When
+    the cap is reached the accept loop blocks, so further clients wait in the
+    kernel listen backlog instead of piling up inside the process.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=WORKERS,
+                 max_connections=MAX_CONNECTIONS,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT, hot_cache=None,
+                 reuse_port=False, manifest=None, metrics=None,
+                 access_log=None):
+        # SO_REUSEPORT lets several processes bind their own socket to the
+        # same port, the kernel balances connections between them
+        self.allow_reuse_port = reuse_port
+        self.hot_cache = hot_cache if hot_cache is not None else HotFileCache()
+        self.manifest = manifest
+        # Both optional: None disables /metrics and the access log
+        self.metrics = metrics
+        self.access_log = access_log
+        self.workers = workers
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="http-worker")
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._open_lock = threading.Lock()
+        self.open_connections = 0
+        self.requests_served = 0
+        super().__init__(server_address, handler_class)
+
+    def note_request(self):
+        with self._open_lock:
+            self.requests_served += 1
+
+    def stats(self):
+        """Counters reported by prefork workers in their heartbeat"""
+        return {
+            'requests': self.requests_served,
+            'open_connections': self.open_connections,
+            'cache_hits': self.hot_cache.hits,
+            'cache_misses': self.hot_cache.misses,
+            'cache_bytes': self.hot_cache.nbytes,
+        }
+
+    def wait_idle(self, timeout):
+        """Wait until in-flight connections finished, up to timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while self.open_connections and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def process_request(self, request, client_address):
+        """Queue the connection on the worker pool (blocks when at capacity)"""
+        self._slots.acquire()
+        with self._open_lock:
+            self.open_connections += 1
+        try:
+            self._executor.submit(self._process_request_worker,
+                                  request, client_address)
+        except RuntimeError:
+            # Executor already shut down
+            self._release_slot()
+            self.shutdown_request(request)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._open_lock:
+            self.open_connections -= 1
+        self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def copy_and_hash(src, dst):
+    """Copy src to dst (keeping its mtime) and return the content hash"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        for chunk in iter(lambda: fin.read(1 << 20), b''):
+            digest.update(chunk)
+            fout.write(chunk)
+    shutil.copystat(src, dst)
+    return digest.hexdigest()
+
+
+class BuildWatcher:
+    """Polls the build directory and publishes immutable build generations.
+
+    ``flutter build web`` rewrites files in place, so serving straight from
+    build/web mixes old and new files mid-build. In watch mode every
+    generation is a private snapshot under ``store`` that is never modified:
+    once the source has been quiet for ``settle`` seconds, changed files are
+    copied (hashed on the way) and recompressed, unchanged ones are
+    hard-linked from the previous snapshot with their hash and sidecars.
+    Requests that already resolved a Resource keep reading the old snapshot.
+    """
+
+    def __init__(self, source, store, policy, settle=2.0):
+        self.source = source
+        self.store = store
+        self.policy = policy
+        self.settle = settle
+        self.current = None
+        self.previous = None
+        self.source_stamps = {}
+        self._pending = None
+        self._pending_since = 0.0
+
+    def scan(self):
+        """{rel path: (mtime_ns, size)} of the source directory"""
+        stamps = {}
+        for rel, path in walk_build(self.source):
+            try:
+                stamps[rel] = file_stamp(os.stat(path))
+            except FileNotFoundError:
+                continue
+        return stamps
+
+    def start(self):
+        """Snapshot the current build, discarding leftovers of older runs"""
+        if os.path.isdir(self.store):
+            shutil.rmtree(self.store, ignore_errors=True)
+        os.makedirs(self.store, exist_ok=True)
+        return self.snapshot(self.scan())
+
+    def poll(self):
+        """New manifest once the source changed and settled, else None"""
+        stamps = self.scan()
+        if not stamps or stamps == self.source_stamps:
+            # Unchanged, or the build directory is being wiped
+            self._pending = None
+            return None
+        now = time.monotonic()
+        if stamps != self._pending:
+            self._pending = stamps
+            self._pending_since = now
+            return None
+        if now - self._pending_since < self.settle:
+            return None
+        self._pending = None
+        return self.snapshot(stamps)
+
+    def snapshot(self, stamps):
+        generation = self.current.generation + 1 if self.current else 1
+        final = os.path.join(self.store, f"gen-{generation:06d}")
+        staging = final + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        known = {}
+        changed = []
+        for rel, stamp in stamps.items():
+            src = os.path.join(self.source, rel)
+            dst = os.path.join(staging, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            old = self.current.routes.get('/' + rel) if self.current else None
+            try:
+                if old is not None and self.source_stamps.get(rel) == stamp:
+                    # Unchanged: share the previous snapshot's inode
+                    for variant in old.variants.values():
+                        os.link(variant.path, dst + variant.path[len(old.path):])
+                    digest = old.variants[None].etag.strip('"')
+                else:
+                    digest = copy_and_hash(src, dst)
+                    changed.append(dst)
+            except FileNotFoundError:
+                # Deleted while we were copying, the next poll catches up
+                continue
+            st = os.stat(dst)
+            known[rel] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                          'hash': digest}
 
+        # Reuse sidecars the build step already produced, compress the rest
+        for dst in changed:
+            if not is_compressible(dst):
+                continue
+            src = os.path.join(self.source, os.path.relpath(dst, staging))
+            for _encoding, suffix in ENCODING_SUFFIXES:
+                try:
+                    if os.stat(src + suffix).st_mtime_ns >= os.stat(src).st_mtime_ns:
+                        shutil.copy2(src + suffix, dst + suffix)
+                except FileNotFoundError:
+                    pass
+        with ThreadPoolExecutor() as pool:
+            list(pool.map(_compress_file,
+                          [dst for dst in changed if is_compressible(dst)]))
 
-def main():
+        os.rename(staging, final)
+        manifest = BuildManifest.build(final, self.policy, known=known)
+        manifest.generation = generation
+        manifest.rehashed = len(changed)
+        self.prune(keep=(self.current.root if self.current else None, final))
+        self.previous, self.current = self.current, manifest
+        self.source_stamps = stamps
+        return manifest
+
+    def prune(self, keep):
+        """Remove generations other than the ones in keep.
+
+        Open file descriptors of in-flight responses stay valid after the
+        unlink, so only the current and the previous snapshot are kept.
+        """
+        for name in os.listdir(self.store):
+            path = os.path.join(self.store, name)
+            if path not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+class WorkerProcess:
+    """Bookkeeping for one prefork worker as seen by the supervisor"""
+
+    def __init__(self, slot, pid, pipe):
+        self.slot = slot
+        self.pid = pid
+        self.pipe = pipe
+        self.started = time.monotonic()
+        self.last_beat = self.started
+        self.stats = {}
+        self.rps = 0.0
+        self.buffer = b''
+        # Replaced by a newer fork, draining before it exits
+        self.retiring = False
+
+
+class PreforkSupervisor:
+    """Forks N server processes and keeps them alive.
+
+    Workers either share the listening socket created before the fork or,
+    with SO_REUSEPORT, bind their own. Each worker sends a JSON heartbeat
+    over a pipe; the supervisor restarts workers that exit or stop beating
+    and prints a health table on SIGUSR1 and on every restart.
+    """
+
+    def __init__(self, make_server, processes, on_tick=None):
+        self.make_server = make_server
+        self.processes = processes
+        # Called once per supervisor loop iteration (about every second)
+        self.on_tick = on_tick
+        self.workers = {}
+        self.restarts = [0] * processes
+        self.backoff = [0.0] * processes
+        self.pending = {}
+        self.stopping = False
+        self._report = False
+        self._selector = selectors.DefaultSelector()
+
+    def spawn(self, slot):
+        read_fd, write_fd = os.pipe()
+        # Don't let the child inherit (and later repeat) buffered output
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._selector.close()
+            for worker in self.workers.values():
+                worker.pipe.close()
+            self._run_worker(slot, write_fd)
+        os.close(write_fd)
+        pipe = os.fdopen(read_fd, 'rb', buffering=0)
+        os.set_blocking(read_fd, False)
+        worker = WorkerProcess(slot, pid, pipe)
+        self.workers[pid] = worker
+        self._selector.register(pipe, selectors.EVENT_READ, worker)
+        return worker
+
+    def _run_worker(self, slot, write_fd):
+        """Body of a forked worker; never returns"""
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+            signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+            httpd = self.make_server()
+            threading.Thread(target=self._heartbeat, args=(httpd, slot, write_fd),
+                             daemon=True).start()
+            try:
+                httpd.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            # Stop accepting, let in-flight requests finish
+            httpd.socket.close()
+            httpd.wait_idle(SHUTDOWN_GRACE)
+            if httpd.access_log is not None:
+                httpd.access_log.flush()
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stderr.flush()
+            os._exit(code)
+
+    @staticmethod
+    def _heartbeat(httpd, slot, write_fd):
+        while True:
+            beat = dict(httpd.stats(), slot=slot, pid=os.getpid())
+            try:
+                os.write(write_fd, (json.dumps(beat) + '\n').encode())
+            except OSError:
+                return
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    def run(self):
+        """Supervise until Ctrl+C or SIGTERM"""
+        signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+        signal.signal(signal.SIGUSR1, self._request_report)
+        for slot in range(self.processes):
+            self.spawn(slot)
+        try:
+            while True:
+                for key, _events in self._selector.select(timeout=1.0):
+                    self._read_heartbeats(key.data)
+                self._reap()
+                self._check_hung()
+                self._respawn_due()
+                if self.on_tick is not None:
+                    self.on_tick(self)
+                if self._report:
+                    self._report = False
+                    self.report()
+        finally:
+            self.stop()
+
+    def _request_report(self, signum, frame):
+        self._report = True
+
+    def _read_heartbeats(self, worker):
+        try:
+            data = worker.pipe.read()
+        except OSError:
+            data = None
+        if not data:
+            return
+        worker.buffer += data
+        *lines, worker.buffer = worker.buffer.split(b'\n')
+        now = time.monotonic()
+        for line in lines:
+            try:
+                stats = json.loads(line)
+            except ValueError:
+                continue
+            elapsed = now - worker.last_beat
+            if worker.stats and elapsed > 0:
+                served = stats['requests'] - worker.stats['requests']
+                worker.rps = served / elapsed
+            worker.stats = stats
+            worker.last_beat = now
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            self._selector.unregister(worker.pipe)
+            worker.pipe.close()
+            if self.stopping or worker.retiring:
+                continue
+            # Quick crashes (e.g. port in use) back off exponentially
+            uptime = time.monotonic() - worker.started
+            slot = worker.slot
+            if uptime < 5.0:
+                self.backoff[slot] = min(max(self.backoff[slot] * 2, 0.5),
+                                         RESTART_BACKOFF_MAX)
+            else:
+                self.backoff[slot] = 0.0
+            self.restarts[slot] += 1
+            print(f"⚠️  Worker {slot} (pid {pid}) exited with status "
+                  f"{os.waitstatus_to_exitcode(status)}, restarting in "
+                  f"{self.backoff[slot]:.1f}s")
+            self.pending[slot] = time.monotonic() + self.backoff[slot]
+
+    def reload(self):
+        """Rolling restart: fork fresh workers, then drain the old ones.
+
+        The listening socket stays open throughout, so no connection is
+        refused while the workers pick up the supervisor's new state.
+        """
+        for worker in [w for w in self.workers.values() if not w.retiring]:
+            worker.retiring = True
+            self.spawn(worker.slot)
+            try:
+                os.kill(worker.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _check_hung(self):
+        now = time.monotonic()
+        for worker in list(self.workers.values()):
+            if now - worker.last_beat > HEARTBEAT_TIMEOUT:
+                print(f"⚠️  Worker {worker.slot} (pid {worker.pid}) stopped "
+                      f"responding, killing it")
+                worker.last_beat = now
+                os.kill(worker.pid, signal.SIGKILL)
+
+    def _respawn_due(self):
+        now = time.monotonic()
+        for slot, due in list(self.pending.items()):
+            if now >= due:
+                del self.pending[slot]
+                self.spawn(slot)
+                self.report()
+
+    def health(self):
+        """Per-worker health rows"""
+        now = time.monotonic()
+        rows = []
+        for worker in sorted(self.workers.values(), key=lambda w: w.slot):
+            age = now - worker.last_beat
+            if worker.retiring:
+                status = 'draining'
+            elif not worker.stats:
+                status = 'starting'
+            else:
+                status = 'ok' if age < 3 * HEARTBEAT_INTERVAL else 'stale'
+            rows.append({
+                'slot': worker.slot,
+                'pid': worker.pid,
+                'status': status,
+                'uptime': now - worker.started,
+                'restarts': self.restarts[worker.slot],
+                'rps': worker.rps,
+                **worker.stats,
+            })
+        return rows
+
+    def report(self):
+        print("📊 Workers:")
+        for row in self.health():
+            hits = row.get('cache_hits', 0)
+            lookups = hits + row.get('cache_misses', 0)
+            ratio = f"{100 * hits / lookups:.0f}%" if lookups else '-'
+            print(f"   #{row['slot']} pid {row['pid']} {row['status']:<8} "
+                  f"up {row['uptime']:.0f}s restarts {row['restarts']} "
+                  f"requests {row.get('requests', 0)} ({row['rps']:.1f}/s) "
+                  f"open {row.get('open_connections', 0)} cache hit {ratio}")
+        sys.stdout.flush()
+
+    def stop(self):
+        """SIGTERM every worker, SIGKILL the ones still alive after the grace"""
+        self.stopping = True
+        # A second SIGTERM must not abort the shutdown half way
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + SHUTDOWN_GRACE + 1
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.workers:
+            self._reap()
+            time.sleep(0.01)
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def parse_args(argv=None):
+    """Command line options for the launcher"""
+    parser = argparse.ArgumentParser(description="SU TODERO web server")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--directory', default=DIRECTORY)
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="size of the worker thread pool")
+    parser.add_argument('--max-connections', type=int, default=MAX_CONNECTIONS,
+                        help="open connection cap before accept() blocks")
+    parser.add_argument('--keepalive-timeout', type=float,
+                        default=KEEPALIVE_TIMEOUT,
+                        help="seconds an idle keep-alive connection is kept")
+    parser.add_argument('--cache-mb', type=float,
+                        default=HOT_CACHE_BYTES / (1024 * 1024),
+                        help="memory budget of the hot-file cache (0 disables)")
+    parser.add_argument('--cache-max-file-kb', type=float,
+                        default=HOT_CACHE_MAX_FILE / 1024,
+                        help="largest file kept in the hot-file cache")
+    parser.add_argument('--cache-check-interval', type=float,
+                        default=HOT_CACHE_CHECK_INTERVAL,
+                        help="seconds between mtime checks of cached files")
+    parser.add_argument('--manifest',
+                        help="file index cache (default: .<dir>-manifest.json "
+                             "next to the served directory)")
+    parser.add_argument('--watch', action='store_true',
+                        help="serve immutable snapshots of the build and hot "
+                             "swap to a new one when the build changes")
+    parser.add_argument('--watch-interval', type=float, default=1.0,
+                        help="seconds between scans of the build directory")
+    parser.add_argument('--watch-settle', type=float, default=2.0,
+                        help="seconds the build must stay unchanged before "
+                             "it is published")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="prefork this many server processes (0: one per CPU)")
+    parser.add_argument('--reuse-port', action='store_true',
+                        help="each process binds its own SO_REUSEPORT socket "
+                             "instead of sharing one")
+    parser.add_argument('--access-log', default='-',
+                        help="access log file, '-' for stderr (default)")
+    parser.add_argument('--no-access-log', action='store_true',
+                        help="don't log requests")
+    parser.add_argument('--no-metrics', action='store_true',
+                        help=f"don't serve {METRICS_PATH}")
+    parser.add_argument('--no-precompress', action='store_true',
+                        help="skip generating .gz/.br sidecars at startup")
+    parser.add_argument('--precompress-only', action='store_true',
+                        help="generate sidecars and exit (build step)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Start the HTTP server"""
+    args = parse_args(argv)
+
     # Get absolute path to build/web directory
-    abs_directory = os.path.abspath(DIRECTORY)
-    
+    abs_directory = os.path.abspath(args.directory)
+
     # Check if build/web directory exists
     if not os.path.exists(abs_directory):
         print(f"❌ Error: Directory '{abs_directory}' does not exist!")
         print("💡 Run 'flutter build web' first")
         sys.exit(1)
-    
+
+    if not args.no_precompress:
+        count, saved = precompress_directory(abs_directory)
+        print(f"🗜️  Precompressed {count} assets "
+              f"({saved / 1024:.0f} KiB saved, brotli: {'yes' if brotli else 'no'})")
+        if args.precompress_only:
+            return
+
+    manifest_path = args.manifest or os.path.join(
+        os.path.dirname(abs_directory),
+        f".{os.path.basename(abs_directory)}-manifest.json")
+    started = time.monotonic()
+    watcher = None
+    if args.watch:
+        watcher = BuildWatcher(
+            abs_directory,
+            os.path.join(os.path.dirname(abs_directory),
+                         f".{os.path.basename(abs_directory)}-generations"),
+            CORSRequestHandler.cache_policy, settle=args.watch_settle)
+        manifest = watcher.start()
+    else:
+        manifest = BuildManifest.build(abs_directory,
+                                       CORSRequestHandler.cache_policy,
+                                       cache_path=manifest_path)
+    print(f"🗂️  Indexed {len(manifest.routes)} files "
+          f"({manifest.rehashed} hashed) in "
+          f"{(time.monotonic() - started) * 1000:.0f} ms")
+
+    processes = args.processes or os.cpu_count() or 1
+    if processes > 1 and not hasattr(os, 'fork'):
+        print("⚠️  Prefork needs os.fork(), running a single process")
+        processes = 1
+    reuse_port = args.reuse_port and processes > 1
+    if reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+        print("⚠️  SO_REUSEPORT not available, sharing one listening socket")
+        reuse_port = False
+
     print(f"🚀 Starting SU TODERO server...")
     print(f"📁 Serving directory: {abs_directory}")
-    print(f"🌐 Server running on http://0.0.0.0:{PORT}")
+    print(f"🌐 Server running on http://0.0.0.0:{args.port}")
+    print(f"🧵 Workers: {args.workers} | Max connections: {args.max_connections}")
+    if processes > 1:
+        print(f"🧩 Processes: {processes} "
+              f"({'SO_REUSEPORT' if reuse_port else 'shared socket'}, "
+              f"kill -USR1 {os.getpid()} for worker health)")
     print(f"✅ Ready to accept connections")
     print(f"🛑 Press Ctrl+C to stop")
-    
+
+    hot_cache = HotFileCache(
+        max_bytes=int(args.cache_mb * 1024 * 1024),
+        max_file_bytes=int(args.cache_max_file_kb * 1024),
+        check_interval=args.cache_check_interval)
+
+    access_log = None
+    if not args.no_access_log:
+        if args.access_log == '-':
+            stream = sys.stderr
+        else:
+            stream = open(args.access_log, 'a', buffering=1 << 16)
+        access_log = AccessLog(stream)
+    metrics = None if args.no_metrics else ServerMetrics()
+
     # Create handler with fixed directory
     handler = lambda *args, **kwargs: CORSRequestHandler(*args, directory=abs_directory, **kwargs)
-    
-    with socketserver.TCPServer(("0.0.0.0", PORT), handler) as httpd:
+
+    def make_server():
+        return ConcurrentHTTPServer(("0.0.0.0", args.port), handler,
+                                    workers=args.workers,
+                                    max_connections=args.max_connections,
+                                    keepalive_timeout=args.keepalive_timeout,
+                                    hot_cache=hot_cache,
+                                    reuse_port=reuse_port,
+                                    manifest=manifest, metrics=metrics,
+                                    access_log=access_log)
+
+    def poll_build():
+        started = time.monotonic()
+        try:
+            new_manifest = watcher.poll()
+        except OSError as e:
+            print(f"⚠️  Could not snapshot the build: {e}")
+            return None
+        if new_manifest is not None:
+            print(f"🔁 Build generation {new_manifest.generation} live: "
+                  f"{len(new_manifest.routes)} files, {new_manifest.rehashed} "
+                  f"changed, prepared in "
+                  f"{(time.monotonic() - started) * 1000:.0f} ms")
+            sys.stdout.flush()
+        return new_manifest
+
+    if processes > 1:
+        if reuse_port:
+            factory = make_server
+        else:
+            # Bound once here and inherited by every fork
+            shared = make_server()
+            factory = lambda: shared
+
+        next_poll = [0.0]
+
+        def on_tick(supervisor):
+            # Forks inherit the new manifest, old workers drain and exit
+            nonlocal manifest
+            if time.monotonic() < next_poll[0]:
+                return
+            next_poll[0] = time.monotonic() + args.watch_interval
+            new_manifest = poll_build()
+            if new_manifest is not None:
+                manifest = new_manifest
+                if not reuse_port:
+                    shared.manifest = new_manifest
+                supervisor.reload()
+
+        try:
+            PreforkSupervisor(factory, processes,
+                              on_tick=on_tick if watcher else None).run()
+        except KeyboardInterrupt:
+            print("\n🛑 Server stopped by user")
+            sys.exit(0)
+        return
+
+    with make_server() as httpd:
+        def watch_loop():
+            while True:
+                time.sleep(args.watch_interval)
+                new_manifest = poll_build()
+                if new_manifest is not None:
+                    # Atomic swap; requests in flight keep their Resource
+                    httpd.manifest = new_manifest
+                    hot_cache.migrate(new_manifest)
+
+        if watcher:
+            threading.Thread(target=watch_loop, name="build-watcher",
+                             daemon=True).start()
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
+            if access_log is not None:
+                access_log.flush()
             print("\n🛑 Server stopped by user")
             sys.exit(0)
 